@@ -0,0 +1,285 @@
+# AsyncMySQLConnector.py
+"""
+Async counterpart of MySQLConnector, for async handlers whose DB work should
+overlap with HTTP calls on the event loop instead of holding a threadpool
+worker for the duration of a query.
+
+Same method surface as MySQLConnector, as coroutines (connect, disconnect,
+execute_query, create_book, create_clippings_batch), running the same SQL and
+returning the same things: dict rows for SELECT/SHOW/DESCRIBE (or tuples /
+namedtuples with row_format), rowcount or the new id for writes, None on errors.
+Prepared statements (prepared=True) are cached per pooled connection.
+
+connect() borrows a connection from a per-event-loop AsyncPool (DB_POOL_SIZE
+connections, opened on demand) and disconnect() gives it back, so the
+connect / query / disconnect pattern used with MySQLConnector doesn't pay a
+handshake per call.
+
+Built on mysql.connector.aio, which ships with mysql-connector-python; like the
+sync connector, it is imported on first use.
+"""
+import asyncio
+import time
+from typing import List, Optional, Tuple
+
+from metrics import DB_CONNECTIONS_ACTIVE, DB_CONNECTIONS_OPENED
+from MySQLConnector import (
+    BOOK_INSERT_SQL,
+    CLIPPING_INSERT_SQL,
+    check_row_format,
+    drop_statement_cache,
+    format_rows,
+    is_read_query,
+    statement_cache,
+)
+from settings import get_settings
+
+# Idle connections older than this are pinged before being handed out again.
+PING_AFTER_SECONDS = 30.0
+
+
+class AsyncPool:
+    """
+    Up to `size` connections, opened on demand and reused; acquire() waits while
+    all of them are busy. Bound to the event loop it was created on.
+    """
+
+    def __init__(self, size: int, **connect_kwargs):
+        self.size = size
+        self.connect_kwargs = connect_kwargs
+        self.loop = asyncio.get_running_loop()
+        self._idle: List[Tuple[object, float]] = []
+        self._opened = 0
+        self._closed = False
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        while True:
+            async with self._cond:
+                while not self._idle and self._opened >= self.size:
+                    await self._cond.wait()
+                if self._idle:
+                    cnx, released_at = self._idle.pop()
+                else:
+                    self._opened += 1
+                    cnx = None
+
+            if cnx is None:
+                return await self._open()
+            if time.monotonic() - released_at < PING_AFTER_SECONDS or await cnx.is_connected():
+                return cnx
+            await self.release(cnx, discard=True)
+
+    async def _open(self):
+        import mysql.connector.aio
+
+        try:
+            cnx = await mysql.connector.aio.connect(**self.connect_kwargs)
+        except BaseException:
+            async with self._cond:
+                self._opened -= 1
+                self._cond.notify()
+            raise
+        DB_CONNECTIONS_OPENED.inc()
+        DB_CONNECTIONS_ACTIVE.inc()
+        return cnx
+
+    async def release(self, cnx, discard: bool = False) -> None:
+        if discard or self._closed:
+            drop_statement_cache(cnx)
+            try:
+                await cnx.close()
+            except Exception:
+                pass
+            DB_CONNECTIONS_ACTIVE.dec()
+            async with self._cond:
+                self._opened -= 1
+                self._cond.notify()
+            return
+
+        async with self._cond:
+            self._idle.append((cnx, time.monotonic()))
+            self._cond.notify()
+
+    async def close(self) -> None:
+        self._closed = True
+        async with self._cond:
+            idle, self._idle = self._idle, []
+        for cnx, _ in idle:
+            await self.release(cnx, discard=True)
+
+
+_pool: Optional[AsyncPool] = None
+
+
+def get_pool() -> AsyncPool:
+    """The pool for the running event loop, created from DB_* settings on first use."""
+    global _pool
+    loop = asyncio.get_running_loop()
+    if _pool is None or _pool.loop is not loop or _pool._closed:
+        settings = get_settings()
+        _pool = AsyncPool(
+            settings.db_pool_size,
+            host=settings.db_host,
+            port=settings.db_port,
+            user=settings.db_username,
+            password=settings.db_password,
+            database=settings.db_database,
+        )
+    return _pool
+
+
+async def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+class AsyncMySQLConnector:
+    def __init__(self, pool: Optional[AsyncPool] = None):
+        self.pool = pool
+        self.prepared_statements = get_settings().db_prepared_statements
+        self.connection = None
+        self._broken = False
+
+    async def connect(self):
+        import mysql.connector
+
+        try:
+            self.pool = self.pool or get_pool()
+            self.connection = await self.pool.acquire()
+            self._broken = False
+        except mysql.connector.Error as err:
+            print(f"Error connecting to the database: {err}")
+            self.connection = None
+
+    async def disconnect(self):
+        if self.connection:
+            await self.pool.release(self.connection, discard=self._broken)
+            self.connection = None
+
+    async def __aenter__(self) -> "AsyncMySQLConnector":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.disconnect()
+
+    async def _on_error(self, err) -> None:
+        """A pooled connection must not go back with a half-done transaction or a dead socket."""
+        import mysql.connector
+
+        if isinstance(err, (mysql.connector.InterfaceError, mysql.connector.OperationalError)):
+            self._broken = True
+            return
+        try:
+            await self.connection.rollback()
+        except mysql.connector.Error:
+            self._broken = True
+
+    async def execute_query(self, sql_query, params=None, prepared=False, row_format="dict"):
+        import mysql.connector
+
+        check_row_format(row_format)
+        if not self.connection:
+            print("Not connected to the database. Please connect first.")
+            return None
+
+        try:
+            if is_read_query(sql_query):
+                rows, _ = await self._execute(sql_query, params, prepared, row_format)
+                return rows
+            rowcount, _ = await self._execute(sql_query, params, prepared)
+            await self.connection.commit()
+            return rowcount
+        except mysql.connector.Error as err:
+            print(f"Error executing query: {err}")
+            await self._on_error(err)
+            return None
+
+    async def _execute(self, sql_query, params, prepared, row_format=None):
+        """Same contract as MySQLConnector._execute, on the pooled connection."""
+        import mysql.connector
+
+        prepared = prepared and self.prepared_statements
+        if prepared:
+            cache = statement_cache(self.connection)
+            entry = cache.get(sql_query)
+            if entry is None:
+                cursor = await self.connection.cursor(prepared=True)
+                for evicted in cache.put(sql_query, cursor):
+                    await evicted.close()
+            else:
+                sql_query, cursor = entry
+        else:
+            cursor = await self.connection.cursor(dictionary=row_format == "dict")
+
+        try:
+            await cursor.execute(sql_query, params)
+            if row_format is None:
+                return cursor.rowcount, cursor.lastrowid
+            rows = await cursor.fetchall()
+            if prepared or row_format != "dict":
+                rows = format_rows(rows, cursor.column_names, row_format)
+            return rows, None
+        except mysql.connector.Error:
+            if prepared:
+                cache.pop(sql_query)
+                try:
+                    await cursor.close()
+                except mysql.connector.Error:
+                    pass
+            raise
+        finally:
+            if not prepared:
+                await cursor.close()
+
+    async def create_book(self, book_data):
+        """
+        Inserts into cliperest_book and returns inserted book_id.
+        """
+        import mysql.connector
+
+        if not self.connection:
+            print("Not connected to the database. Please connect first.")
+            return None
+
+        try:
+            _, book_id = await self._execute(BOOK_INSERT_SQL, tuple(book_data.values()), prepared=True)
+            await self.connection.commit()
+            print(f"Book record inserted successfully with ID: {book_id}")
+            return book_id
+        except mysql.connector.Error as err:
+            print(f"Error creating book: {err}")
+            await self._on_error(err)
+            return None
+
+    async def create_clippings_batch(self, clippings_data_list):
+        """
+        Batch insert into cliperest_clipping.
+        Returns number of inserted rows.
+        """
+        import mysql.connector
+
+        if not self.connection:
+            print("Not connected to the database. Please connect first.")
+            return None
+
+        if not clippings_data_list:
+            return 0
+
+        cursor = None
+        try:
+            cursor = await self.connection.cursor()
+            values = [tuple(c.values()) for c in clippings_data_list]
+            await cursor.executemany(CLIPPING_INSERT_SQL, values)
+            await self.connection.commit()
+            return cursor.rowcount
+        except mysql.connector.Error as err:
+            print(f"Error creating clippings in batch: {err}")
+            await self._on_error(err)
+            return None
+        finally:
+            if cursor:
+                await cursor.close()
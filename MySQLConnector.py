@@ -1,18 +1,198 @@
 # MySQLConnector.py
-import os
-import mysql.connector
+import random
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from metrics import DB_CONNECTIONS_ACTIVE, DB_CONNECTIONS_OPENED, DB_READS, record_cache
+from settings import get_settings
+
+# mysql.connector is imported inside the methods: it is only needed once a
+# connection is opened, and keeping it off the import path speeds up startup.
+
+# Shared with AsyncMySQLConnector so both implementations run the same SQL.
+READ_PREFIXES = ("SELECT", "SHOW", "DESCRIBE")
+
+BOOK_INSERT_SQL = """
+    INSERT INTO cliperest_book
+    (user_id, name, slug, rendered, version, category_id, modified, addEnd, coverImage, sharing,
+    coverColor, dollarsGiven, privacy, type, created, coverHexColor, numLikers, description,
+    tags, thumbnailImage, numClips, numViews, userLanguage, embed_code, thumbnailImageSmall,
+    humanModified, coverV3, typeFilters)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+CLIPPING_INSERT_SQL = """
+    INSERT INTO cliperest_clipping
+    (book_id, caption, text, thumbnail, useThumbnail, type, url, created, num, migratedS3, modified)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def is_read_query(sql_query: str) -> bool:
+    return sql_query.strip().upper().startswith(READ_PREFIXES)
+
+
+# ----------------------------
+# Prepared statements and row formats
+# ----------------------------
+# execute_query(..., prepared=True) runs the statement as a server-side prepared
+# statement over the binary protocol: it is parsed once per connection, and later
+# executions send only the statement id and the parameters, with results decoded
+# from binary. The statements are kept per connection, least recently used evicted
+# first, so they only pay off on connections that live across many calls: the
+# AsyncPool connections behind AsyncMySQLConnector. On a connect / query /
+# disconnect MySQLConnector the cache is always empty and each prepared call costs
+# an extra prepare and close round trip, so the sync call sites don't use it.
+STATEMENT_CACHE_SIZE = 32
+
+ROW_FORMATS = ("dict", "tuple", "namedtuple")
+
+
+class StatementCache:
+    def __init__(self, size: int = STATEMENT_CACHE_SIZE):
+        self.size = size
+        self._entries: "OrderedDict[str, Tuple[str, object]]" = OrderedDict()
+
+    def get(self, sql_query: str):
+        """(sql, cursor) prepared earlier for this SQL text, or None."""
+        entry = self._entries.get(sql_query)
+        record_cache("prepared_statement", entry is not None)
+        if entry is not None:
+            self._entries.move_to_end(sql_query)
+        return entry
+
+    def put(self, sql_query: str, cursor) -> List[object]:
+        """Caches the cursor; returns the cursors evicted to make room (to be closed)."""
+        self._entries[sql_query] = (sql_query, cursor)
+        evicted = []
+        while len(self._entries) > self.size:
+            evicted.append(self._entries.popitem(last=False)[1][1])
+        return evicted
+
+    def pop(self, sql_query: str):
+        entry = self._entries.pop(sql_query, None)
+        return entry[1] if entry is not None else None
+
+
+_statement_caches: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def statement_cache(cnx) -> StatementCache:
+    cache = _statement_caches.get(cnx)
+    if cache is None:
+        cache = _statement_caches[cnx] = StatementCache()
+    return cache
+
+
+def drop_statement_cache(cnx) -> None:
+    """Forgets the connection's statements (the server frees them when it closes)."""
+    _statement_caches.pop(cnx, None)
+
+
+def check_row_format(row_format: str) -> None:
+    if row_format not in ROW_FORMATS:
+        raise ValueError(f"row_format must be one of {ROW_FORMATS}, not {row_format!r}")
+
+
+@lru_cache(maxsize=256)
+def _row_type(columns: Tuple[str, ...]):
+    return namedtuple("Row", columns, rename=True)
+
+
+def format_rows(rows: Sequence[Sequence], columns: Sequence[str], row_format: str) -> list:
+    """Tuple rows (as returned by plain and prepared cursors) in the requested format."""
+    if row_format == "tuple":
+        return [tuple(row) for row in rows]
+    if row_format == "namedtuple":
+        row_type = _row_type(tuple(columns))
+        return [row_type._make(row) for row in rows]
+    return [dict(zip(columns, row)) for row in rows]
+
+
+# ----------------------------
+# Read replicas (DB_REPLICA_HOSTS)
+# ----------------------------
+# Locking reads have to run where the writes happen.
+_LOCKING_READ_RE = re.compile(r"\bFOR\s+(UPDATE|SHARE)\b|\bLOCK\s+IN\s+SHARE\s+MODE\b", re.IGNORECASE)
+
+# A replica's lag is checked at most this often per process; a replica that is
+# too far behind (or unreachable) is skipped until the next check.
+REPLICA_CHECK_SECONDS = 5.0
+
+_replica_checks: Dict[Tuple[str, int], Tuple[float, bool]] = {}
+_replica_checks_lock = threading.Lock()
+
+
+def is_replica_safe(sql_query: str) -> bool:
+    return is_read_query(sql_query) and not _LOCKING_READ_RE.search(sql_query)
+
+
+def _replica_lag(cnx) -> Optional[float]:
+    """
+    Seconds the replica is behind its source, 0 for a server that isn't replicating
+    (e.g. a managed reader endpoint), None when replication is stopped.
+    """
+    import mysql.connector
+
+    cursor = cnx.cursor(dictionary=True)
+    try:
+        try:
+            cursor.execute("SHOW REPLICA STATUS")
+        except mysql.connector.Error:
+            cursor.execute("SHOW SLAVE STATUS")  # MySQL < 8.0.22, MariaDB < 10.5.1
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    if not rows:
+        return 0.0
+    lag = rows[0].get("Seconds_Behind_Source", rows[0].get("Seconds_Behind_Master"))
+    return float(lag) if lag is not None else None
+
+
+def _replica_known_bad(host: str, port: int) -> bool:
+    with _replica_checks_lock:
+        checked = _replica_checks.get((host, port))
+    return checked is not None and not checked[1] and time.monotonic() - checked[0] < REPLICA_CHECK_SECONDS
+
+
+def _replica_needs_check(host: str, port: int) -> bool:
+    with _replica_checks_lock:
+        checked = _replica_checks.get((host, port))
+    return checked is None or time.monotonic() - checked[0] >= REPLICA_CHECK_SECONDS
+
+
+def _record_replica_check(host: str, port: int, ok: bool) -> None:
+    with _replica_checks_lock:
+        _replica_checks[(host, port)] = (time.monotonic(), ok)
 
 
 class MySQLConnector:
     def __init__(self):
-        self.host = os.getenv("DB_HOST")
-        self.port = int(os.getenv("DB_PORT", "3306"))
-        self.username = os.getenv("DB_USERNAME")
-        self.password = os.getenv("DB_PASSWORD")
-        self.database = os.getenv("DB_DATABASE")
+        settings = get_settings()
+        self.host = settings.db_host
+        self.port = settings.db_port
+        self.username = settings.db_username
+        self.password = settings.db_password
+        self.database = settings.db_database
+        self.replica_hosts = settings.db_replica_hosts
+        self.max_replica_lag = settings.db_replica_max_lag_seconds
+        self.prepared_statements = settings.db_prepared_statements
         self.connection = None
+        # Opened on the first read that can go to a replica.
+        self.replica_connection = None
+        self.replica_host = None
+        # Set by the first write: from then on this unit of work reads from the
+        # primary, so it sees its own writes regardless of replica lag.
+        self.pinned = False
 
     def connect(self):
+        import mysql.connector
+
         try:
             self.connection = mysql.connector.connect(
                 host=self.host,
@@ -21,74 +201,248 @@ class MySQLConnector:
                 password=self.password,
                 database=self.database,
             )
+            DB_CONNECTIONS_OPENED.inc()
+            DB_CONNECTIONS_ACTIVE.inc()
+            self.pinned = False
             print("Connected to the database successfully!")
         except mysql.connector.Error as err:
             print(f"Error connecting to the database: {err}")
             self.connection = None
 
     def disconnect(self):
+        self._close_replica()
         if self.connection:
+            drop_statement_cache(self.connection)
             self.connection.close()
             self.connection = None
+            DB_CONNECTIONS_ACTIVE.dec()
             print("Disconnected from the database.")
 
-    def execute_query(self, sql_query, params=None):
+    def pin_to_primary(self):
+        """
+        Sends the remaining reads of this unit of work to the primary, e.g. to read
+        a row another service has just written.
+        """
+        self.pinned = True
+
+    # ----------------------------
+    # Read routing
+    # ----------------------------
+    def _read_connection(self, sql_query):
+        """(connection, route) for a read: a replica when one is configured, healthy and allowed."""
+        if not self.replica_hosts or not is_replica_safe(sql_query):
+            return self.connection, "primary"
+        if self.pinned:
+            return self.connection, "pinned"
+        if self.replica_connection is None:
+            self.replica_connection = self._open_replica()
+        if self.replica_connection is None:
+            return self.connection, "fallback"
+        return self.replica_connection, "replica"
+
+    def _open_replica(self):
+        import mysql.connector
+
+        hosts = list(self.replica_hosts)
+        random.shuffle(hosts)
+        for host, port in hosts:
+            if _replica_known_bad(host, port):
+                continue
+            try:
+                cnx = mysql.connector.connect(
+                    host=host,
+                    port=port,
+                    user=self.username,
+                    password=self.password,
+                    database=self.database,
+                )
+            except mysql.connector.Error as err:
+                print(f"Error connecting to replica {host}:{port}: {err}")
+                _record_replica_check(host, port, False)
+                continue
+
+            ok = True
+            if _replica_needs_check(host, port):
+                try:
+                    lag = _replica_lag(cnx)
+                except mysql.connector.Error as err:
+                    print(f"Error checking replica {host}:{port} lag: {err}")
+                    lag = None
+                ok = lag is not None and lag <= self.max_replica_lag
+                _record_replica_check(host, port, ok)
+            if ok:
+                DB_CONNECTIONS_OPENED.inc()
+                DB_CONNECTIONS_ACTIVE.inc()
+                self.replica_host = (host, port)
+                return cnx
+            cnx.close()
+        return None
+
+    def _close_replica(self, failed=False):
+        if self.replica_connection is None:
+            return
+        if failed:
+            _record_replica_check(*self.replica_host, False)
+        drop_statement_cache(self.replica_connection)
+        try:
+            self.replica_connection.close()
+        except Exception:
+            pass
+        self.replica_connection = None
+        self.replica_host = None
+        DB_CONNECTIONS_ACTIVE.dec()
+
+    def execute_query(self, sql_query, params=None, prepared=False, row_format="dict"):
+        """
+        Reads return the rows (dicts by default; row_format="tuple" or "namedtuple"
+        is cheaper for bulk reads), writes the rowcount, errors None.
+        prepared=True runs the statement as a cached server-side prepared statement;
+        only worth it when this connection runs the statement many times (see
+        STATEMENT_CACHE_SIZE above).
+        """
+        import mysql.connector
+
+        check_row_format(row_format)
         if not self.connection or not self.connection.is_connected():
             print("Not connected to the database. Please connect first.")
             return None
 
-        cursor = None
+        if is_read_query(sql_query):
+            cnx, route = self._read_connection(sql_query)
+            try:
+                rows, _ = self._execute(cnx, sql_query, params, prepared, row_format)
+            except (mysql.connector.InterfaceError, mysql.connector.OperationalError) as err:
+                if cnx is self.connection:
+                    print(f"Error executing query: {err}")
+                    return None
+                # the replica went away mid-unit: drop it and serve the read from the primary
+                print(f"Error executing query on replica, retrying on primary: {err}")
+                self._close_replica(failed=True)
+                cnx, route = self.connection, "fallback"
+                try:
+                    rows, _ = self._execute(cnx, sql_query, params, prepared, row_format)
+                except mysql.connector.Error as err:
+                    print(f"Error executing query: {err}")
+                    return None
+            except mysql.connector.Error as err:
+                print(f"Error executing query: {err}")
+                return None
+            DB_READS.labels("replica" if route == "replica" else "primary", route).inc()
+            return rows
+
         try:
-            cursor = self.connection.cursor(dictionary=True)
-            cursor.execute(sql_query, params)
-            if sql_query.strip().upper().startswith(("SELECT", "SHOW", "DESCRIBE")):
-                return cursor.fetchall()
-            else:
-                self.connection.commit()
-                return cursor.rowcount
+            rowcount, _ = self._execute(self.connection, sql_query, params, prepared)
+            self.connection.commit()
         except mysql.connector.Error as err:
             print(f"Error executing query: {err}")
             return None
+        # statements that changed nothing (CREATE TABLE IF NOT EXISTS, an UPDATE
+        # matching no rows) leave nothing to read back, so they don't pin
+        if rowcount != 0:
+            self.pinned = True
+        return rowcount
+
+    def execute_many(self, sql_query, rows, batch_size=500):
+        """
+        Runs a write statement once per params tuple in rows, batch_size rows per
+        executemany (one multi-row INSERT on a plain cursor), and commits once.
+        Returns the rowcount, None on error; like execute_query, a write that
+        changed rows pins the remaining reads to the primary.
+        """
+        import mysql.connector
+
+        if not self.connection or not self.connection.is_connected():
+            print("Not connected to the database. Please connect first.")
+            return None
+        if not rows:
+            return 0
+
+        cursor = None
+        rowcount = 0
+        try:
+            cursor = self.connection.cursor()
+            for start in range(0, len(rows), batch_size):
+                cursor.executemany(sql_query, rows[start : start + batch_size])
+                rowcount += cursor.rowcount
+            self.connection.commit()
+        except mysql.connector.Error as err:
+            print(f"Error executing batch: {err}")
+            return None
         finally:
             if cursor:
                 cursor.close()
+        if rowcount != 0:
+            self.pinned = True
+        return rowcount
+
+    def _execute(self, cnx, sql_query, params, prepared, row_format=None):
+        """
+        Runs one statement on cnx: (rows in row_format, None) for reads (row_format
+        set), (rowcount, lastrowid) for writes. mysql.connector errors propagate.
+        """
+        import mysql.connector
+
+        prepared = prepared and self.prepared_statements
+        if prepared:
+            cache = statement_cache(cnx)
+            entry = cache.get(sql_query)
+            if entry is None:
+                cursor = cnx.cursor(prepared=True)
+                for evicted in cache.put(sql_query, cursor):
+                    evicted.close()
+            else:
+                # the cursor re-prepares unless given the very same str object
+                sql_query, cursor = entry
+        else:
+            cursor = cnx.cursor(dictionary=row_format == "dict")
+
+        try:
+            cursor.execute(sql_query, params)
+            if row_format is None:
+                return cursor.rowcount, cursor.lastrowid
+            rows = cursor.fetchall()
+            if prepared or row_format != "dict":
+                rows = format_rows(rows, cursor.column_names, row_format)
+            return rows, None
+        except mysql.connector.Error:
+            if prepared:
+                cache.pop(sql_query)
+                try:
+                    cursor.close()
+                except mysql.connector.Error:
+                    pass
+            raise
+        finally:
+            if not prepared:
+                cursor.close()
 
     def create_book(self, book_data):
         """
         Inserts into cliperest_book and returns inserted book_id.
         """
+        import mysql.connector
+
         if not self.connection or not self.connection.is_connected():
             print("Not connected to the database. Please connect first.")
             return None
 
-        cursor = None
         try:
-            cursor = self.connection.cursor()
-            insert_query = """
-                INSERT INTO cliperest_book
-                (user_id, name, slug, rendered, version, category_id, modified, addEnd, coverImage, sharing,
-                coverColor, dollarsGiven, privacy, type, created, coverHexColor, numLikers, description,
-                tags, thumbnailImage, numClips, numViews, userLanguage, embed_code, thumbnailImageSmall,
-                humanModified, coverV3, typeFilters)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            cursor.execute(insert_query, tuple(book_data.values()))
+            _, book_id = self._execute(self.connection, BOOK_INSERT_SQL, tuple(book_data.values()), prepared=False)
             self.connection.commit()
-            book_id = cursor.lastrowid
+            self.pinned = True
             print(f"Book record inserted successfully with ID: {book_id}")
             return book_id
         except mysql.connector.Error as err:
             print(f"Error creating book: {err}")
             return None
-        finally:
-            if cursor:
-                cursor.close()
 
     def create_clippings_batch(self, clippings_data_list):
         """
         Batch insert into cliperest_clipping.
         Returns number of inserted rows.
         """
+        import mysql.connector
+
         if not self.connection or not self.connection.is_connected():
             print("Not connected to the database. Please connect first.")
             return None
@@ -96,17 +450,15 @@ class MySQLConnector:
         if not clippings_data_list:
             return 0
 
+        # Not a prepared statement: executemany on a plain cursor sends one multi-row
+        # INSERT, a prepared one would execute once per row.
         cursor = None
         try:
             cursor = self.connection.cursor()
-            insert_query = """
-                INSERT INTO cliperest_clipping
-                (book_id, caption, text, thumbnail, useThumbnail, type, url, created, num, migratedS3, modified)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
             values = [tuple(c.values()) for c in clippings_data_list]
-            cursor.executemany(insert_query, values)
+            cursor.executemany(CLIPPING_INSERT_SQL, values)
             self.connection.commit()
+            self.pinned = True
             return cursor.rowcount
         except mysql.connector.Error as err:
             print(f"Error creating clippings in batch: {err}")
@@ -0,0 +1,266 @@
+# batch_pipeline.py
+"""
+Bounded concurrent fetch -> extract -> LLM pipeline for backfills.
+
+Used by the /summarize_batch endpoint and as a CLI:
+
+    python batch_pipeline.py articles.jsonl -o results.jsonl --checkpoint done.txt
+
+Input is JSONL, one {"id"?, "text"} or {"id"?, "url"} object per line.
+Re-running with the same --checkpoint skips items that already succeeded.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, Optional, Set, Union
+
+from web_utils import download, extract_text_from_download
+
+
+@dataclass
+class StageLimits:
+    fetch: int = 8
+    extract: int = 4
+    llm: int = 4
+    # items admitted into the pipeline at once; bounds memory on huge inputs
+    in_flight: int = 32
+
+    @classmethod
+    def from_settings(cls) -> "StageLimits":
+        from settings import get_settings
+
+        settings = get_settings()
+        return cls(
+            fetch=settings.batch_fetch_concurrency,
+            extract=settings.batch_extract_concurrency,
+            llm=settings.batch_llm_concurrency,
+            in_flight=settings.batch_in_flight,
+        )
+
+
+@dataclass
+class BatchItem:
+    id: str
+    text: Optional[str] = None
+    url: Optional[str] = None
+    error: Optional[str] = None  # set when the input line itself was unusable
+
+
+def parse_batch_line(line: str, lineno: int) -> Optional[BatchItem]:
+    """
+    Returns None for blank lines. Items without an explicit id get a stable one
+    (the URL, or a hash of the text) so checkpoints survive input reordering.
+    """
+    line = line.strip()
+    if not line:
+        return None
+
+    try:
+        data = json.loads(line)
+    except json.JSONDecodeError as e:
+        return BatchItem(id=f"line-{lineno}", error=f"Invalid JSON: {e}")
+
+    if not isinstance(data, dict):
+        return BatchItem(id=f"line-{lineno}", error="Each line must be a JSON object")
+
+    for field in ("text", "url"):
+        if data.get(field) is not None and not isinstance(data[field], str):
+            return BatchItem(id=f"line-{lineno}", error=f"'{field}' must be a string")
+    item_id = data.get("id")
+    # numeric ids (WordPress post ids) are fine, they are used as strings
+    if item_id is not None and (isinstance(item_id, bool) or not isinstance(item_id, (str, int))):
+        return BatchItem(id=f"line-{lineno}", error="'id' must be a string or an integer")
+
+    text = (data.get("text") or "").strip() or None
+    url = (data.get("url") or "").strip() or None
+
+    if item_id is None:
+        if url:
+            item_id = url
+        elif text:
+            item_id = "sha1:" + hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+        else:
+            item_id = f"line-{lineno}"
+
+    if not text and not url:
+        return BatchItem(id=str(item_id), error="Each line needs 'text' or 'url'")
+
+    return BatchItem(id=str(item_id), text=text, url=url)
+
+
+def iter_batch_items(lines: Iterable[Union[str, bytes]], skip: Optional[Set[str]] = None) -> Iterator[BatchItem]:
+    """
+    Parses JSONL lines lazily (a file object works), skipping ids in `skip`.
+    """
+    for lineno, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", "replace")
+        item = parse_batch_line(line, lineno)
+        if item and not (skip and item.id in skip):
+            yield item
+
+
+class _Stages:
+    def __init__(self, limits: StageLimits):
+        self.fetch = asyncio.Semaphore(limits.fetch)
+        self.extract = asyncio.Semaphore(limits.extract)
+        self.llm = asyncio.Semaphore(limits.llm)
+
+
+async def _llm_call(stages: _Stages, fn, *args, **kwargs):
+    async with stages.llm:
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+async def _process_item(item: BatchItem, stages: _Stages) -> Dict:
+    # imported lazily so the pipeline module can be loaded without an API key
+    from summarizer import (
+        LONG_DOCUMENT_MAX_CHARS,
+        condense_article,
+        summarize_article_overall,
+        summarize_spanish_article_multi,
+    )
+
+    result: Dict = {"id": item.id}
+    if item.url:
+        result["url"] = item.url
+    if item.error:
+        result["error"] = item.error
+        return result
+
+    try:
+        text = item.text
+        if not text:
+            async with stages.fetch:
+                doc = await asyncio.to_thread(download, item.url)
+            async with stages.extract:
+                text = await asyncio.to_thread(extract_text_from_download, doc, LONG_DOCUMENT_MAX_CHARS)
+            if not text:
+                raise RuntimeError("No se ha podido extraer texto del artículo")
+
+        # long documents are condensed chunk by chunk first, as on /summarize
+        text = await _llm_call(stages, condense_article, text)
+        # both completions for an item run concurrently, each holding an LLM slot
+        summary, topics = await asyncio.gather(
+            _llm_call(stages, summarize_article_overall, text),
+            _llm_call(stages, summarize_spanish_article_multi, text, n=3),
+        )
+        topics = [t.strip() for t in topics if t and t.strip()][:3]
+        if len(topics) < 3:
+            raise RuntimeError("Failed to extract 3 topics")
+
+        result["summary"] = summary
+        result["topics"] = topics
+    except Exception as e:
+        result["error"] = str(e)
+
+    return result
+
+
+async def _aiter(items: Union[Iterable[BatchItem], AsyncIterable[BatchItem]]) -> AsyncIterator[BatchItem]:
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def run_batch(
+    items: Union[Iterable[BatchItem], AsyncIterable[BatchItem]],
+    limits: Optional[StageLimits] = None,
+) -> AsyncIterator[Dict]:
+    """
+    Runs items through fetch -> extract -> LLM with per-stage concurrency limits
+    and yields one result dict per item as soon as it completes.
+    Never raises for a single bad item; failures come back as {"id", "error"}.
+    """
+    limits = limits or StageLimits()
+    stages = _Stages(limits)
+    source = _aiter(items)
+    pending: Set[asyncio.Task] = set()
+    exhausted = False
+
+    try:
+        while True:
+            while not exhausted and len(pending) < limits.in_flight:
+                try:
+                    item = await source.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+                pending.add(asyncio.create_task(_process_item(item, stages)))
+
+            if not pending:
+                break
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+def _load_checkpoint(path: Optional[str]) -> Set[str]:
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return {ln.rstrip("\n") for ln in f if ln.strip()}
+
+
+async def _run_cli(args: argparse.Namespace) -> None:
+    done_ids = _load_checkpoint(args.checkpoint)
+    if done_ids:
+        print(f"Resuming: skipping {len(done_ids)} items from {args.checkpoint}")
+
+    limits = StageLimits(fetch=args.fetch, extract=args.extract, llm=args.llm, in_flight=args.in_flight)
+    ok = failed = 0
+
+    src = open(args.input, "r", encoding="utf-8")
+    out = open(args.output, "a", encoding="utf-8")
+    ckpt = open(args.checkpoint, "a", encoding="utf-8") if args.checkpoint else None
+    try:
+        async for result in run_batch(iter_batch_items(src, skip=done_ids), limits):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            if "error" in result:
+                failed += 1
+                continue
+            ok += 1
+            # only successes are checkpointed, so failures are retried on resume
+            if ckpt:
+                ckpt.write(result["id"] + "\n")
+                ckpt.flush()
+    finally:
+        src.close()
+        out.close()
+        if ckpt:
+            ckpt.close()
+
+    print(f"Done: {ok} ok, {failed} failed")
+
+
+def main() -> None:
+    defaults = StageLimits.from_settings()
+    parser = argparse.ArgumentParser(description="Batch summarize + topics for a JSONL of texts or URLs.")
+    parser.add_argument("input", help="JSONL file, one {id?, text|url} per line")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl", help="NDJSON results (appended)")
+    parser.add_argument("--checkpoint", help="file of completed ids; enables resume")
+    parser.add_argument("--fetch", type=int, default=defaults.fetch)
+    parser.add_argument("--extract", type=int, default=defaults.extract)
+    parser.add_argument("--llm", type=int, default=defaults.llm)
+    parser.add_argument("--in-flight", type=int, default=defaults.in_flight)
+    args = parser.parse_args()
+
+    asyncio.run(_run_cli(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# benchmarks/batch_api_contract.py
+"""
+Contract checks for openai_batch.py against an in-memory fake of the OpenAI
+files and batches endpoints (files.create / files.content, batches.create /
+batches.retrieve), so submit -> poll -> collect runs end to end without an
+account:
+
+- input files stay within the per-file byte and request limits, and both
+  requests of an article land in the same file
+- every file is submitted and recorded in the manifest
+- a failure partway through submit leaves the batch ids already created in
+  the manifest
+- polling waits for a terminal status; collect merges summaries and topics
+  into the store, skips failed requests and is idempotent
+
+    python -m benchmarks.batch_api_contract
+"""
+import argparse
+import io
+import json
+import os
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("DEANNA2U_API_KEY", "bench")
+
+import openai_batch  # noqa: E402
+import storage  # noqa: E402
+from batch_pipeline import BatchItem  # noqa: E402
+from benchmarks.stubs import load_fixture  # noqa: E402
+from web_utils import extract_text_from_html  # noqa: E402
+
+# custom_ids the fake answers with an error, to exercise the error file
+FAILING_SUFFIX = "-fail"
+
+
+class _Files:
+    def __init__(self, store: Dict[str, bytes]):
+        self.store = store
+
+    def create(self, file, purpose: str):
+        file_id = f"file-{len(self.store)}"
+        self.store[file_id] = file.read()
+        return SimpleNamespace(id=file_id, purpose=purpose)
+
+    def content(self, file_id: str):
+        return SimpleNamespace(text=self.store[file_id].decode("utf-8"))
+
+
+class _Batches:
+    def __init__(self, client: "FakeBatchClient"):
+        self.client = client
+        self.batches: Dict[str, Dict] = {}
+
+    def create(self, input_file_id: str, endpoint: str, completion_window: str, metadata=None):
+        if self.client.fail_on_create is not None and len(self.batches) == self.client.fail_on_create:
+            raise RuntimeError("fake: batches.create failed")
+        batch_id = f"batch-{len(self.batches)}"
+        self.batches[batch_id] = {"input": input_file_id, "polls": 0, "endpoint": endpoint}
+        return SimpleNamespace(id=batch_id, status="validating")
+
+    def retrieve(self, batch_id: str):
+        state = self.batches[batch_id]
+        state["polls"] += 1
+        lines = self.client.files.store[state["input"]].decode("utf-8").splitlines()
+        counts = SimpleNamespace(total=len(lines), completed=0, failed=0)
+        if state["polls"] < self.client.polls_to_finish:
+            return SimpleNamespace(id=batch_id, status="in_progress", request_counts=counts,
+                                   output_file_id=None, error_file_id=None)
+
+        if "output" not in state:
+            ok, failed = [], []
+            for line in lines:
+                req = json.loads(line)
+                (failed if FAILING_SUFFIX in req["custom_id"] else ok).append(self.client.answer(req))
+            state["output"] = self.client._store_lines(ok)
+            state["error"] = self.client._store_lines(failed) if failed else None
+            state["counts"] = (len(ok), len(failed))
+        counts.completed, counts.failed = state["counts"]
+        return SimpleNamespace(id=batch_id, status="completed", request_counts=counts,
+                               output_file_id=state["output"], error_file_id=state["error"])
+
+
+class FakeBatchClient:
+    def __init__(self, polls_to_finish: int = 3, fail_on_create=None):
+        self.polls_to_finish = polls_to_finish
+        self.fail_on_create = fail_on_create
+        self.files = _Files({})
+        self.batches = _Batches(self)
+
+    def _store_lines(self, rows: List[Dict]) -> str:
+        return self.files.create(io.BytesIO("".join(json.dumps(r) + "\n" for r in rows).encode()), "batch_output").id
+
+    def answer(self, req: Dict) -> Dict:
+        custom_id = req["custom_id"]
+        if FAILING_SUFFIX in custom_id:
+            return {"custom_id": custom_id, "response": {"status_code": 400, "body": {"error": "fake"}}, "error": None}
+        article_id = custom_id.split("::")[0]
+        if custom_id.endswith(openai_batch.SUMMARY_SUFFIX):
+            content = f"Resumen de {article_id}."
+        else:
+            content = f"bicicletas {article_id}\ncascos {article_id}\ncandados {article_id}"
+        body = {"choices": [{"message": {"role": "assistant", "content": content}}]}
+        return {"custom_id": custom_id, "response": {"status_code": 200, "body": body}, "error": None}
+
+
+def _items(count: int) -> List[BatchItem]:
+    text = extract_text_from_html(load_fixture("article.html"))
+    items = []
+    for i in range(count):
+        item_id = f"post-{i}" + (FAILING_SUFFIX if i % 10 == 9 else "")
+        items.append(BatchItem(id=item_id, text=f"{text}\n\n[{i}]", url=f"https://example.com/{i}" if i % 2 else None))
+    return items
+
+
+def check(articles: int, max_bytes: int) -> List[str]:
+    failures = []
+    work = Path(tempfile.mkdtemp(prefix="batch-contract-"))
+    storage.SUMMARIES_FILE = work / "summaries.jsonl"
+    items = _items(articles)
+
+    # submit: byte-bounded files, one batch per file, manifest on disk
+    client = FakeBatchClient()
+    manifest_path = work / "backfill.json"
+    manifest = openai_batch.submit_articles(items, manifest_path, client=client, max_bytes=max_bytes)
+    if len(manifest["batches"]) < 2:
+        failures.append(f"expected several input files at max_bytes={max_bytes}, got {len(manifest['batches'])}")
+    seen_ids = []
+    for entry in manifest["batches"]:
+        path = Path(entry["input_file"])
+        if path.stat().st_size > max_bytes:
+            failures.append(f"{path.name}: {path.stat().st_size} bytes > {max_bytes}")
+        ids = [json.loads(line)["custom_id"].split("::")[0] for line in path.read_text(encoding="utf-8").splitlines()]
+        if len(ids) != entry["requests"] or any(ids.count(i) != 2 for i in set(ids)):
+            failures.append(f"{path.name}: an article's requests are split across files")
+        seen_ids += ids
+    if sorted(set(seen_ids)) != sorted(it.id for it in items):
+        failures.append("not every article was submitted exactly once")
+    if json.loads(manifest_path.read_text(encoding="utf-8")) != manifest:
+        failures.append("manifest on disk differs from the returned one")
+
+    # poll + collect: waits for completion, failed requests are left out, re-run saves nothing
+    saved = openai_batch._collect(manifest, poll_interval=0, client=client)
+    expected = sum(1 for it in items if FAILING_SUFFIX not in it.id)
+    if saved != expected:
+        failures.append(f"collect saved {saved} summaries, expected {expected}")
+    if any(state["polls"] < client.polls_to_finish for state in client.batches.batches.values()):
+        failures.append("collect returned before a batch finished")
+    records = storage.load_all_summaries()
+    if any(len(r.topics) != 3 or not r.summary for r in records):
+        failures.append("a stored record lacks its summary or topics")
+    if openai_batch._collect(manifest, poll_interval=0, client=client) != 0:
+        failures.append("a second collect saved duplicates")
+
+    # a failure partway through submit keeps the batches already created
+    broken = FakeBatchClient(fail_on_create=1)
+    partial_path = work / "partial.json"
+    try:
+        openai_batch.submit_articles(items, partial_path, client=broken, max_bytes=max_bytes)
+        failures.append("submit did not raise when batches.create failed")
+    except RuntimeError:
+        pass
+    partial = json.loads(partial_path.read_text(encoding="utf-8"))
+    if [b["id"] for b in partial["batches"]] != ["batch-0"]:
+        failures.append(f"manifest after a failed submit lists {partial['batches']}, expected batch-0")
+
+    # an article larger than the file limit is refused up front
+    try:
+        openai_batch.submit_articles(items[:1], work / "tiny.json", client=FakeBatchClient(), max_bytes=1000)
+        failures.append("an article over the file limit was accepted")
+    except ValueError:
+        pass
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=40)
+    parser.add_argument("--max-bytes", type=int, default=256 * 1024, help="per-file limit used for the check")
+    args = parser.parse_args()
+
+    failures = check(args.articles, args.max_bytes)
+    if failures:
+        raise SystemExit("FAIL: " + "; ".join(failures))
+    print("batch API contract checks passed")
+
+
+if __name__ == "__main__":
+    main()
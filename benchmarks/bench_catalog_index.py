@@ -0,0 +1,102 @@
+# benchmarks/bench_catalog_index.py
+"""
+Catalog index (catalog_index.py) on a synthetic catalog: indexing throughput
+into a fresh SQLite file, then search latency for topic-like queries (2-3 words
+taken from an indexed item's title, word frequencies Zipf-distributed like real
+product vocabulary) and how often that item comes back in the top 10.
+
+Fails if the p95 query latency is above --max-p95-ms.
+
+    python -m benchmarks.bench_catalog_index --items 1000000 --queries 2000
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import tempfile
+import time
+from typing import List
+
+from benchmarks.harness import percentile
+from catalog_index import CatalogIndex
+
+SYLLABLES = "ba be bi bo bu ca ce ci co cu da de di do du la le li lo lu ma me mi mo mu na ne ni no nu pa pe pi po pu ra re ri ro ru ta te ti to tu".split()
+
+
+def make_vocabulary(size: int, rng: random.Random) -> List[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=1_000_000)
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--max-p95-ms", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocab = make_vocabulary(args.vocabulary, rng)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocab))))
+    step = max(1, args.items // args.queries)
+    sampled = {}
+
+    def words(k: int) -> str:
+        return " ".join(rng.choices(vocab, cum_weights=cum_weights, k=k))
+
+    def catalog():
+        for i in range(args.items):
+            title = words(rng.randint(4, 8))
+            item = {
+                "id": f"item-{i}",
+                "title": title,
+                "description": words(rng.randint(10, 20)),
+                "url": f"https://shop.example/p/{i}",
+                "keywords": words(rng.randint(2, 3)),
+                "language": "es",
+            }
+            if i % step == 0 and len(sampled) < args.queries:
+                sampled[item["id"]] = title
+            yield item
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="catalog-"), "catalog_index.sqlite")
+    index = CatalogIndex(db_path)
+    t0 = time.perf_counter()
+    indexed = index.add_many(catalog(), batch_size=5000)
+    index_seconds = time.perf_counter() - t0
+
+    latencies = []
+    found = 0
+    for item_id, title in sampled.items():
+        terms = title.split()
+        query = " ".join(rng.sample(terms, min(len(terms), rng.randint(2, 3))))
+        t0 = time.perf_counter()
+        hits = index.search(query, language="es", limit=10)
+        latencies.append(time.perf_counter() - t0)
+        found += any(h.id == item_id for h in hits)
+
+    p95_ms = percentile(latencies, 0.95) * 1000
+    report = {
+        "items": indexed,
+        "index_items_per_s": round(indexed / index_seconds, 1),
+        "index_seconds": round(index_seconds, 1),
+        "db_mb": round(sum(os.path.getsize(db_path + ext) for ext in ("", "-wal") if os.path.exists(db_path + ext)) / 1e6, 1),
+        "queries": len(latencies),
+        "query_p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "query_p95_ms": round(p95_ms, 3),
+        "query_p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "source_item_in_top10": round(found / len(latencies), 3) if latencies else 0.0,
+    }
+    print(json.dumps(report, indent=2))
+
+    if p95_ms > args.max_p95_ms:
+        raise SystemExit(f"FAIL: p95 query latency {p95_ms:.3f}ms above {args.max_p95_ms}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# benchmarks/bench_charset.py
+"""
+Charset detection for fetched pages (web_utils.sniff_charset / decode_html).
+
+The corpus is built from fixtures/article.html, a Spanish news page. It comes
+in UTF-8 and windows-1252, declared in different ways or not at all, plus two
+large (~700 KB) undeclared pages. Three decoders run on each page:
+
+- sniff:       decode_html, the new path (BOM, header, <meta>, UTF-8 check,
+               then detection on a sample)
+- resp_text:   what requests' resp.text does (header charset, ISO-8859-1 for
+               text/* without one, detection over the whole body otherwise)
+- whole_body:  charset_normalizer over the whole body (resp.apparent_encoding)
+
+For each, it reports whether the decoded text matches the original, and the
+time per page. The run fails if sniff gets any page wrong.
+
+    python -m benchmarks.bench_charset
+"""
+import argparse
+import codecs
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("DEANNA2U_API_KEY", "bench")
+
+from charset_normalizer import from_bytes  # noqa: E402
+from requests.utils import get_encoding_from_headers  # noqa: E402
+
+from benchmarks.harness import percentile  # noqa: E402
+from benchmarks.stubs import load_fixture  # noqa: E402
+from web_utils import decode_html, sniff_charset  # noqa: E402
+
+META = '<meta charset="utf-8">'
+BIG_BYTES = 1024 * 1024
+
+
+def _page(meta: Optional[str], repeat_body: int = 1) -> str:
+    html = load_fixture("article.html")
+    if repeat_body > 1:
+        start, end = html.index("<body"), html.rindex("</body>")
+        html = html[:start] + html[start:end] * repeat_body + html[end:]
+    return html.replace(META, meta or "")
+
+
+def corpus() -> List[Tuple[str, bytes, str, str]]:
+    """(name, body, Content-Type header, the text a correct decoder returns)"""
+    big = BIG_BYTES // len(load_fixture("article.html").encode("utf-8")) + 1
+    cases = [
+        # name, page text, encoding, Content-Type, BOM
+        ("utf8_header", _page(META), "utf-8", "text/html; charset=utf-8", b""),
+        ("utf8_meta", _page(META), "utf-8", "text/html", b""),
+        ("utf8_bare", _page(None), "utf-8", "text/html", b""),
+        ("utf8_bom", _page(None), "utf-8", "text/html", codecs.BOM_UTF8),
+        ("utf16_bom", _page(None), "utf-16-le", "text/html", codecs.BOM_UTF16_LE),
+        ("cp1252_meta", _page('<meta charset="windows-1252">'), "cp1252", "text/html", b""),
+        (
+            "cp1252_http_equiv",
+            _page('<meta http-equiv="Content-Type" content="text/html; charset=ISO-8859-1">'),
+            "cp1252",
+            "text/html",
+            b"",
+        ),
+        ("latin1_header", _page(None), "cp1252", "text/html; charset=iso-8859-1", b""),
+        ("cp1252_bare", _page(None), "cp1252", "text/html", b""),
+        ("xhtml_utf8_bare", _page(None), "utf-8", "application/xhtml+xml", b""),
+        ("big_utf8_bare", _page(None, big), "utf-8", "text/html", b""),
+        ("big_cp1252_bare", _page(None, big), "cp1252", "text/html", b""),
+    ]
+    pages = []
+    for name, text, encoding, content_type, bom in cases:
+        body = bom + text.encode(encoding, errors="replace")
+        pages.append((name, body, content_type, body[len(bom) :].decode(encoding)))
+    return pages
+
+
+def _header_charset(content_type: str) -> Optional[str]:
+    _, _, params = content_type.partition(";")
+    name, _, value = params.strip().partition("=")
+    return value if name.lower() == "charset" else None
+
+
+def _sniff(body: bytes, content_type: str) -> str:
+    return decode_html(body, _header_charset(content_type))
+
+
+def _resp_text(body: bytes, content_type: str) -> str:
+    encoding = get_encoding_from_headers({"content-type": content_type})
+    if encoding is None:
+        encoding = from_bytes(body).best().encoding
+    return body.decode(encoding, errors="replace")
+
+
+def _whole_body(body: bytes, content_type: str) -> str:
+    return str(from_bytes(body).best())
+
+
+DECODERS: Dict[str, Callable[[bytes, str], str]] = {
+    "sniff": _sniff,
+    "resp_text": _resp_text,
+    "whole_body": _whole_body,
+}
+
+
+def _timed(fn: Callable[[], object], iterations: int) -> Dict[str, float]:
+    fn()
+    latencies = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    return {
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    failures = []
+    report = {}
+    for name, body, content_type, expected in corpus():
+        encoding, source = sniff_charset(body, _header_charset(content_type))
+        entry = {"bytes": len(body), "sniffed": f"{encoding} ({source})"}
+        for decoder, fn in DECODERS.items():
+            correct = fn(body, content_type) == expected
+            entry[decoder] = {"correct": correct, **_timed(lambda: fn(body, content_type), args.iterations)}
+            if decoder == "sniff" and not correct:
+                failures.append(f"{name}: decoded text differs (sniffed {encoding} from {source})")
+        report[name] = entry
+
+    print(json.dumps(report, indent=2))
+    totals = {
+        decoder: {
+            "correct": sum(entry[decoder]["correct"] for entry in report.values()),
+            "p50_ms_sum": round(sum(entry[decoder]["p50_ms"] for entry in report.values()), 2),
+        }
+        for decoder in DECODERS
+    }
+    print(json.dumps({"pages": len(report), "totals": totals}, indent=2))
+    if failures:
+        raise SystemExit("FAIL: " + "; ".join(failures))
+    print("charset checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/bench_db_query_overhead.py
+"""
+Per-query overhead of MySQLConnector.execute_query on a local MariaDB/MySQL:
+plain text queries against cached server-side prepared statements (binary
+protocol), and dict against tuple/namedtuple rows for a bulk read.
+
+    docker run -d --rm -p 3306:3306 -e MARIADB_ROOT_PASSWORD=bench -e MARIADB_DATABASE=deanna mariadb:11
+    DB_HOST=127.0.0.1 DB_USERNAME=root DB_PASSWORD=bench DB_DATABASE=deanna \\
+        python -m benchmarks.bench_db_query_overhead --iterations 2000
+
+Cases: the slug lookup, the 28-column cliperest_book insert (create_book) and a
+--bulk-rows read of cliperest_clipping, all on one long-lived connection (see
+benchmarks.bench_statement_cache for the connect-per-call pattern the app uses). Reports mean and p95 microseconds per
+call; rows written are deleted at the end. Needs the same tables as
+benchmarks.db_contract (created if missing).
+"""
+import argparse
+import contextlib
+import io
+import json
+import time
+import uuid
+
+from MySQLConnector import MySQLConnector
+from benchmarks.db_contract import SCHEMA, book_data, clipping_data
+from benchmarks.harness import percentile
+from deanna2u_books import SLUG_LOOKUP_SQL
+
+BULK_SQL = "SELECT id, book_id, caption, url, num, created FROM cliperest_clipping WHERE book_id = %s"
+
+
+def timed(fn, iterations: int) -> dict:
+    latencies = []
+    # create_book prints a line per insert
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn()  # prepares the statement / warms the connection
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            fn()
+            latencies.append(time.perf_counter() - t0)
+    return {
+        "mean_us": round(sum(latencies) / len(latencies) * 1e6, 1),
+        "p95_us": round(percentile(latencies, 0.95) * 1e6, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--bulk-rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    db = MySQLConnector()
+    db.connect()
+    if db.connection is None:
+        raise SystemExit("FAIL: cannot connect with the DB_* settings")
+    db.prepared_statements = True
+
+    tag = uuid.uuid4().hex[:8]
+    book_ids = []
+    bulk_book = None
+    try:
+        for ddl in SCHEMA:
+            db.execute_query(ddl)
+        slug = f"bench-{tag}"
+        bulk_book = db.create_book(book_data(slug))
+        for start in range(0, args.bulk_rows, 500):
+            db.create_clippings_batch([clipping_data(bulk_book, i) for i in range(start, min(start + 500, args.bulk_rows))])
+
+        report = {"iterations": args.iterations, "bulk_rows": args.bulk_rows}
+        for prepared in (False, True):
+            mode = "prepared" if prepared else "text"
+            report[f"slug_lookup_{mode}"] = timed(
+                lambda: db.execute_query(SLUG_LOOKUP_SQL, (slug,), prepared=prepared), args.iterations
+            )
+
+            if not prepared:
+                # MySQLConnector.create_book runs on one-shot connections, always as text
+                report["book_insert_text"] = timed(
+                    lambda: book_ids.append(db.create_book(book_data(f"bench-{tag}-{len(book_ids)}"))), args.iterations
+                )
+
+            for row_format in ("dict", "tuple", "namedtuple"):
+                report[f"bulk_read_{row_format}_{mode}"] = timed(
+                    lambda: db.execute_query(BULK_SQL, (bulk_book,), prepared=prepared, row_format=row_format),
+                    max(1, args.iterations // 20),
+                )
+    finally:
+        db.execute_query("DELETE FROM cliperest_clipping WHERE book_id = %s", (bulk_book,))
+        db.execute_query("DELETE FROM cliperest_book WHERE slug LIKE %s", (f"bench-{tag}%",))
+        db.disconnect()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
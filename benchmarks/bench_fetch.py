@@ -0,0 +1,219 @@
+# benchmarks/bench_fetch.py
+"""
+Bounded page downloads (web_utils.download): what gets read, and how fast, for
+the kinds of links that reach /summarize_url.
+
+A local server plays the publisher:
+- /article.html      the fixture article
+- /long.html         the fixture with ~2 MB of comments/related news after </article>
+- /huge.html         8 MB of HTML without Content-Length (read until the cap)
+- /video.mp4         50 MB video/mp4 (refused from the headers)
+- /report.pdf        a PDF link, served as application/pdf
+- /download          the same PDF as application/octet-stream
+- /big.pdf           a PDF over the size cap, Content-Length declared
+
+Each case is checked (kind, error, early stop) and reported with bytes kept and
+fetch + extract time; HTML pages also next to the old path (requests.get,
+resp.text, extract_text_from_html on the whole page). Any mismatch fails the run.
+
+    python -m benchmarks.bench_fetch
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("DEANNA2U_API_KEY", "bench")
+os.environ.setdefault("MAX_HTML_BYTES", str(5 * 1024 * 1024))
+os.environ.setdefault("MAX_PDF_BYTES", str(4 * 1024 * 1024))
+
+import requests  # noqa: E402
+
+from benchmarks.bench_pdf_extract import make_pdf  # noqa: E402
+from benchmarks.harness import percentile  # noqa: E402
+from benchmarks.stubs import load_fixture  # noqa: E402
+from web_utils import (  # noqa: E402
+    BOT_HEADERS,
+    DownloadTooLargeError,
+    UnsupportedContentError,
+    download,
+    extract_text_from_download,
+    extract_text_from_html,
+)
+
+WRITE_CHUNK = 64 * 1024
+
+
+def _padding(size: int) -> bytes:
+    block = (
+        '<section class="comments"><div class="comment"><p>Comentario de un lector sobre la noticia, '
+        'con enlaces a <a href="/relacionadas">noticias relacionadas</a>.</p></div></section>\n'
+        '<article class="related"><h3>Otra noticia</h3><p>Entradilla.</p></article>\n'
+    ).encode("utf-8")
+    return block * (size // len(block) + 1)
+
+
+def _routes() -> Dict[str, Tuple[str, Optional[bytes], int, bool]]:
+    """path -> (content type, body or None for a generated stream, size, send Content-Length)"""
+    article = load_fixture("article.html").encode("utf-8")
+    cut = article.rindex(b"</body>")
+    long_page = article[:cut] + _padding(2 * 1024 * 1024) + article[cut:]
+    pdf = make_pdf(20)
+    return {
+        "/article.html": ("text/html; charset=utf-8", article, len(article), True),
+        "/long.html": ("text/html; charset=utf-8", long_page, len(long_page), True),
+        "/huge.html": ("text/html", None, 8 * 1024 * 1024, False),
+        "/video.mp4": ("video/mp4", None, 50 * 1024 * 1024, True),
+        "/report.pdf": ("application/pdf", pdf, len(pdf), True),
+        "/download": ("application/octet-stream", pdf, len(pdf), True),
+        "/big.pdf": ("application/pdf", None, 6 * 1024 * 1024, True),
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        route = self.server.routes.get(self.path)
+        if route is None:
+            self.send_error(404)
+            return
+        content_type, body, size, declare_length = route
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        if declare_length:
+            self.send_header("Content-Length", str(size))
+        else:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        filler = _padding(WRITE_CHUNK)[:WRITE_CHUNK]
+        sent = 0
+        try:
+            while sent < size:
+                piece = body[sent : sent + WRITE_CHUNK] if body is not None else filler[: size - sent]
+                self.wfile.write(piece)
+                sent += len(piece)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client stopped reading, which is the point
+        self.server.sent[self.path] = self.server.sent.get(self.path, 0) + sent
+
+
+class _QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass  # connections the client dropped mid-response
+
+
+class _Publisher:
+    def __init__(self):
+        self.httpd = _QuietServer(("127.0.0.1", 0), _Handler)
+        self.httpd.routes = _routes()
+        self.httpd.sent = {}
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def url(self, path: str) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}{path}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# path -> (expected kind or error, expect an early stop)
+EXPECTED = {
+    "/article.html": ("html", True),
+    "/long.html": ("html", True),
+    "/huge.html": ("DownloadTooLargeError", False),
+    "/video.mp4": ("UnsupportedContentError", False),
+    "/report.pdf": ("pdf", False),
+    "/download": ("pdf", False),
+    "/big.pdf": ("DownloadTooLargeError", False),
+}
+
+
+def _fetch_new(url: str) -> Tuple[str, int, bool, int]:
+    """(kind or error name, bytes kept, stopped early, extracted chars)"""
+    try:
+        doc = download(url)
+    except (UnsupportedContentError, DownloadTooLargeError) as e:
+        return type(e).__name__, 0, False, 0
+    return doc.kind, len(doc.body), doc.truncated, len(extract_text_from_download(doc))
+
+
+def _fetch_old(url: str) -> int:
+    resp = requests.get(url, timeout=60, headers=BOT_HEADERS)
+    return len(extract_text_from_html(resp.text))
+
+
+def _timed(fn, iterations: int) -> Dict[str, float]:
+    latencies = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    return {
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    failures: List[str] = []
+    report = {}
+    with _Publisher() as publisher:
+        for path, (want, want_stop) in EXPECTED.items():
+            url = publisher.url(path)
+            got, kept, stopped, chars = _fetch_new(url)
+            if got != want:
+                failures.append(f"{path}: got {got}, expected {want}")
+            if stopped != want_stop:
+                failures.append(f"{path}: early stop {stopped}, expected {want_stop}")
+            if got in ("html", "pdf") and not chars:
+                failures.append(f"{path}: no text extracted")
+
+            publisher.httpd.sent.clear()
+            entry = {
+                "result": got,
+                "served_bytes": publisher.httpd.routes[path][2],
+                "kept_bytes": kept,
+                "chars": chars,
+                "fetch_extract": _timed(lambda: _fetch_new(url), args.iterations),
+            }
+            # the server counts what it managed to write before the client hung up
+            entry["written_bytes_per_call"] = sum(publisher.httpd.sent.values()) // args.iterations
+            if want == "html":
+                entry["old_fetch_extract"] = _timed(lambda: _fetch_old(url), args.iterations)
+            report[path] = entry
+
+        # the cut keeps the whole story: same extracted text as the full page
+        full = download(publisher.url("/long.html"), stop_after_article=False)
+        cut = download(publisher.url("/long.html"))
+        if extract_text_from_download(full)[:2000] != extract_text_from_download(cut)[:2000]:
+            failures.append("/long.html: article text differs after the early stop")
+
+    print(json.dumps(report, indent=2))
+    if failures:
+        raise SystemExit("FAIL: " + "; ".join(failures))
+    print("fetch checks passed")
+
+
+if __name__ == "__main__":
+    main()
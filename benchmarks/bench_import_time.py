@@ -0,0 +1,88 @@
+# benchmarks/bench_import_time.py
+"""
+Cold import time of the API module (what an autoscaled worker pays before it
+can accept connections), measured with `python -X importtime` in fresh
+interpreters. Fails if the median exceeds --budget-ms or if a module that should
+be deferred to first use (OpenAI SDK, pandas, numpy, mysql.connector, bs4, requests,
+PyPDF2) is imported eagerly.
+
+    python -m benchmarks.bench_import_time --runs 5 --budget-ms 800
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+DEFERRED = ("openai", "pandas", "numpy", "mysql.connector", "bs4", "requests", "PyPDF2")
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "bench")
+    env.setdefault("DEANNA2U_API_KEY", "bench")
+    env.setdefault("JOBS_DB", os.path.join(tempfile.mkdtemp(), "jobs.sqlite"))
+    return env
+
+
+def _import_once(module: str, env: dict):
+    """
+    Returns ({module: (self_us, cumulative_us)}, eagerly imported deferred modules).
+    """
+    probe = f"import sys, {module}; print(','.join(m for m in {DEFERRED!r} if m in sys.modules))"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    timings = {}
+    for line in proc.stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            timings[m.group(4)] = (int(m.group(1)), int(m.group(2)))
+    eager = [m for m in proc.stdout.strip().split(",") if m]
+    return timings, eager
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=800.0)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    env = _env()
+    totals, eager, last = [], [], {}
+    for _ in range(args.runs):
+        last, eager = _import_once(args.module, env)
+        totals.append(last[args.module][1] / 1000.0)
+
+    heaviest = sorted(last.items(), key=lambda kv: kv[1][0], reverse=True)[: args.top]
+    median_ms = statistics.median(totals)
+    report = {
+        "module": args.module,
+        "runs": args.runs,
+        "median_ms": round(median_ms, 1),
+        "min_ms": round(min(totals), 1),
+        "budget_ms": args.budget_ms,
+        "eagerly_imported": eager,
+        "heaviest_self_ms": {name: round(self_us / 1000.0, 1) for name, (self_us, _) in heaviest},
+    }
+    print(json.dumps(report, indent=2))
+
+    if eager:
+        raise SystemExit(f"FAIL: imported at startup, should be deferred: {', '.join(eager)}")
+    if median_ms > args.budget_ms:
+        raise SystemExit(f"FAIL: import of {args.module} took {median_ms:.0f}ms (budget {args.budget_ms:.0f}ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/bench_metrics_overhead.py
+"""
+Micro-benchmark of the per-request cost of the instrumentation in metrics.py:
+the ASGI middleware around a trivial app, plus the stage() timers a typical
+/summarize_url request goes through. Fails if the added cost exceeds --budget-us.
+
+    python -m benchmarks.bench_metrics_overhead
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from metrics import MetricsMiddleware, record_cache, record_openai_usage, render, stage
+
+STAGES = ("fetch", "parse", "llm_summary", "llm_topics")
+
+
+class _Route:
+    path = "/summarize_url"
+
+
+async def _bare_app(scope, receive, send):
+    scope["route"] = _Route()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    return None
+
+
+class _Usage:
+    prompt_tokens = 1200
+    completion_tokens = 90
+    prompt_tokens_details = None
+
+
+async def _time_asgi(app, n: int) -> float:
+    scope = {"type": "http", "method": "POST", "path": "/summarize_url"}
+    t0 = time.perf_counter()
+    for _ in range(n):
+        await app(dict(scope), _receive, _send)
+    return time.perf_counter() - t0
+
+
+def _time_stages(n: int) -> float:
+    usage = _Usage()
+    t0 = time.perf_counter()
+    for _ in range(n):
+        for name in STAGES:
+            with stage(name):
+                pass
+        record_cache("singleflight", False)
+        record_openai_usage("gpt-4o-mini", usage, prompt="summary@v2")
+        record_openai_usage("gpt-4o-mini", usage, prompt="topics@v2")
+    return time.perf_counter() - t0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50000)
+    parser.add_argument("--budget-us", type=float, default=50.0, help="max added microseconds per request")
+    args = parser.parse_args()
+
+    n = args.requests
+    bare = asyncio.run(_time_asgi(_bare_app, n))
+    wrapped = asyncio.run(_time_asgi(MetricsMiddleware(_bare_app), n))
+    stages = _time_stages(n)
+
+    t0 = time.perf_counter()
+    exposition = render()
+    render_ms = (time.perf_counter() - t0) * 1000
+
+    middleware_us = max(0.0, wrapped - bare) / n * 1e6
+    stages_us = stages / n * 1e6
+    report = {
+        "requests": n,
+        "middleware_us_per_request": round(middleware_us, 2),
+        "stages_and_counters_us_per_request": round(stages_us, 2),
+        "total_us_per_request": round(middleware_us + stages_us, 2),
+        "render_ms": round(render_ms, 3),
+        "exposition_lines": exposition.count("\n"),
+    }
+    print(json.dumps(report, indent=2))
+
+    if middleware_us + stages_us > args.budget_us:
+        raise SystemExit(f"FAIL: instrumentation costs more than {args.budget_us}us per request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# benchmarks/bench_near_duplicates.py
+"""
+Near-duplicate index (near_duplicates.py) on a synthetic corpus: indexing
+throughput into a fresh SQLite file, then lookup latency and accuracy for
+republished variants of indexed articles (new headline, byline, one rewritten
+span of random length) and for unseen articles.
+
+Accuracy is measured against the exact Jaccard similarity J of the shingle
+sets. Variants right at the threshold are found about half the time (the
+estimate is noisy either way), so the gated recall is over variants with
+J >= threshold + --margin. Fails if that recall < --min-recall, or if any
+lookup returns the wrong article or matches an unseen one.
+
+    python -m benchmarks.bench_near_duplicates --docs 1000000 --queries 1000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Iterator, List
+
+import near_duplicates
+from benchmarks.harness import percentile
+from near_duplicates import NearDuplicateIndex, minhash, shingle_hashes
+
+SYLLABLES = "ba be bi bo bu ca ce ci co cu da de di do du la le li lo lu ma me mi mo mu na ne ni no nu pa pe pi po pu ra re ri ro ru sa se si so su ta te ti to tu".split()
+
+
+def make_vocabulary(size: int, rng: random.Random) -> List[str]:
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def make_doc(rng: random.Random, vocab: List[str], words: int) -> str:
+    tokens = rng.choices(vocab, k=words)
+    # paragraphs of ~50 words, as extracted article text
+    return "\n\n".join(" ".join(tokens[i : i + 50]) for i in range(0, words, 50))
+
+
+def republish(text: str, rng: random.Random, vocab: List[str]) -> str:
+    """New headline, a byline and one rewritten span of 0-80 words."""
+    tokens = text.split()
+    tokens[:12] = rng.choices(vocab, k=12)
+    span = rng.randint(0, 80)
+    start = rng.randint(12, max(12, len(tokens) - span))
+    tokens[start : start + span] = rng.choices(vocab, k=span)
+    return "Madrid, 3 ene (EUROPA PRESS) " + " ".join(tokens)
+
+
+def jaccard(a: str, b: str) -> float:
+    sa, sb = set(shingle_hashes(a).tolist()), set(shingle_hashes(b).tolist())
+    return len(sa & sb) / len(sa | sb) if sa and sb else 0.0
+
+
+def retention_failures(rng: random.Random, vocab: List[str], words: int) -> List[str]:
+    """purge() drops expired articles from both tables and keeps the rest findable."""
+    db_path = os.path.join(tempfile.mkdtemp(prefix="neardup-retention-"), "near_duplicates.sqlite")
+    index = NearDuplicateIndex(db_path, max_age=3600)
+    texts = [make_doc(rng, vocab, words) for _ in range(20)]
+    index.add_many((text, f"resumen {i}", ["tema"]) for i, text in enumerate(texts))
+    conn = index._conn()
+    conn.execute("UPDATE docs SET created_at = created_at - 7200 WHERE id <= 10")
+
+    failures = []
+    if index.purge() != 10:
+        failures.append("purge() did not delete the 10 expired articles")
+    if len(index) != 10:
+        failures.append(f"{len(index)} articles left after purge, expected 10")
+    if conn.execute("SELECT COUNT(*) FROM lsh WHERE doc_id <= 10").fetchone()[0]:
+        failures.append("bucket rows of purged articles are left behind")
+    if index.lookup(texts[0]) is not None or index.lookup(texts[-1]) is None:
+        failures.append("lookups after purge don't match what was kept")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=1_000_000)
+    parser.add_argument("--words", type=int, default=300, help="words per synthetic article")
+    parser.add_argument("--vocabulary", type=int, default=30000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--threshold", type=float, default=near_duplicates.DEFAULT_THRESHOLD)
+    parser.add_argument("--margin", type=float, default=0.05)
+    parser.add_argument("--min-recall", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocab = make_vocabulary(args.vocabulary, rng)
+    failures = retention_failures(rng, vocab, args.words)
+    if failures:
+        raise SystemExit("FAIL: " + "; ".join(failures))
+    step = max(1, args.docs // args.queries)
+    originals = {}
+
+    def corpus() -> Iterator:
+        for i in range(args.docs):
+            text = make_doc(rng, vocab, args.words)
+            if i % step == 0 and len(originals) < args.queries:
+                originals[i] = text
+            yield text, f"resumen {i}", ["tema a", "tema b", "tema c"]
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="neardup-"), "near_duplicates.sqlite")
+    index = NearDuplicateIndex(db_path, threshold=args.threshold)
+
+    t0 = time.perf_counter()
+    indexed = index.add_many(corpus())
+    index_seconds = time.perf_counter() - t0
+
+    # signature cost alone, on the same kind of text
+    sample = [make_doc(rng, vocab, args.words) for _ in range(2000)]
+    t0 = time.perf_counter()
+    for text in sample:
+        minhash(text)
+    signature_us = (time.perf_counter() - t0) / len(sample) * 1e6
+
+    latencies = []
+    eligible = found = clear = clear_found = wrong = 0
+    for i, original in originals.items():
+        variant = republish(original, rng, vocab)
+        true_j = jaccard(original, variant)
+        t0 = time.perf_counter()
+        match = index.lookup(variant)
+        latencies.append(time.perf_counter() - t0)
+        hit = bool(match and match.doc_id == i + 1)
+        if true_j >= args.threshold:
+            eligible += 1
+            found += hit
+        if true_j >= args.threshold + args.margin:
+            clear += 1
+            clear_found += hit
+        if match and match.doc_id != i + 1:
+            wrong += 1
+
+    false_positives = 0
+    for _ in range(args.queries):
+        text = make_doc(rng, vocab, args.words)
+        t0 = time.perf_counter()
+        match = index.lookup(text)
+        latencies.append(time.perf_counter() - t0)
+        false_positives += match is not None
+
+    recall = clear_found / clear if clear else 1.0
+    report = {
+        "docs": indexed,
+        "words_per_doc": args.words,
+        "threshold": args.threshold,
+        "index_docs_per_s": round(indexed / index_seconds, 1),
+        "index_seconds": round(index_seconds, 1),
+        "minhash_us_per_doc": round(signature_us, 1),
+        "db_mb": round(sum(os.path.getsize(db_path + ext) for ext in ("", "-wal") if os.path.exists(db_path + ext)) / 1e6, 1),
+        "lookup_qps": round(len(latencies) / sum(latencies), 1),
+        "lookup_p50_ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "lookup_p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "variants_above_threshold": eligible,
+        "recall_at_threshold": round(found / eligible, 4) if eligible else 1.0,
+        "variants_above_margin": clear,
+        "recall": round(recall, 4),
+        "wrong_matches": wrong,
+        "unseen_false_positives": false_positives,
+    }
+    print(json.dumps(report, indent=2))
+
+    if recall < args.min_recall:
+        raise SystemExit(f"FAIL: recall {recall:.3f} below {args.min_recall:.3f}")
+    if false_positives or wrong:
+        raise SystemExit(f"FAIL: {false_positives} unseen articles and {wrong} variants matched the wrong article")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/bench_pdf_extract.py
+"""
+Benchmark pdf_utils.extract_text_from_pdf on generated multi-hundred-page PDFs.
+
+    python -m benchmarks.bench_pdf_extract --pages 300 --pages 600
+"""
+import argparse
+import json
+import os
+import time
+from typing import List
+
+from pdf_utils import DEFAULT_MAX_CHARS, extract_text_from_pdf
+
+LOREM = (
+    "El Gobierno ha aprobado hoy en el Consejo de Ministros un nuevo paquete de medidas "
+    "para impulsar el turismo rural y la rehabilitación de viviendas en la España vaciada."
+)
+
+
+def _escape_pdf_text(s: str) -> str:
+    return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(num_pages: int, lines_per_page: int = 40) -> bytes:
+    """
+    Builds a minimal, valid PDF with `num_pages` pages of Helvetica text.
+    Only the stdlib is used so the benchmark does not need a PDF writer.
+    """
+    line = _escape_pdf_text(LOREM.encode("latin-1", "replace").decode("latin-1"))
+    objects: List[bytes] = []
+
+    # 1: catalog, 2: pages, 3: font; then (page, content) pairs.
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(num_pages))
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {num_pages} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    for i in range(num_pages):
+        ops = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td", f"(Pagina {i + 1}) Tj"]
+        ops += [f"T* ({line}) Tj" for _ in range(lines_per_page)]
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode()
+        )
+        objects.append(
+            f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream"
+        )
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{num} 0 obj\n".encode() + body + b"\nendobj\n"
+
+    xref_pos = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for off in offsets:
+        out += f"{off:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_pos}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, action="append", help="page counts (repeatable)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    results = []
+    for num_pages in args.pages or [300, 600]:
+        data = make_pdf(num_pages)
+        cases = {
+            "serial_full": lambda: extract_text_from_pdf(data, max_chars=None, backend="pypdf2"),
+            "serial_budget": lambda: extract_text_from_pdf(data, max_chars=DEFAULT_MAX_CHARS, backend="pypdf2"),
+            "parallel_full": lambda: extract_text_from_pdf(
+                data, max_chars=None, workers=args.workers, backend="pypdf2"
+            ),
+            "parallel_budget": lambda: extract_text_from_pdf(
+                data, max_chars=DEFAULT_MAX_CHARS, workers=args.workers, backend="pypdf2"
+            ),
+            "auto_budget": lambda: extract_text_from_pdf(data, max_chars=DEFAULT_MAX_CHARS),
+            "auto_full": lambda: extract_text_from_pdf(data, max_chars=None),
+        }
+        if cases["parallel_full"]() != cases["serial_full"]():
+            raise SystemExit(f"FAIL: parallel extraction of {num_pages} pages differs from serial")
+        for name, fn in cases.items():
+            seconds = _time(fn, args.repeat)
+            results.append({"pages": num_pages, "case": name, "seconds": round(seconds, 4)})
+            print(json.dumps(results[-1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# benchmarks/bench_prompt_cache.py
+"""
+Prompt layout versus OpenAI's automatic prompt caching. Runs the summary and
+topics calls for a set of distinct articles against the OpenAI stub (which
+reports cached_tokens the way the API does: exact prefix, 1024+ tokens, 128-token
+steps) with the old f-string prompts and with the prompts.py registry.
+
+Reports prompt/cached tokens per call type and the input cost at gpt-4o-mini
+prices. Fails if the registry layout caches less than --min-cached-share of all
+prompt tokens.
+
+    python -m benchmarks.bench_prompt_cache --articles 20
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, List
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("DEANNA2U_API_KEY", "bench")
+os.environ.setdefault("JOBS_DB", os.path.join(tempfile.mkdtemp(), "jobs.sqlite"))
+os.environ.setdefault("OPENAI_RPM", "0")
+
+from openai import OpenAI  # noqa: E402
+
+import summarizer  # noqa: E402
+from benchmarks.stubs import OpenAIStub  # noqa: E402
+
+# USD per 1M input tokens, gpt-4o-mini
+INPUT_PRICE = 0.15
+CACHED_INPUT_PRICE = 0.075
+
+WORDS = (
+    "gobierno comunidad plan ayudas empresas empleo inversión vivienda turismo energía renovable "
+    "municipios presupuesto millones euros datos informe crecimiento sector consumo hogares región "
+    "transporte público sanidad educación digitalización industria exportaciones agricultura agua"
+).split()
+
+
+def make_article(rng: random.Random, paragraphs: int) -> str:
+    return "\n\n".join(
+        " ".join(
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(12, 22))).capitalize() + "."
+            for _ in range(rng.randint(3, 5))
+        )
+        for _ in range(paragraphs)
+    )
+
+
+# ----------------------------
+# Layout before prompts.py
+# ----------------------------
+def legacy_summary_messages(article_text: str) -> List[Dict[str, str]]:
+    trimmed = summarizer._trim_article(article_text)
+    return [
+        {
+            "role": "system",
+            "content": (
+                "Eres un periodista. Resume el artículo de forma clara y neutral.\n"
+                "Devuelve SOLO el resumen en español, en 2-3 frases, sin títulos, sin viñetas."
+            ),
+        },
+        {"role": "user", "content": f"ARTÍCULO:\n{trimmed}"},
+    ]
+
+
+def legacy_topics_messages(article_text: str, n: int = 3) -> List[Dict[str, str]]:
+    trimmed = summarizer._trim_article(article_text)
+    return [
+        {
+            "role": "system",
+            "content": (
+                "Eres un experto en marketing digital especializado en identificar oportunidades "
+                "comerciales y publicitarias en artículos periodísticos.\n\n"
+                f"Tu objetivo es extraer {n} temas comerciales del artículo.\n\n"
+                "FORMATO DE RESPUESTA:\n"
+                f"- Devuelve EXACTAMENTE {n} búsquedas comerciales, una por línea.\n"
+                "- Sin numeración, sin viñetas, sin explicaciones.\n"
+                "- Cada búsqueda debe tener MÁXIMO 6 palabras.\n"
+                "- Deben ser específicas y con intención comercial.\n"
+            ),
+        },
+        {
+            "role": "user",
+            "content": (
+                f"Analiza el siguiente artículo e identifica EXACTAMENTE {n} búsquedas comerciales.\n\n"
+                "ARTÍCULO:\n"
+                f"{trimmed}"
+            ),
+        },
+    ]
+
+
+@contextmanager
+def legacy_layout():
+    builders = summarizer.build_summary_messages, summarizer.build_topics_messages
+    summarizer.build_summary_messages = legacy_summary_messages
+    summarizer.build_topics_messages = legacy_topics_messages
+    try:
+        yield
+    finally:
+        summarizer.build_summary_messages, summarizer.build_topics_messages = builders
+
+
+@contextmanager
+def usage_capture(totals: Dict[str, Dict[str, int]]):
+    record = summarizer.record_openai_usage
+
+    def capture(model, usage, prompt=""):
+        record(model, usage, prompt=prompt)
+        row = totals.setdefault(prompt.split("@")[0], {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0})
+        row["calls"] += 1
+        row["prompt_tokens"] += usage.prompt_tokens
+        details = usage.prompt_tokens_details
+        row["cached_tokens"] += (details.cached_tokens or 0) if details else 0
+
+    summarizer.record_openai_usage = capture
+    try:
+        yield
+    finally:
+        summarizer.record_openai_usage = record
+
+
+def run_layout(base_url: str, articles: List[str], n: int) -> Dict:
+    summarizer.client = OpenAI(base_url=base_url, api_key="bench", max_retries=0)
+    totals: Dict[str, Dict[str, int]] = {}
+    with usage_capture(totals):
+        for text in articles:
+            summarizer.summarize_article_overall(text)
+            summarizer.summarize_spanish_article_multi(text, n=n)
+
+    prompt_tokens = sum(row["prompt_tokens"] for row in totals.values())
+    cached = sum(row["cached_tokens"] for row in totals.values())
+    cost = ((prompt_tokens - cached) * INPUT_PRICE + cached * CACHED_INPUT_PRICE) / 1e6
+    return {
+        "by_prompt": totals,
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached,
+        "cached_share": round(cached / prompt_tokens, 3) if prompt_tokens else 0.0,
+        "input_cost_usd": round(cost, 6),
+        "input_cost_per_article_usd": round(cost / len(articles), 7),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=20)
+    parser.add_argument("--paragraphs", type=int, default=14, help="paragraphs per article (~150 tokens each)")
+    parser.add_argument("--topics", type=int, default=3)
+    parser.add_argument("--min-cached-share", type=float, default=0.3)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    articles = [make_article(rng, args.paragraphs) for _ in range(args.articles)]
+
+    # separate stubs so the second layout doesn't hit prefixes cached by the first
+    with OpenAIStub(first_token_latency=0.0, token_delay=0.0) as stub:
+        with legacy_layout():
+            before = run_layout(stub.base_url, articles, args.topics)
+    with OpenAIStub(first_token_latency=0.0, token_delay=0.0) as stub:
+        after = run_layout(stub.base_url, articles, args.topics)
+
+    saved = before["input_cost_usd"] - after["input_cost_usd"]
+    report = {
+        "articles": args.articles,
+        "legacy_layout": before,
+        "prompt_registry": after,
+        "input_cost_saved_pct": round(100 * saved / before["input_cost_usd"], 1) if before["input_cost_usd"] else 0.0,
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if after["cached_share"] < args.min_cached_share:
+        raise SystemExit(
+            f"FAIL: cached share {after['cached_share']:.2f} below {args.min_cached_share:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
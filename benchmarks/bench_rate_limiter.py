@@ -0,0 +1,118 @@
+# benchmarks/bench_rate_limiter.py
+"""
+Throughput of summarizer calls against a simulated rate-limited OpenAI stub.
+
+The stub enforces a server-side requests/sec budget and answers 429 with a
+retry-after header when it is exceeded. Compares fixed concurrency without the
+client-side limiter against the shared token bucket + AIMD concurrency.
+
+    python -m benchmarks.bench_rate_limiter --calls 200 --threads 32 --server-rps 20
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import httpx
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+import summarizer  # noqa: E402
+from openai import RateLimitError  # noqa: E402
+from rate_limiter import AdaptiveConcurrency, TokenBucketLimiter  # noqa: E402
+
+ARTICLE = "El Ayuntamiento de Madrid ha presentado hoy su plan de movilidad sostenible. " * 60
+
+
+class RateLimitedStub:
+    """
+    Stand-in for client.chat.completions with a server-side token bucket.
+    """
+
+    def __init__(self, rps: float, latency: float):
+        self.rps = rps
+        self.latency = latency
+        self.level = rps
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.ok = 0
+        self.throttled = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, **kwargs):
+        with self.lock:
+            now = time.monotonic()
+            self.level = min(self.rps, self.level + (now - self.updated) * self.rps)
+            self.updated = now
+            if self.level < 1.0:
+                self.throttled += 1
+                retry_after = (1.0 - self.level) / self.rps
+                request = httpx.Request("POST", "http://stub/v1/chat/completions")
+                response = httpx.Response(429, headers={"retry-after-ms": str(int(retry_after * 1000) + 1)}, request=request)
+                raise RateLimitError("rate limited", response=response, body=None)
+            self.level -= 1.0
+            self.ok += 1
+
+        time.sleep(self.latency)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content="Resumen de prueba."))],
+            usage=SimpleNamespace(total_tokens=1000),
+        )
+
+
+def run_case(name: str, args, limiter, concurrency) -> dict:
+    stub = RateLimitedStub(rps=args.server_rps, latency=args.latency)
+    summarizer.client = stub
+    summarizer.limiter = limiter
+    summarizer.concurrency = concurrency
+
+    errors = 0
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        futures = [pool.submit(summarizer.summarize_article_overall, ARTICLE) for _ in range(args.calls)]
+        for f in futures:
+            try:
+                f.result()
+            except RateLimitError:
+                errors += 1
+    elapsed = time.perf_counter() - t0
+
+    return {
+        "case": name,
+        "calls": args.calls,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(stub.ok / elapsed, 2),
+        "upstream_429s": stub.throttled,
+        "failed_calls": errors,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--server-rps", type=float, default=20.0)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    fixed = AdaptiveConcurrency(initial=args.threads, min_limit=args.threads, max_limit=args.threads)
+    print(json.dumps(run_case("no_limiter", args, None, fixed)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # budget slightly under the server's so the bucket, not the 429s, paces the calls
+        limiter = TokenBucketLimiter(
+            path=os.path.join(tmp, "bucket.sqlite"),
+            rpm=args.server_rps * 60 * 0.95,
+            tpm=10_000_000,
+        )
+        # start with a small burst allowance, like a worker that has been idle for a second
+        limiter._update(lambda req, tok, blocked, now: (min(req, args.server_rps), tok, blocked, None))
+        print(json.dumps(run_case("token_bucket_aimd", args, limiter, AdaptiveConcurrency(initial=4))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+# benchmarks/bench_response_encoding.py
+"""
+Response encoding: JSON serialization time and bytes on the wire for the app's
+typical payloads (a /summarize response, /create_ministores, a finished job, a
+200-line /summarize_batch NDJSON body and a rendered ministore page).
+
+Serialization compares the stdlib path (jsonable_encoder + json.dumps, what
+JSONResponse does) with fast_json.dumps (orjson) and, for response models,
+pydantic-core's dump_json (what FastAPI uses for routes with a response_model).
+Wire bytes are raw vs gzip -6 vs brotli -4, with compression time.
+
+Then CompressionMiddleware is checked end to end through an ASGI client:
+negotiation, size threshold, streamed NDJSON, SSE left alone. Any mismatch
+fails the run.
+
+    python -m benchmarks.bench_response_encoding
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+import zlib
+from typing import Callable, Dict, List
+
+_TMP = tempfile.mkdtemp(prefix="encoding-")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("DEANNA2U_API_KEY", "bench")
+os.environ.setdefault("JOBS_DB", os.path.join(_TMP, "jobs.sqlite"))
+os.environ.setdefault("TOPIC_INDEX_DB", os.path.join(_TMP, "topic_index.sqlite"))
+os.environ.setdefault("PREWARM_DB", os.path.join(_TMP, "prewarm.sqlite"))
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import HTMLResponse, StreamingResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+import compression  # noqa: E402
+from benchmarks.harness import percentile  # noqa: E402
+from benchmarks.sqlite_db import SQLiteConnector, init_db  # noqa: E402
+from benchmarks.stubs import load_fixture  # noqa: E402
+from compression import BROTLI_QUALITY, GZIP_LEVEL, CompressionMiddleware  # noqa: E402
+from fast_json import dumps  # noqa: E402
+from main import CreateMinistoresResponse, JobResponse, SummarizeResponse  # noqa: E402
+from ministore_creator import render_ministore_html_from_db  # noqa: E402
+from web_utils import extract_text_from_html  # noqa: E402
+
+
+def _timed(fn: Callable[[], object], iterations: int) -> Dict[str, float]:
+    fn()
+    latencies = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    return {
+        "mean_us": round(sum(latencies) / len(latencies) * 1e6, 2),
+        "p95_us": round(percentile(latencies, 0.95) * 1e6, 2),
+    }
+
+
+def _article_summary() -> str:
+    return extract_text_from_html(load_fixture("article.html"))[:1200]
+
+
+def _shuffled(text: str, seed: int) -> str:
+    """Same vocabulary, different text per batch line (one fixture article would compress unrealistically well)."""
+    words = text.split()
+    random.Random(seed).shuffle(words)
+    return " ".join(words)
+
+
+def _ministore_html() -> str:
+    """A rendered ministore from the serper fixture, through the SQLite stand-in."""
+    path = os.path.join(_TMP, "deanna.sqlite")
+    init_db(path)
+    db = SQLiteConnector(path)
+    db.connect()
+    try:
+        ministore_id = uuid.uuid4().hex
+        db.execute_query(
+            "INSERT INTO ministores (id, topic, language, created_at) VALUES (%s, %s, %s, %s)",
+            (ministore_id, "bicicletas eléctricas", "es", int(time.time())),
+        )
+        for pos, item in enumerate(load_fixture("serper_search.json")["shopping"]):
+            db.execute_query(
+                "INSERT INTO ministore_items (id, title, description, url, keywords, language) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                (item["productId"], item["title"], item.get("source", ""), item["link"], "bicicletas", "es"),
+            )
+            db.execute_query(
+                "INSERT INTO ministore_item_map (ministore_id, item_id, pos) VALUES (%s, %s, %s)",
+                (ministore_id, item["productId"], pos),
+            )
+        return render_ministore_html_from_db(db, ministore_id)
+    finally:
+        db.disconnect()
+
+
+def payloads() -> Dict[str, object]:
+    summary = _article_summary()
+    topics = ["bicicletas eléctricas", "cascos de ciclismo urbano", "candados para bicicleta"]
+    book_urls = [f"https://www.deanna2u.com/book/ministore-{i}-19-10-2026-101500" for i in range(3)]
+    book_ids = [480312, 480313, 480314]
+    return {
+        "summarize": SummarizeResponse(summary=summary, topics=topics),
+        "create_ministores": CreateMinistoresResponse(book_urls=book_urls, book_ids=book_ids),
+        "job": JobResponse(
+            job_id=uuid.uuid4().hex,
+            status="done",
+            stage="ministores",
+            result={"summary": summary, "topics": topics, "book_urls": book_urls, "book_ids": book_ids},
+        ),
+        "batch_ndjson": [{"id": f"post-{i}", "summary": _shuffled(summary, i), "topics": topics} for i in range(200)],
+        "ministore_html": _ministore_html(),
+    }
+
+
+def serialization(items: Dict[str, object], iterations: int) -> Dict[str, Dict]:
+    report = {}
+    for name, payload in items.items():
+        if isinstance(payload, str):
+            continue
+        if isinstance(payload, list):
+            cases = {
+                "stdlib": lambda p=payload: "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in p).encode(),
+                "fast_json": lambda p=payload: b"".join(dumps(r) + b"\n" for r in p),
+            }
+        else:
+            adapter = TypeAdapter(type(payload))
+            cases = {
+                "stdlib": lambda p=payload: json.dumps(
+                    jsonable_encoder(p), ensure_ascii=False, separators=(",", ":")
+                ).encode("utf-8"),
+                "fast_json": lambda p=payload: dumps(p.model_dump()),
+                "pydantic_dump_json": lambda p=payload, a=adapter: a.dump_json(p),
+            }
+        report[name] = {case: _timed(fn, iterations) for case, fn in cases.items()}
+    return report
+
+
+def _body(payload: object) -> bytes:
+    if isinstance(payload, str):
+        return payload.encode("utf-8")
+    if isinstance(payload, list):
+        return b"".join(dumps(r) + b"\n" for r in payload)
+    return TypeAdapter(type(payload)).dump_json(payload)
+
+
+def wire_bytes(items: Dict[str, object], iterations: int) -> Dict[str, Dict]:
+    report = {}
+    for name, payload in items.items():
+        body = _body(payload)
+        gz = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        entry = {
+            "raw": len(body),
+            "gzip": len(gz.compress(body) + gz.flush()),
+            "gzip_us": _timed(lambda: zlib.compress(body, GZIP_LEVEL), iterations)["mean_us"],
+        }
+        if compression.brotli is not None:
+            entry["br"] = len(compression.brotli.compress(body, quality=BROTLI_QUALITY))
+            entry["br_us"] = _timed(lambda: compression.brotli.compress(body, quality=BROTLI_QUALITY), iterations)[
+                "mean_us"
+            ]
+        report[name] = entry
+    return report
+
+
+def _check_app(items: Dict[str, object], minimum_size: int) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=minimum_size)
+    ndjson_lines = [dumps(r) + b"\n" for r in items["batch_ndjson"]]
+
+    @app.get("/summarize", response_model=type(items["summarize"]))
+    async def summarize():
+        return items["summarize"]
+
+    @app.get("/small", response_model=type(items["create_ministores"]))
+    async def small():
+        return items["create_ministores"]
+
+    @app.get("/ndjson")
+    async def ndjson():
+        async def lines():
+            for line in ndjson_lines:
+                yield line
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.get("/html", response_class=HTMLResponse)
+    async def html():
+        return items["ministore_html"]
+
+    @app.get("/sse")
+    async def sse():
+        async def events():
+            for i in range(5):
+                yield f"event: summary\ndata: {json.dumps({'delta': 'x' * 400, 'i': i})}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+async def middleware_checks(items: Dict[str, object], minimum_size: int) -> List[str]:
+    failures = []
+    app = _check_app(items, minimum_size)
+    expected = {
+        "/summarize": _body(items["summarize"]),
+        "/small": _body(items["create_ministores"]),
+        "/ndjson": _body(items["batch_ndjson"]),
+        "/html": _body(items["ministore_html"]),
+    }
+    encodings = ["gzip", "identity", "gzip;q=0, identity"]
+    if compression.brotli is not None:
+        encodings += ["br, gzip", "gzip, br;q=0"]
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for accept in encodings:
+            want = compression.choose_encoding(accept)
+            for path, body in expected.items():
+                r = await client.get(path, headers={"Accept-Encoding": accept})
+                got = r.headers.get("content-encoding")
+                should = want if len(body) >= minimum_size or path == "/ndjson" else None
+                if got != should:
+                    failures.append(f"{path} [{accept}]: content-encoding {got!r}, expected {should!r}")
+                if r.content != body:
+                    failures.append(f"{path} [{accept}]: decoded body differs")
+                if got and "accept-encoding" not in r.headers.get("vary", "").lower():
+                    failures.append(f"{path} [{accept}]: no Vary: Accept-Encoding")
+            r = await client.get("/sse", headers={"Accept-Encoding": accept})
+            if "content-encoding" in r.headers:
+                failures.append(f"/sse [{accept}]: event stream was compressed")
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--minimum-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    items = payloads()
+    report = {
+        "serialization": serialization(items, args.iterations),
+        "wire_bytes": wire_bytes(items, max(1, args.iterations // 10)),
+    }
+    print(json.dumps(report, indent=2))
+
+    failures = asyncio.run(middleware_checks(items, args.minimum_size))
+    if failures:
+        raise SystemExit("FAIL: " + "; ".join(failures))
+    print("middleware checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# benchmarks/bench_singleflight.py
+"""
+Load test for request coalescing: many concurrent identical /summarize and
+/summarize_url requests against stubbed upstreams must produce exactly one
+upstream call each.
+
+    python -m benchmarks.bench_singleflight --requests 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("DEANNA2U_API_KEY", "bench")
+os.environ.setdefault("JOBS_DB", os.path.join(tempfile.mkdtemp(), "jobs.sqlite"))
+os.environ.setdefault("NEAR_DUPLICATE_THRESHOLD", "0")  # every request must reach the stubbed upstream
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+
+ARTICLE = "La Comunidad de Madrid abre el plazo de ayudas para la compra de bicicletas eléctricas. " * 40
+
+
+class Counter:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, result):
+        def fn(*args, **kwargs):
+            with self.lock:
+                self.calls += 1
+            time.sleep(self.latency)
+            return result
+
+        return fn
+
+
+async def _fire(client: httpx.AsyncClient, path: str, body: dict, n: int) -> float:
+    t0 = time.perf_counter()
+    responses = await asyncio.gather(*(client.post(path, json=body) for _ in range(n)))
+    elapsed = time.perf_counter() - t0
+    bad = [r.status_code for r in responses if r.status_code != 200]
+    if bad:
+        raise RuntimeError(f"{path}: unexpected statuses {bad[:5]}")
+    return elapsed
+
+
+async def cancelled_leader_failures() -> list:
+    """The first caller going away must not cancel, or fail, the callers sharing its work."""
+    from singleflight import SingleFlight
+
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"summary": "ok"}
+
+    leader = asyncio.ensure_future(flight.do("k", work))
+    await asyncio.sleep(0)
+    followers = [asyncio.ensure_future(flight.do("k", work)) for _ in range(3)]
+    await asyncio.sleep(0)
+    leader.cancel()
+    results = await asyncio.gather(*followers, return_exceptions=True)
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream")
+
+    errors = await asyncio.gather(*(flight.do("e", boom) for _ in range(3)), return_exceptions=True)
+
+    failures = []
+    if any(r != {"summary": "ok"} for r in results) or len(calls) != 1:
+        failures.append(f"followers of a cancelled leader got {results!r} after {len(calls)} calls")
+    if not all(isinstance(e, RuntimeError) for e in errors):
+        failures.append(f"fn's exception wasn't passed on as is: {errors!r}")
+    if flight._inflight:
+        failures.append("finished keys left in flight")
+    return failures
+
+
+async def run(args) -> None:
+    failures = await cancelled_leader_failures()
+    if failures:
+        raise SystemExit("FAIL: " + "; ".join(failures))
+
+    fetch = Counter(args.latency)
+    llm_summary = Counter(args.latency)
+    llm_topics = Counter(args.latency)
+    main.fetch_article_text = fetch(ARTICLE)
+    main.summarize_article_overall = llm_summary("Resumen.")
+    main.summarize_spanish_article_multi = llm_topics(["bicicletas eléctricas", "ayudas movilidad", "cascos ciclismo"])
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        t_text = await _fire(client, "/summarize", {"text": ARTICLE}, args.requests)
+        text_calls = (llm_summary.calls, llm_topics.calls)
+
+        # tracking params and fragments normalize to the same key
+        urls = [f"https://www.europapress.es/madrid/noticia/?utm_source=x{i % 3}#top" for i in range(args.requests)]
+        t0 = time.perf_counter()
+        await asyncio.gather(*(client.post("/summarize_url", json={"url": u}) for u in urls))
+        t_url = time.perf_counter() - t0
+
+    report = {
+        "requests": args.requests,
+        "summarize": {
+            "seconds": round(t_text, 3),
+            "upstream_summary_calls": text_calls[0],
+            "upstream_topics_calls": text_calls[1],
+        },
+        "summarize_url": {
+            "seconds": round(t_url, 3),
+            "upstream_fetches": fetch.calls,
+            "upstream_summary_calls": llm_summary.calls - text_calls[0],
+        },
+        "coalesced_followers": main.singleflight.followers,
+    }
+    print(json.dumps(report, indent=2))
+
+    ok = text_calls == (1, 1) and fetch.calls == 1 and llm_summary.calls == 2
+    if not ok:
+        raise SystemExit("FAIL: expected exactly one upstream call per distinct article")
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per stubbed upstream call")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main_cli()
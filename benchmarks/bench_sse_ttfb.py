@@ -0,0 +1,81 @@
+# benchmarks/bench_sse_ttfb.py
+"""
+Time-to-first-byte of /summarize/stream versus total latency of /summarize,
+against a local streaming OpenAI stub.
+
+    python -m benchmarks.bench_sse_ttfb --runs 10 --first-token 0.5 --token-delay 0.03
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("DEANNA2U_API_KEY", "bench")
+os.environ.setdefault("JOBS_DB", os.path.join(tempfile.mkdtemp(), "jobs.sqlite"))
+os.environ.setdefault("NEAR_DUPLICATE_THRESHOLD", "0")  # every request must reach the stubbed upstream
+os.environ.setdefault("OPENAI_RPM", "0")
+
+import httpx  # noqa: E402
+from openai import OpenAI  # noqa: E402
+
+import main  # noqa: E402
+import summarizer  # noqa: E402
+from benchmarks.harness import percentile, serve_app  # noqa: E402
+from benchmarks.stubs import OpenAIStub  # noqa: E402
+
+ARTICLE = "El Gobierno aprueba un plan de ayudas para el turismo rural en la España vaciada. " * 50
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--first-token", type=float, default=0.5)
+    parser.add_argument("--token-delay", type=float, default=0.03)
+    args = parser.parse_args()
+
+    with OpenAIStub(first_token_latency=args.first_token, token_delay=args.token_delay) as stub:
+        summarizer.client = OpenAI(base_url=stub.base_url, api_key="bench", max_retries=0)
+        blocking, ttfb, stream_total = [], [], []
+        with serve_app(main.app) as base, httpx.Client(base_url=base, timeout=60) as client:
+            for i in range(args.runs):
+                # vary the text so single-flight coalescing doesn't hide the work
+                body = {"text": f"{ARTICLE} ({i})"}
+
+                t0 = time.perf_counter()
+                r = client.post("/summarize", json=body)
+                r.raise_for_status()
+                blocking.append(time.perf_counter() - t0)
+
+                t0 = time.perf_counter()
+                first = None
+                with client.stream("POST", "/summarize/stream", json=body) as r:
+                    for line in r.iter_lines():
+                        if first is None and line.startswith("data:"):
+                            first = time.perf_counter() - t0
+                stream_total.append(time.perf_counter() - t0)
+                ttfb.append(first)
+
+    def summary(values):
+        return {
+            "p50_ms": round(statistics.median(values) * 1000, 1),
+            "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+        }
+
+    print(
+        json.dumps(
+            {
+                "runs": args.runs,
+                "summarize_total": summary(blocking),
+                "stream_ttfb": summary(ttfb),
+                "stream_total": summary(stream_total),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main_cli()
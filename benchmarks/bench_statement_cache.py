@@ -0,0 +1,126 @@
+# benchmarks/bench_statement_cache.py
+"""
+Prepared statements in the connect / query / disconnect pattern the app uses,
+on a local MariaDB/MySQL:
+
+- one_shot_text / one_shot_prepared: a MySQLConnector per lookup (what the sync
+  call sites do). The statement cache is empty every time, so "prepared" adds a
+  prepare and a close round trip.
+- pooled_text / pooled_prepared: an AsyncMySQLConnector per lookup, borrowing
+  from the AsyncPool. Each pooled connection prepares the statement once and
+  then reuses it.
+
+Reports mean/p95 microseconds per lookup and the statement cache hits/misses of
+each case (deanna_cache_requests_total{cache="prepared_statement"}). Fails when
+the one-shot case gets any hit or the pooled one misses more than once per
+pooled connection.
+
+    DB_HOST=127.0.0.1 DB_USERNAME=root DB_PASSWORD=bench DB_DATABASE=deanna \\
+        python -m benchmarks.bench_statement_cache --iterations 500
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import time
+import uuid
+from typing import Dict, List
+
+from AsyncMySQLConnector import AsyncMySQLConnector, close_pool
+from MySQLConnector import MySQLConnector
+from benchmarks.db_contract import SCHEMA, book_data
+from benchmarks.harness import percentile
+from deanna2u_books import SLUG_LOOKUP_SQL
+from metrics import CACHE_REQUESTS
+from settings import get_settings
+
+
+def _cache_counts() -> Dict[str, float]:
+    return {result: CACHE_REQUESTS.labels("prepared_statement", result).value for result in ("hit", "miss")}
+
+
+def _summary(latencies: List[float], before: Dict[str, float]) -> Dict:
+    after = _cache_counts()
+    return {
+        "mean_us": round(sum(latencies) / len(latencies) * 1e6, 1),
+        "p95_us": round(percentile(latencies, 0.95) * 1e6, 1),
+        "cache_hits": int(after["hit"] - before["hit"]),
+        "cache_misses": int(after["miss"] - before["miss"]),
+    }
+
+
+def one_shot(slug: str, iterations: int, prepared: bool) -> Dict:
+    before = _cache_counts()
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):  # connect/disconnect print a line each
+        for _ in range(iterations):
+            t0 = time.perf_counter()
+            db = MySQLConnector()
+            db.prepared_statements = True
+            db.connect()
+            try:
+                db.execute_query(SLUG_LOOKUP_SQL, (slug,), prepared=prepared)
+            finally:
+                db.disconnect()
+            latencies.append(time.perf_counter() - t0)
+    return _summary(latencies, before)
+
+
+async def pooled(slug: str, iterations: int, prepared: bool, concurrency: int) -> Dict:
+    before = _cache_counts()
+    latencies = []
+
+    async def lookup():
+        t0 = time.perf_counter()
+        async with AsyncMySQLConnector() as db:
+            db.prepared_statements = True
+            await db.execute_query(SLUG_LOOKUP_SQL, (slug,), prepared=prepared)
+        latencies.append(time.perf_counter() - t0)
+
+    for start in range(0, iterations, concurrency):
+        await asyncio.gather(*(lookup() for _ in range(min(concurrency, iterations - start))))
+    await close_pool()
+    return _summary(latencies, before)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    db = MySQLConnector()
+    db.connect()
+    if db.connection is None:
+        raise SystemExit("FAIL: cannot connect with the DB_* settings")
+    slug = f"bench-{uuid.uuid4().hex[:8]}"
+    try:
+        for ddl in SCHEMA:
+            db.execute_query(ddl)
+        db.create_book(book_data(slug))
+
+        report = {"iterations": args.iterations, "pool_size": get_settings().db_pool_size}
+        for prepared in (False, True):
+            mode = "prepared" if prepared else "text"
+            report[f"one_shot_{mode}"] = one_shot(slug, args.iterations, prepared)
+            report[f"pooled_{mode}"] = asyncio.run(pooled(slug, args.iterations, prepared, args.concurrency))
+    finally:
+        db.execute_query("DELETE FROM cliperest_book WHERE slug = %s", (slug,))
+        db.disconnect()
+
+    print(json.dumps(report, indent=2))
+    failures = []
+    if report["one_shot_prepared"]["cache_hits"]:
+        failures.append("a one-shot connection hit the statement cache")
+    if report["pooled_prepared"]["cache_misses"] > report["pool_size"]:
+        failures.append(
+            f"pooled lookups missed the statement cache {report['pooled_prepared']['cache_misses']} times "
+            f"with {report['pool_size']} pooled connections"
+        )
+    if failures:
+        raise SystemExit("FAIL: " + "; ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# benchmarks/bench_text_prep.py
+"""
+Token-aware preprocessing + map-reduce versus the old 15,000-character cut, on
+long fixtures: the recorded article page (duplicated wire copy, chrome) and a
+synthetic 40-page report with running headers/footers, as text extraction from
+a PDF produces it.
+
+For each fixture and mode it reports LLM calls, prompt tokens sent, the share
+of the document's distinct paragraphs that reached the model (coverage), and
+wall time of main._summarize_text against the OpenAI stub.
+
+    python -m benchmarks.bench_text_prep --latency 0.3
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("DEANNA2U_API_KEY", "bench")
+os.environ.setdefault("JOBS_DB", os.path.join(tempfile.mkdtemp(), "jobs.sqlite"))
+os.environ.setdefault("NEAR_DUPLICATE_THRESHOLD", "0")  # every request must reach the stubbed upstream
+os.environ.setdefault("OPENAI_RPM", "0")
+
+from openai import OpenAI  # noqa: E402
+
+import main  # noqa: E402
+import summarizer  # noqa: E402
+from benchmarks.stubs import OpenAIStub, load_fixture  # noqa: E402
+from text_prep import count_tokens  # noqa: E402
+from web_utils import extract_text_from_html  # noqa: E402
+
+WORDS = (
+    "gobierno comunidad plan ayudas empresas empleo inversión vivienda turismo energía renovable "
+    "municipios presupuesto millones euros datos informe crecimiento sector consumo hogares región "
+    "transporte público sanidad educación digitalización industria exportaciones agricultura agua"
+).split()
+
+
+def make_report(pages: int = 40, paragraphs_per_page: int = 4, seed: int = 7):
+    """
+    Returns (text, content_paragraphs). Every page repeats a header and a footer.
+    """
+    rng = random.Random(seed)
+    content = []
+    page_texts = []
+    for page in range(1, pages + 1):
+        lines = ["Informe anual 2024 · Consejería de Economía, Hacienda y Empleo", "Comunidad de Madrid"]
+        for _ in range(paragraphs_per_page):
+            sentence_count = rng.randint(3, 5)
+            para = " ".join(
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(12, 22))).capitalize()
+                + f" ({rng.randint(1, 999)},{rng.randint(0, 9)} por ciento)."
+                for _ in range(sentence_count)
+            )
+            content.append(para)
+            lines.append(para)
+        lines.append(f"Página {page} de {pages}")
+        page_texts.append("\n".join(lines))
+    return "\n".join(page_texts), content
+
+
+def article_fixture():
+    html = load_fixture("article.html")
+    text = extract_text_from_html(html)
+    content = list(dict.fromkeys(p for p in text.split("\n\n") if p))
+    # old extraction: paragraphs flattened into one line, cut at 15k chars
+    legacy = " ".join(" ".join(p for p in raw_paragraphs(html)).split())[:15000]
+    return text, legacy, content
+
+
+def raw_paragraphs(html: str):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    return [p.get_text(strip=True) for p in soup.select("article p") if p.get_text(strip=True)]
+
+
+@contextmanager
+def legacy_mode():
+    """The pre-text_prep behaviour: flatten whitespace, hard cut at 15k chars, no map step."""
+    prepare, condense = summarizer.prepare_article, main.condense_article
+    summarizer.prepare_article = lambda text, max_tokens: " ".join(text.split())[:15000]
+    main.condense_article = lambda text: text
+    try:
+        yield
+    finally:
+        summarizer.prepare_article, main.condense_article = prepare, condense
+
+
+def _coverage(prompts, content) -> float:
+    sent = "\n".join(prompts)
+    sent_flat = " ".join(sent.split())
+    hits = sum(1 for para in content if " ".join(para.split())[:80] in sent_flat)
+    return round(hits / len(content), 3) if content else 0.0
+
+
+def run_case(stub: OpenAIStub, text: str, content) -> dict:
+    stub.prompts.clear()
+    calls_before = stub.calls
+    t0 = time.perf_counter()
+    main._summarize_text(text)
+    elapsed = time.perf_counter() - t0
+    prompts = list(stub.prompts)
+    return {
+        "llm_calls": stub.calls - calls_before,
+        "prompt_tokens": sum(count_tokens(p) for p in prompts),
+        "coverage": _coverage(prompts, content),
+        "seconds": round(elapsed, 3),
+    }
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per stubbed completion")
+    parser.add_argument("--pages", type=int, default=40)
+    args = parser.parse_args()
+
+    article_text, article_legacy, article_content = article_fixture()
+    report_text, report_content = make_report(args.pages)
+
+    results = {}
+    with OpenAIStub(first_token_latency=args.latency, token_delay=0.0) as stub:
+        summarizer.client = OpenAI(base_url=stub.base_url, api_key="bench", max_retries=0)
+        for name, new_input, legacy_input, content in (
+            ("article_html", article_text, article_legacy, article_content),
+            (f"report_{args.pages}_pages", report_text, report_text, report_content),
+        ):
+            with legacy_mode():
+                before = run_case(stub, legacy_input, content)
+            after = run_case(stub, new_input, content)
+            results[name] = {
+                "input_tokens": count_tokens(new_input),
+                "char_cut_15k": before,
+                "token_budget_map_reduce": after,
+            }
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
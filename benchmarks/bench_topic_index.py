@@ -0,0 +1,156 @@
+# benchmarks/bench_topic_index.py
+"""
+Topic index (topic_index.py) against a day of /create_ministores traffic: the
+same commercial topics come back with different wording (plural/singular,
+accents, word order, "comprar ... online", synonyms). Runs the stream through
+main._create_books_for_topics with and without the index, against the Deanna2u
+stub and the SQLite stand-in for cliperest_book.
+
+Reports Deanna2u create_new_book calls, cliperest_book rows created and wall
+time. Fails if, with the index, any topic family gets more than one book, or if
+normalize_topic merges or splits any of the NORMALIZATION_CASES the wrong way.
+
+    python -m benchmarks.bench_topic_index --articles 200 --latency 0.05
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+_TMP = tempfile.mkdtemp(prefix="deanna-topics-")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("DEANNA2U_API_KEY", "bench")
+os.environ.setdefault("JOBS_DB", os.path.join(_TMP, "jobs.sqlite"))
+os.environ.setdefault("TOPIC_INDEX_DB", os.path.join(_TMP, "topic_index.sqlite"))
+
+import MySQLConnector as mysql_module  # noqa: E402
+import deanna2u_books  # noqa: E402
+import main  # noqa: E402
+from benchmarks.sqlite_db import SQLiteConnector, init_db  # noqa: E402
+from benchmarks.stubs import Deanna2uStub  # noqa: E402
+from topic_index import TopicIndex, normalize_topic  # noqa: E402
+
+# Each family is one commercial intent written the ways the topics prompt returns it.
+TOPIC_FAMILIES = [
+    ["hoteles baratos Madrid", "hoteles económicos Madrid", "hotel barato en Madrid", "Madrid hoteles baratos"],
+    ["casas rurales baratas", "casa rural barata", "casas rurales económicas"],
+    ["bicicletas eléctricas", "bicicleta electrica", "comprar bicicletas eléctricas online"],
+    ["móviles baratos", "movil barato", "smartphones baratos"],
+    ["ordenadores portátiles gaming", "portátil gaming", "portatiles gaming"],
+    ["paneles solares para casa", "panel solar casa", "paneles solares casas"],
+    ["vuelos baratos a Canarias", "vuelo barato Canarias", "vuelos económicos Canarias"],
+    ["seguros de coche", "seguro coche", "seguros coches"],
+    ["zapatillas de running", "zapatillas running online", "zapatilla running"],
+    ["relojes inteligentes ofertas", "reloj inteligente oferta", "relojes inteligentes descuentos"],
+    ["luces led para jardín", "luz led jardin", "luces LED jardín"],
+    ["cursos de inglés online", "curso inglés", "cursos inglés"],
+]
+
+# (topic, topic, same key expected)
+NORMALIZATION_CASES = [
+    ("muebles baratos", "mueble barato", True),
+    ("grandes almacenes", "gran almacén", False),
+    ("padres", "padre", True),
+    ("calles peatonales", "calle peatonal", True),
+    ("flores", "flor", True),
+    ("ciudades", "ciudad", True),
+    ("leche sin lactosa", "leche con lactosa", False),
+    ("pan sin gluten", "pan con gluten", False),
+    ("tienda de campaña", "campaña", False),
+    ("comprar tiendas de campaña online", "tienda de campaña", True),
+]
+
+
+def normalization_failures() -> list:
+    failures = []
+    for a, b, same in NORMALIZATION_CASES:
+        ka, kb = normalize_topic(a), normalize_topic(b)
+        if (ka == kb) != same:
+            failures.append(f"{a!r} -> {ka!r}, {b!r} -> {kb!r}: expected {'the same' if same else 'different'} keys")
+    return failures
+
+
+def topic_stream(articles: int, rng: random.Random):
+    for _ in range(articles):
+        families = rng.sample(TOPIC_FAMILIES, 3)
+        yield [rng.choice(family) for family in families]
+
+
+def count_books(db_path: str) -> int:
+    db = SQLiteConnector(db_path)
+    db.connect()
+    try:
+        return db.execute_query("SELECT COUNT(*) AS n FROM cliperest_book")[0]["n"]
+    finally:
+        db.disconnect()
+
+
+def run(stream, index, latency: float, db_path: str) -> dict:
+    init_db(db_path)
+    SQLiteConnector.path = db_path
+    mysql_module.MySQLConnector = SQLiteConnector
+
+    def on_create(slug, term, user_id):
+        db = SQLiteConnector(db_path)
+        db.connect()
+        try:
+            db.execute_query(
+                "INSERT INTO cliperest_book (user_id, name, slug) VALUES (%s, %s, %s)", (int(user_id or 0), term, slug)
+            )
+        finally:
+            db.disconnect()
+
+    main.topic_index = index
+    with Deanna2uStub(on_create=on_create, latency=latency) as stub:
+        deanna2u_books.DEANNA2U_API_URL = stub.api_url
+        books_by_family = {}
+        t0 = time.perf_counter()
+        for topics in stream:
+            _, book_ids = main._create_books_for_topics(topics)
+            for topic, book_id in zip(topics, book_ids):
+                family = next(i for i, f in enumerate(TOPIC_FAMILIES) if topic in f)
+                books_by_family.setdefault(family, set()).add(book_id)
+        elapsed = time.perf_counter() - t0
+        calls = stub.calls
+
+    return {
+        "deanna2u_calls": calls,
+        "books_created": count_books(db_path),
+        "max_books_per_family": max(len(ids) for ids in books_by_family.values()),
+        "seconds": round(elapsed, 2),
+    }
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per stubbed Deanna2u call")
+    parser.add_argument("--seed", type=int, default=5)
+    args = parser.parse_args()
+
+    failures = normalization_failures()
+    if failures:
+        raise SystemExit("FAIL: " + "; ".join(failures))
+
+    stream = list(topic_stream(args.articles, random.Random(args.seed)))
+    before = run(stream, None, args.latency, os.path.join(_TMP, "no_index.sqlite"))
+    index = TopicIndex(os.path.join(_TMP, "topic_index.sqlite"), max_age=24 * 3600)
+    after = run(stream, index, args.latency, os.path.join(_TMP, "with_index.sqlite"))
+
+    report = {
+        "articles": args.articles,
+        "topics": sum(len(t) for t in stream),
+        "families": len(TOPIC_FAMILIES),
+        "without_index": before,
+        "with_index": after,
+    }
+    print(json.dumps(report, indent=2))
+
+    if after["max_books_per_family"] > 1:
+        raise SystemExit(f"FAIL: a topic family got {after['max_books_per_family']} books with the index")
+
+
+if __name__ == "__main__":
+    main_cli()
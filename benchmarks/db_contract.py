@@ -0,0 +1,201 @@
+# benchmarks/db_contract.py
+"""
+Contract checks that MySQLConnector and AsyncMySQLConnector must both pass:
+the same calls against the same server return the same things (rows as dicts,
+rowcounts, new ids, None on errors, 0 for an empty batch). Then the async pool
+is checked under concurrency: DB_POOL_SIZE connections at most, all of them
+reused, and no transaction left open after an error.
+
+Needs a throwaway MySQL/MariaDB and the usual DB_* variables, e.g.
+
+    docker run -d --rm -p 3306:3306 -e MARIADB_ROOT_PASSWORD=bench -e MARIADB_DATABASE=deanna mariadb:11
+    DB_HOST=127.0.0.1 DB_USERNAME=root DB_PASSWORD=bench DB_DATABASE=deanna python -m benchmarks.db_contract
+
+cliperest_book and cliperest_clipping are created if missing; rows written by
+the checks are deleted at the end.
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from AsyncMySQLConnector import AsyncMySQLConnector, AsyncPool
+from MySQLConnector import MySQLConnector
+from settings import get_settings
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS cliperest_book (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        user_id INT, name VARCHAR(255), slug VARCHAR(255), rendered INT, version INT, category_id INT,
+        modified DATETIME, addEnd INT, coverImage TEXT, sharing INT, coverColor INT,
+        dollarsGiven INT, privacy INT, type INT, created DATETIME, coverHexColor VARCHAR(16),
+        numLikers INT, description TEXT, tags TEXT, thumbnailImage TEXT, numClips INT,
+        numViews INT, userLanguage VARCHAR(8), embed_code TEXT, thumbnailImageSmall TEXT,
+        humanModified DATETIME, coverV3 INT, typeFilters TEXT,
+        KEY idx_book_slug (slug)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS cliperest_clipping (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        book_id INT, caption TEXT, text TEXT, thumbnail TEXT, useThumbnail INT, type INT,
+        url TEXT, created DATETIME, num INT, migratedS3 INT, modified DATETIME
+    )
+    """,
+]
+
+
+def book_data(slug: str) -> dict:
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    return {
+        "user_id": 1, "name": "contract", "slug": slug, "rendered": 0, "version": 1, "category_id": 0,
+        "modified": now, "addEnd": 0, "coverImage": "", "sharing": 0, "coverColor": 0, "dollarsGiven": 0,
+        "privacy": 0, "type": 0, "created": now, "coverHexColor": "", "numLikers": 0, "description": "",
+        "tags": "", "thumbnailImage": "", "numClips": 0, "numViews": 0, "userLanguage": "es",
+        "embed_code": "", "thumbnailImageSmall": "", "humanModified": now, "coverV3": 0, "typeFilters": "",
+    }  # fmt: skip
+
+
+def clipping_data(book_id: int, num: int) -> dict:
+    now = time.strftime("%Y-%m-%d %H:%M:%S")
+    return {
+        "book_id": book_id, "caption": f"clip {num}", "text": "", "thumbnail": "", "useThumbnail": 0,
+        "type": 0, "url": f"https://example.com/{num}", "created": now, "num": num, "migratedS3": 0,
+        "modified": now,
+    }  # fmt: skip
+
+
+def _connect_kwargs() -> dict:
+    settings = get_settings()
+    return {
+        "host": settings.db_host,
+        "port": settings.db_port,
+        "user": settings.db_username,
+        "password": settings.db_password,
+        "database": settings.db_database,
+    }
+
+
+async def call(db, method: str, *args):
+    result = getattr(db, method)(*args)
+    return await result if asyncio.iscoroutine(result) else result
+
+
+async def contract(db, label: str) -> dict:
+    """The shared checks; returns what each call produced, for comparing implementations."""
+    failures = []
+
+    def check(name, ok):
+        if not ok:
+            failures.append(name)
+
+    slug = f"contract-{label}-{uuid.uuid4().hex[:8]}"
+    out = {}
+
+    out["select_literal"] = await call(db, "execute_query", "SELECT 1 AS one")
+    check("select returns dict rows", out["select_literal"] == [{"one": 1}])
+
+    book_id = await call(db, "create_book", book_data(slug))
+    check("create_book returns an id", isinstance(book_id, int) and book_id > 0)
+
+    rows = await call(db, "execute_query", "SELECT id, slug FROM cliperest_book WHERE slug = %s", (slug,))
+    check("inserted book is readable", rows == [{"id": book_id, "slug": slug}])
+
+    out["update_rowcount"] = await call(
+        db, "execute_query", "UPDATE cliperest_book SET numViews = numViews + 1 WHERE slug = %s", (slug,)
+    )
+    check("write returns rowcount", out["update_rowcount"] == 1)
+
+    out["empty_batch"] = await call(db, "create_clippings_batch", [])
+    check("empty batch returns 0", out["empty_batch"] == 0)
+
+    out["batch"] = await call(db, "create_clippings_batch", [clipping_data(book_id, i) for i in range(3)])
+    check("batch returns inserted rows", out["batch"] == 3)
+
+    out["bad_sql"] = await call(db, "execute_query", "SELECT * FROM no_such_table")
+    check("error returns None", out["bad_sql"] is None)
+
+    out["after_error"] = await call(db, "execute_query", "SELECT COUNT(*) AS n FROM cliperest_clipping WHERE book_id = %s", (book_id,))
+    check("connection usable after an error", out["after_error"] == [{"n": 3}])
+
+    await call(db, "execute_query", "DELETE FROM cliperest_clipping WHERE book_id = %s", (book_id,))
+    await call(db, "execute_query", "DELETE FROM cliperest_book WHERE id = %s", (book_id,))
+    return {"results": out, "failures": failures}
+
+
+async def pool_checks(size: int, tasks: int) -> dict:
+    pool = AsyncPool(size, **_connect_kwargs())
+    connection_ids = set()
+    max_in_use = in_use = 0
+
+    async def worker():
+        nonlocal max_in_use, in_use
+        async with AsyncMySQLConnector(pool) as db:
+            in_use += 1
+            max_in_use = max(max_in_use, in_use)
+            rows = await db.execute_query("SELECT CONNECTION_ID() AS cid, SLEEP(0.05) AS s")
+            connection_ids.add(rows[0]["cid"])
+            # leaves a failed statement behind; the connection must come back clean
+            await db.execute_query("INSERT INTO no_such_table VALUES (1)")
+            in_trx = await db.execute_query("SELECT @@in_transaction AS t")
+            in_use -= 1
+            return in_trx[0]["t"]
+
+    t0 = time.perf_counter()
+    in_transaction = await asyncio.gather(*(worker() for _ in range(tasks)))
+    elapsed = time.perf_counter() - t0
+    await pool.close()
+    return {
+        "pool_size": size,
+        "tasks": tasks,
+        "connections_used": len(connection_ids),
+        "max_in_use": max_in_use,
+        "left_in_transaction": sum(1 for t in in_transaction if t),
+        "seconds": round(elapsed, 3),
+    }
+
+
+async def run(args) -> None:
+    sync_db = MySQLConnector()
+    sync_db.connect()
+    if sync_db.connection is None:
+        raise SystemExit("FAIL: cannot connect with the DB_* settings")
+    for ddl in SCHEMA:
+        sync_db.execute_query(ddl)
+    try:
+        sync_report = await contract(sync_db, "sync")
+    finally:
+        sync_db.disconnect()
+
+    async with AsyncMySQLConnector(AsyncPool(1, **_connect_kwargs())) as async_db:
+        async_report = await contract(async_db, "async")
+        await async_db.pool.close()
+
+    pool_report = await pool_checks(args.pool_size, args.tasks)
+
+    print("sync: ", sync_report)
+    print("async:", async_report)
+    print("pool: ", pool_report)
+
+    failures = [f"sync: {f}" for f in sync_report["failures"]] + [f"async: {f}" for f in async_report["failures"]]
+    if sync_report["results"] != async_report["results"]:
+        failures.append("sync and async results differ")
+    if pool_report["connections_used"] > args.pool_size or pool_report["max_in_use"] > args.pool_size:
+        failures.append("pool exceeded its size")
+    if pool_report["left_in_transaction"]:
+        failures.append("pooled connections left inside a transaction")
+    if failures:
+        raise SystemExit("FAIL: " + "; ".join(failures))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pool-size", type=int, default=3)
+    parser.add_argument("--tasks", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# benchmarks/harness.py
+"""
+Shared load-generation helpers: serve the FastAPI app on a local port, drive it
+(or a plain function) with a closed-loop workload, and summarize latencies as
+p50/p95/p99 + RPS.
+"""
+import asyncio
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterator, List
+
+import uvicorn
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def serve_app(app) -> Iterator[str]:
+    """
+    Runs `app` under uvicorn in a background thread and yields its base URL.
+    """
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join(10)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile, q in [0, 1]."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(q * (len(values) - 1)))))]
+
+
+def latency_summary(latencies: List[float], errors: int, elapsed: float) -> Dict:
+    total = len(latencies) + errors
+    return {
+        "requests": total,
+        "errors": errors,
+        "rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(max(latencies, default=0.0) * 1000, 2),
+        "seconds": round(elapsed, 3),
+    }
+
+
+async def run_async_load(request: Callable[[int], Awaitable[bool]], total: int, concurrency: int) -> Dict:
+    """
+    Closed loop: `concurrency` workers issue request(i) for i in range(total).
+    request returns True on success; exceptions count as errors.
+    """
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            t0 = time.perf_counter()
+            try:
+                ok = await request(i)
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - t0)
+            else:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latency_summary(latencies, errors, time.perf_counter() - t0)
+
+
+def run_thread_load(fn: Callable[[int], object], total: int, concurrency: int) -> Dict:
+    """Same closed loop for blocking functions, on a thread pool."""
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def worker():
+        nonlocal errors
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            t0 = time.perf_counter()
+            try:
+                fn(i)
+                ok = True
+            except Exception:
+                ok = False
+            with lock:
+                if ok:
+                    latencies.append(time.perf_counter() - t0)
+                else:
+                    errors += 1
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return latency_summary(latencies, errors, time.perf_counter() - t0)
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[str]:
+    """
+    Returns human-readable regressions: p95 up or RPS down by more than `threshold` percent.
+    """
+    regressions = []
+    for name, now in current.get("scenarios", {}).items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before or "p95_ms" not in before or "p95_ms" not in now:
+            continue
+        if before["p95_ms"] and (now["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 > threshold:
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {now['p95_ms']}ms")
+        if before["rps"] and (before["rps"] - now["rps"]) / before["rps"] * 100 > threshold:
+            regressions.append(f"{name}: rps {before['rps']} -> {now['rps']}")
+    return regressions
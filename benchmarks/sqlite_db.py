@@ -0,0 +1,182 @@
+# benchmarks/sqlite_db.py
+"""
+SQLite stand-in for MySQLConnector, with the same method surface and the subset
+of the Deanna2u schema the app touches (cliperest_book, cliperest_clipping and
+the ministore tables).
+
+MySQL-only syntax in the app's SQL is translated on the fly (%s placeholders,
+INSERT IGNORE, ON DUPLICATE KEY UPDATE, SHOW COLUMNS). The MySQL DDL in ministore_creator.ensure_tables is a no-op here
+because the tables already exist in SQLite form.
+"""
+import re
+import sqlite3
+from typing import Dict, List
+
+from MySQLConnector import format_rows
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cliperest_book (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER, name TEXT, slug TEXT, rendered INTEGER, version INTEGER, category_id INTEGER,
+    modified TEXT, addEnd INTEGER, coverImage TEXT, sharing INTEGER, coverColor INTEGER,
+    dollarsGiven INTEGER, privacy INTEGER, type INTEGER, created TEXT, coverHexColor TEXT,
+    numLikers INTEGER, description TEXT, tags TEXT, thumbnailImage TEXT, numClips INTEGER,
+    numViews INTEGER, userLanguage TEXT, embed_code TEXT, thumbnailImageSmall TEXT,
+    humanModified TEXT, coverV3 INTEGER, typeFilters TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_book_slug ON cliperest_book (slug);
+CREATE TABLE IF NOT EXISTS cliperest_clipping (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    book_id INTEGER, caption TEXT, text TEXT, thumbnail TEXT, useThumbnail INTEGER, type INTEGER,
+    url TEXT, created TEXT, num INTEGER, migratedS3 INTEGER, modified TEXT
+);
+CREATE TABLE IF NOT EXISTS ministores (
+    id TEXT PRIMARY KEY, topic TEXT NOT NULL, language TEXT NOT NULL DEFAULT 'es', created_at INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ministore_items (
+    id TEXT PRIMARY KEY, title TEXT, description TEXT, url TEXT, keywords TEXT, language TEXT,
+    url_hash TEXT, content_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_url_hash ON ministore_items (url_hash);
+CREATE TABLE IF NOT EXISTS ministore_item_map (
+    ministore_id TEXT NOT NULL, item_id TEXT NOT NULL, pos INTEGER NOT NULL,
+    PRIMARY KEY (ministore_id, item_id)
+);
+"""
+
+_PLACEHOLDER = re.compile(r"%s")
+
+
+def _translate(sql: str) -> str:
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = re.sub(
+        r"^\s*SHOW\s+COLUMNS\s+FROM\s+(\w+)", r"SELECT name AS Field FROM pragma_table_info('\1')", sql, flags=re.IGNORECASE
+    )
+    sql = re.sub(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", "ON CONFLICT DO UPDATE SET", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"\bVALUES\((\w+)\)", r"excluded.\1", sql, flags=re.IGNORECASE)
+    return re.sub(r"^\s*INSERT\s+IGNORE\b", "INSERT OR IGNORE", sql, flags=re.IGNORECASE)
+
+
+def init_db(path: str) -> None:
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+    finally:
+        conn.close()
+
+
+class _Connection:
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+
+    def is_connected(self) -> bool:
+        return True
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+class SQLiteConnector:
+    """
+    Drop-in for MySQLConnector in benchmarks. `path` is set on the class so code that
+    calls MySQLConnector() with no arguments can be pointed at it.
+    """
+
+    path = ":memory:"
+
+    def __init__(self, path: str = None):
+        self.path = path or type(self).path
+        # what ministore_creator.ensure_tables keys its per-database state on
+        self.host, self.port, self.database = None, None, self.path
+        self.connection = None
+
+    def connect(self):
+        self.connection = _Connection(self.path)
+
+    def disconnect(self):
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    def pin_to_primary(self):
+        pass  # a single SQLite file: there are no replicas to avoid
+
+    def execute_query(self, sql_query, params=None, prepared=False, row_format="dict"):
+        if sql_query.strip().upper().startswith("CREATE"):
+            return 0
+        conn = self.connection._conn
+        cursor = conn.execute(_translate(sql_query), params or ())
+        if sql_query.strip().upper().startswith(("SELECT", "SHOW", "DESCRIBE")):
+            rows = cursor.fetchall()
+            if row_format == "dict":
+                return [dict(row) for row in rows]
+            return format_rows(rows, [d[0] for d in cursor.description], row_format)
+        conn.commit()
+        return cursor.rowcount
+
+    def execute_many(self, sql_query, rows, batch_size=500):
+        if not rows:
+            return 0
+        conn = self.connection._conn
+        cursor = conn.executemany(_translate(sql_query), rows)
+        conn.commit()
+        return cursor.rowcount
+
+    def create_book(self, book_data: Dict) -> int:
+        columns = ", ".join(book_data.keys())
+        marks = ", ".join("?" for _ in book_data)
+        conn = self.connection._conn
+        cursor = conn.execute(f"INSERT INTO cliperest_book ({columns}) VALUES ({marks})", tuple(book_data.values()))
+        conn.commit()
+        return cursor.lastrowid
+
+    def create_clippings_batch(self, clippings_data_list: List[Dict]) -> int:
+        if not clippings_data_list:
+            return 0
+        columns = ", ".join(clippings_data_list[0].keys())
+        marks = ", ".join("?" for _ in clippings_data_list[0])
+        conn = self.connection._conn
+        conn.executemany(
+            f"INSERT INTO cliperest_clipping ({columns}) VALUES ({marks})",
+            [tuple(c.values()) for c in clippings_data_list],
+        )
+        conn.commit()
+        return len(clippings_data_list)
+
+
+class AsyncSQLiteConnector:
+    """
+    Drop-in for AsyncMySQLConnector in benchmarks, on SQLiteConnector.path. The
+    queries run inline on the event loop; SQLite on a local file is fast enough
+    that this doesn't distort the HTTP timings.
+    """
+
+    def __init__(self, pool=None):
+        self._db = SQLiteConnector()
+
+    async def connect(self):
+        self._db.connect()
+
+    async def disconnect(self):
+        self._db.disconnect()
+
+    async def __aenter__(self) -> "AsyncSQLiteConnector":
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.disconnect()
+
+    async def execute_query(self, sql_query, params=None, prepared=False, row_format="dict"):
+        return self._db.execute_query(sql_query, params, prepared, row_format)
+
+    async def create_book(self, book_data: Dict) -> int:
+        return self._db.create_book(book_data)
+
+    async def create_clippings_batch(self, clippings_data_list: List[Dict]) -> int:
+        return self._db.create_clippings_batch(clippings_data_list)
@@ -0,0 +1,353 @@
+# benchmarks/stubs.py
+"""
+Local stand-ins for external services, served from a background thread.
+
+OpenAIStub implements POST /v1/chat/completions (plain and stream=True) with
+configurable time-to-first-token and per-token delay, so OpenAI(base_url=stub.url)
+behaves like the real client without network access or cost. Responses report
+usage.prompt_tokens_details.cached_tokens the way OpenAI's prompt cache would.
+
+SerperStub, Deanna2uStub and PageStub replay the recorded responses in
+benchmarks/fixtures/. Every stub takes `latency`, `jitter` and `error_rate` /
+`error_status`, seeded so runs are reproducible.
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+DEFAULT_SUMMARY = (
+    "El Gobierno ha aprobado un plan de ayudas para el turismo rural que incluye "
+    "subvenciones a la rehabilitación de alojamientos y campañas de promoción."
+)
+DEFAULT_TOPICS = "casas rurales baratas\nescapadas fin de semana\nrehabilitación de viviendas rurales"
+
+# OpenAI prompt caching: prefixes of 1024+ tokens, cached in 128-token increments.
+CACHE_MIN_TOKENS = 1024
+CACHE_INCREMENT_TOKENS = 128
+CACHE_MAX_ENTRIES = 256
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # socketserver's default backlog of 5 resets connections when the app opens
+    # many at once (parallel book creation), which real upstreams don't do.
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # clients dropping keep-alive connections is normal here
+        pass
+
+
+def _common_prefix_len(a: str, b: str) -> int:
+    return len(os.path.commonprefix((a, b)))
+
+
+def load_fixture(name: str):
+    path = FIXTURES_DIR / name
+    text = path.read_text(encoding="utf-8")
+    return json.loads(text) if path.suffix == ".json" else text
+
+
+class _StubServer:
+    def __init__(
+        self,
+        handler_cls,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.calls = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.httpd = _QuietHTTPServer(("127.0.0.1", 0), handler_cls)
+        self.httpd.stub = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def next_call(self):
+        """
+        Counts the call and returns (delay, fail) drawn from the seeded RNG.
+        """
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + (self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+            fail = self.error_rate > 0 and self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        return max(0.0, delay), fail
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # keep benchmark output clean
+        pass
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status: int, body: Dict, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _delay_or_fail(self) -> bool:
+        """
+        Applies the stub's latency; returns True if an injected error was sent instead.
+        """
+        stub: _StubServer = self.server.stub
+        delay, fail = stub.next_call()
+        time.sleep(delay)
+        if fail:
+            headers = {"retry-after-ms": "50"} if stub.error_status == 429 else None
+            self._send_json(stub.error_status, {"error": {"message": "injected failure"}}, headers)
+        return fail
+
+
+class _OpenAIHandler(_JSONHandler):
+    def do_POST(self):
+        stub: OpenAIStub = self.server.stub
+        body = self._read_json()
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        if self._delay_or_fail():
+            return
+
+        stub.record(body)
+        content = stub.reply_for(body)
+        time.sleep(stub.first_token_latency)
+
+        if not body.get("stream"):
+            time.sleep(stub.token_delay * len(content.split()))
+            self._send_json(200, stub.completion(body, content))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            piece = word if i == 0 else " " + word
+            self._write_chunk(stub.chunk(body, {"content": piece}))
+            time.sleep(stub.token_delay)
+        self._write_chunk(stub.chunk(body, {}, finish_reason="stop"))
+        self._write_raw(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, payload: Dict) -> None:
+        self._write_raw(b"data: " + json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n\n")
+
+    def _write_raw(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+class OpenAIStub(_StubServer):
+    def __init__(
+        self,
+        first_token_latency: float = 0.5,
+        token_delay: float = 0.02,
+        summary: str = DEFAULT_SUMMARY,
+        topics: str = DEFAULT_TOPICS,
+        **faults,
+    ):
+        super().__init__(_OpenAIHandler, **faults)
+        self.first_token_latency = first_token_latency
+        self.token_delay = token_delay
+        self.summary = summary
+        self.topics = topics
+        # prompt text of every answered request, for token accounting in benchmarks
+        self.prompts = []
+        # serialized prompts seen so far, to report prompt_tokens_details.cached_tokens
+        self._prefixes = deque(maxlen=CACHE_MAX_ENTRIES)
+
+    @property
+    def base_url(self) -> str:
+        return self.url + "/v1"
+
+    def record(self, body: Dict) -> None:
+        with self._lock:
+            self.prompts.append("\n".join(m.get("content", "") for m in body.get("messages", [])))
+
+    def reply_for(self, body: Dict) -> str:
+        # the task is decided by the last message; earlier ones may be a shared prefix
+        messages = body.get("messages") or [{}]
+        return self.topics if "búsquedas comerciales" in messages[-1].get("content", "") else self.summary
+
+    def cached_tokens(self, body: Dict) -> int:
+        """
+        Mimics OpenAI's automatic prompt caching: the longest exact prefix shared
+        with an earlier prompt, counted only from 1024 tokens and in 128-token steps.
+        """
+        prompt = "".join(f"<{m.get('role')}>{m.get('content', '')}" for m in body.get("messages", []))
+        with self._lock:
+            best = max((_common_prefix_len(prompt, seen) for seen in self._prefixes), default=0)
+            self._prefixes.append(prompt)
+        tokens = best // 4
+        if tokens < CACHE_MIN_TOKENS:
+            return 0
+        return tokens - tokens % CACHE_INCREMENT_TOKENS
+
+    def completion(self, body: Dict, content: str) -> Dict:
+        prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+        cached = min(self.cached_tokens(body), prompt_tokens)
+        return {
+            "id": "chatcmpl-" + uuid.uuid4().hex,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": 60,
+                "total_tokens": prompt_tokens + 60,
+                "prompt_tokens_details": {"cached_tokens": cached},
+            },
+        }
+
+    def chunk(self, body: Dict, delta: Dict, finish_reason: Optional[str] = None) -> Dict:
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+
+
+class _SerperHandler(_JSONHandler):
+    def do_POST(self):
+        stub: SerperStub = self.server.stub
+        body = self._read_json()
+        if self._delay_or_fail():
+            return
+        self._send_json(200, stub.response_for(body.get("q", ""), int(body.get("num", 10))))
+
+
+class SerperStub(_StubServer):
+    """
+    POST /search replaying fixtures/serper_search.json. Titles and links are
+    tagged with the query so different topics yield different items.
+    """
+
+    def __init__(self, fixture: str = "serper_search.json", **faults):
+        super().__init__(_SerperHandler, **faults)
+        self.recorded = load_fixture(fixture)
+
+    @property
+    def search_url(self) -> str:
+        return self.url + "/search"
+
+    def response_for(self, query: str, num: int) -> Dict:
+        tag = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-") or "q"
+        items = []
+        for item in self.recorded.get("shopping", [])[:num]:
+            item = dict(item)
+            item["title"] = f"{item['title']} ({query})"
+            item["link"] = f"{item['link']}?q={tag}"
+            items.append(item)
+        return {"searchParameters": {"q": query, "num": num}, "shopping": items}
+
+
+class _Deanna2uHandler(_JSONHandler):
+    def do_POST(self):
+        stub: Deanna2uStub = self.server.stub
+        body = self._read_json()
+        if self.headers.get("X-API-KEY") is None:
+            self._send_json(401, {"success": False, "error": "missing api key"})
+            return
+        if self._delay_or_fail():
+            return
+        self._send_json(200, stub.create_book(body.get("term", ""), body.get("user_id")))
+
+
+class Deanna2uStub(_StubServer):
+    """
+    POST /api/create_new_book. `on_create(slug, term, user_id)` lets the caller
+    insert the matching cliperest_book row, so the slug lookup that follows finds it.
+    """
+
+    def __init__(self, on_create: Optional[Callable[[str, str, int], None]] = None, **faults):
+        super().__init__(_Deanna2uHandler, **faults)
+        self.on_create = on_create
+        self.template = load_fixture("deanna2u_create_book.json")
+
+    @property
+    def api_url(self) -> str:
+        return self.url + "/api/create_new_book"
+
+    def create_book(self, term: str, user_id) -> Dict:
+        slug = re.sub(r"[^a-z0-9]+", "-", term.lower()).strip("-") + "-" + uuid.uuid4().hex[:8]
+        if self.on_create:
+            self.on_create(slug, term, user_id)
+        response = dict(self.template)
+        response["book_url"] = response["book_url"].format(slug=slug)
+        return response
+
+
+class _PageHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        stub: PageStub = self.server.stub
+        delay, fail = stub.next_call()
+        time.sleep(delay)
+        status, data = (stub.error_status, b"error") if fail else (200, stub.body)
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class PageStub(_StubServer):
+    """
+    Serves fixtures/article.html for any GET path (a stand-in for europapress.es).
+    """
+
+    def __init__(self, fixture: str = "article.html", **faults):
+        super().__init__(_PageHandler, **faults)
+        self.body = load_fixture(fixture).encode("utf-8")
@@ -0,0 +1,340 @@
+# benchmarks/suite.py
+"""
+End-to-end benchmark suite against local stand-ins for every external service:
+OpenAI, Serper, the Deanna2u create_new_book API, article pages and MySQL
+(SQLite by default, or a real server with --db mysql).
+
+    python -m benchmarks.suite -o bench-$(git rev-parse --short HEAD).json
+    python -m benchmarks.suite --latency 0.2 --error-rate 0.02 --compare bench-baseline.json
+
+Scenarios: summarize, summarize_url, create_ministores, article_ministores,
+article_two_calls (summarize_url then create_ministores, as WordPress did
+before /article_ministores), storage_save, storage_load, ministore_create,
+ministore_render. Each reports p50/p95/p99
+latency and RPS; the whole run is written as JSON together with the commit and
+configuration so results can be compared between commits.
+
+--db mysql uses MySQLConnector with the usual DB_* variables, e.g. against
+    docker run -d -p 3306:3306 -e MARIADB_ROOT_PASSWORD=bench -e MARIADB_DATABASE=deanna mariadb:11
+with the cliperest_* tables created beforehand.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+_TMP = tempfile.mkdtemp(prefix="deanna-bench-")
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+os.environ.setdefault("DEANNA2U_API_KEY", "bench")
+os.environ.setdefault("Serper.dev_Key", "bench")
+os.environ.setdefault("JOBS_DB", os.path.join(_TMP, "jobs.sqlite"))
+# summarize requests are near-duplicates of each other; measure the full pipeline
+os.environ.setdefault("NEAR_DUPLICATE_THRESHOLD", "0")
+os.environ.setdefault("TOPIC_INDEX_DB", os.path.join(_TMP, "topic_index.sqlite"))
+os.environ.setdefault("CATALOG_INDEX_DB", os.path.join(_TMP, "catalog_index.sqlite"))
+os.environ.setdefault("PREWARM_DB", os.path.join(_TMP, "prewarm.sqlite"))
+os.environ.setdefault("OPENAI_RATE_LIMIT_DB", os.path.join(_TMP, "ratelimit.sqlite"))
+
+import httpx  # noqa: E402
+from openai import OpenAI  # noqa: E402
+
+import AsyncMySQLConnector as async_mysql_module  # noqa: E402
+import MySQLConnector as mysql_module  # noqa: E402
+import deanna2u_books  # noqa: E402
+import main  # noqa: E402
+import ministore_books  # noqa: E402
+import ministore_engine  # noqa: E402
+import storage  # noqa: E402
+import summarizer  # noqa: E402
+from benchmarks.harness import compare, run_async_load, run_thread_load, serve_app  # noqa: E402
+from benchmarks.sqlite_db import AsyncSQLiteConnector, SQLiteConnector, init_db  # noqa: E402
+from benchmarks.stubs import Deanna2uStub, OpenAIStub, PageStub, SerperStub, load_fixture  # noqa: E402
+from web_utils import extract_text_from_html  # noqa: E402
+
+SCENARIOS = (
+    "summarize",
+    "summarize_url",
+    "create_ministores",
+    "article_ministores",
+    "article_two_calls",
+    "storage_save",
+    "storage_load",
+    "ministore_create",
+    "ministore_render",
+)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _article_text() -> str:
+    return extract_text_from_html(load_fixture("article.html"))
+
+
+def _use_db(kind: str):
+    """
+    Points every MySQLConnector() and AsyncMySQLConnector() in the app at the
+    benchmark DB and returns the sync factory.
+    """
+    if kind == "mysql":
+        return mysql_module.MySQLConnector
+
+    path = os.path.join(_TMP, "deanna.sqlite")
+    init_db(path)
+    SQLiteConnector.path = path
+    mysql_module.MySQLConnector = SQLiteConnector
+    async_mysql_module.AsyncMySQLConnector = AsyncSQLiteConnector
+    ministore_books.MySQLConnector = SQLiteConnector
+    return SQLiteConnector
+
+
+def _insert_book_row(db_factory):
+    def on_create(slug: str, term: str, user_id) -> None:
+        db = db_factory()
+        db.connect()
+        try:
+            db.execute_query(
+                "INSERT INTO cliperest_book (user_id, name, slug) VALUES (%s, %s, %s)",
+                (int(user_id or 0), term, slug),
+            )
+        finally:
+            db.disconnect()
+
+    return on_create
+
+
+# ----------------------------
+# HTTP scenarios
+# ----------------------------
+async def _http_scenarios(base_url: str, page_url: str, args, selected) -> dict:
+    article = _article_text()
+    results = {}
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+
+        async def post_ok(path: str, body: dict) -> bool:
+            r = await client.post(path, json=body)
+            return r.status_code == 200
+
+        if "summarize" in selected:
+            # distinct bodies so single-flight coalescing doesn't hide the work
+            results["summarize"] = await run_async_load(
+                lambda i: post_ok("/summarize", {"text": f"{article} [{uuid.uuid4().hex}]"}),
+                args.requests,
+                args.concurrency,
+            )
+        if "summarize_url" in selected:
+            results["summarize_url"] = await run_async_load(
+                lambda i: post_ok("/summarize_url", {"url": f"{page_url}/madrid/noticia-{uuid.uuid4().hex}.html"}),
+                args.requests,
+                args.concurrency,
+            )
+        if "create_ministores" in selected:
+            results["create_ministores"] = await run_async_load(
+                lambda i: post_ok(
+                    "/create_ministores",
+                    {"topics": [f"bicicletas eléctricas {i}", f"cascos ciclismo {i}", f"candados bici {i}"]},
+                ),
+                args.requests,
+                args.concurrency,
+            )
+        if "article_ministores" in selected:
+            results["article_ministores"] = await run_async_load(
+                lambda i: post_ok("/article_ministores", {"url": f"{page_url}/madrid/noticia-{uuid.uuid4().hex}.html"}),
+                args.requests,
+                args.concurrency,
+            )
+        if "article_two_calls" in selected:
+            # what WordPress does without /article_ministores, for comparison
+            async def two_calls(i: int) -> bool:
+                url = f"{page_url}/madrid/noticia-{uuid.uuid4().hex}.html"
+                r = await client.post("/summarize_url", json={"url": url})
+                if r.status_code != 200:
+                    return False
+                return await post_ok("/create_ministores", {"topics": r.json()["topics"]})
+
+            results["article_two_calls"] = await run_async_load(two_calls, args.requests, args.concurrency)
+    return results
+
+
+# ----------------------------
+# In-process scenarios
+# ----------------------------
+def _storage_scenarios(args, selected) -> dict:
+    results = {}
+    storage.SUMMARIES_FILE = Path(_TMP) / "summaries.jsonl"
+    summary = "La Comunidad de Madrid abre el plazo de ayudas para la compra de bicicletas eléctricas."
+    topics = ["bicicletas eléctricas", "cascos ciclismo", "candados bici"]
+
+    if "storage_save" in selected or "storage_load" in selected:
+        save = run_thread_load(
+            lambda i: storage.save_summary("url", f"https://www.europapress.es/n/{i}", summary, topics=topics),
+            args.storage_records,
+            args.concurrency,
+        )
+        if "storage_save" in selected:
+            results["storage_save"] = save
+    if "storage_load" in selected:
+        results["storage_load"] = run_thread_load(lambda i: storage.load_all_summaries(), args.storage_loads, 1)
+        results["storage_load"]["records"] = args.storage_records
+    return results
+
+
+def _ministore_scenarios(args, selected, db_factory) -> dict:
+    results = {}
+    if "ministore_create" in selected:
+
+        def create(i: int) -> None:
+            db = db_factory()
+            db.connect()
+            try:
+                ministore_books.create_book_from_topic(
+                    db=db,
+                    topic=f"bicicletas eléctricas {i}",
+                    user_id=221,
+                    category_id=30,
+                    language="es",
+                    base_book_url="https://www.deanna2u.com/book",
+                )
+            finally:
+                db.disconnect()
+
+        results["ministore_create"] = run_thread_load(create, args.requests, args.concurrency)
+
+    if "ministore_render" in selected:
+        try:
+            from ministore_creator import render_ministore_html_from_db
+        except ImportError as e:
+            results["ministore_render"] = {"skipped": f"ministore_creator not importable: {e}"}
+            return results
+
+        db = db_factory()
+        db.connect()
+        ministore_ids = []
+        try:
+            items = load_fixture("serper_search.json")["shopping"]
+            for m in range(args.ministores):
+                ministore_id = uuid.uuid4().hex
+                ministore_ids.append(ministore_id)
+                db.execute_query(
+                    "INSERT INTO ministores (id, topic, language, created_at) VALUES (%s, %s, %s, %s)",
+                    (ministore_id, f"tema {m}", "es", int(time.time())),
+                )
+                for pos, item in enumerate(items):
+                    item_id = f"{m}-{item['productId']}"
+                    db.execute_query(
+                        "INSERT IGNORE INTO ministore_items (id, title, description, url, keywords, language) "
+                        "VALUES (%s, %s, %s, %s, %s, %s)",
+                        (item_id, item["title"], item.get("source", ""), item["link"], f"tema {m}", "es"),
+                    )
+                    db.execute_query(
+                        "INSERT IGNORE INTO ministore_item_map (ministore_id, item_id, pos) VALUES (%s, %s, %s)",
+                        (ministore_id, item_id, pos),
+                    )
+        finally:
+            db.disconnect()
+
+        def render(i: int) -> None:
+            conn = db_factory()
+            conn.connect()
+            try:
+                if not render_ministore_html_from_db(conn, ministore_ids[i % len(ministore_ids)]):
+                    raise RuntimeError("empty render")
+            finally:
+                conn.disconnect()
+
+        results["ministore_render"] = run_thread_load(render, args.requests, args.concurrency)
+    return results
+
+
+def run(args) -> dict:
+    selected = set(args.scenarios.split(",")) if args.scenarios else set(SCENARIOS)
+    unknown = selected - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    faults = {"latency": args.latency, "jitter": args.jitter, "error_rate": args.error_rate, "seed": args.seed}
+    db_factory = _use_db(args.db)
+
+    with OpenAIStub(first_token_latency=0.0, token_delay=0.0, **faults) as openai_stub, SerperStub(
+        **faults
+    ) as serper_stub, Deanna2uStub(on_create=_insert_book_row(db_factory), **faults) as deanna_stub, PageStub(
+        **faults
+    ) as page_stub:
+        summarizer.client = OpenAI(base_url=openai_stub.base_url, api_key="bench", max_retries=0)
+        deanna2u_books.DEANNA2U_API_URL = deanna_stub.api_url
+        ministore_engine.SERPER_URL = serper_stub.search_url
+
+        scenarios = {}
+        with serve_app(main.app) as base_url:
+            scenarios.update(asyncio.run(_http_scenarios(base_url, page_stub.url, args, selected)))
+        scenarios.update(_storage_scenarios(args, selected))
+        scenarios.update(_ministore_scenarios(args, selected, db_factory))
+
+        upstream = {
+            name: {"calls": stub.calls, "injected_errors": stub.errors}
+            for name, stub in (
+                ("openai", openai_stub),
+                ("serper", serper_stub),
+                ("deanna2u", deanna_stub),
+                ("pages", page_stub),
+            )
+        }
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        "scenarios": {name: scenarios[name] for name in SCENARIOS if name in scenarios},
+        "upstream": upstream,
+    }
+
+
+def main_cli() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", help=f"comma-separated subset of: {','.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added by every stubbed upstream call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of uniform jitter on that latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream calls answered with HTTP 500")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", choices=("sqlite", "mysql"), default="sqlite")
+    parser.add_argument("--storage-records", type=int, default=5000)
+    parser.add_argument("--storage-loads", type=int, default=20)
+    parser.add_argument("--ministores", type=int, default=50, help="ministores seeded for ministore_render")
+    parser.add_argument("-o", "--output", help="write the JSON report here as well as to stdout")
+    parser.add_argument("--compare", help="previous report; exit 1 if p95 or RPS regress beyond --threshold")
+    parser.add_argument("--threshold", type=float, default=20.0, help="allowed regression in percent")
+    args = parser.parse_args()
+
+    report = run(args)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(baseline, report, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
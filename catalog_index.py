@@ -0,0 +1,377 @@
+# catalog_index.py
+"""
+Local BM25 search over the harvested ministore catalog, so a topic the catalog
+already covers is served without a Serper call.
+
+Every item written by ministore_engine.upsert_ministore_items_into_db is
+(re)indexed here: its title (counted twice), description and keywords are
+tokenized like topics in topic_index (accents folded, stopwords dropped, plurals
+singularized, synonyms merged) and stored as an inverted index in SQLite.
+
+Postings are kept in impact order: each posting stores the BM25 term-frequency
+part tf*(k1+1) / (tf + k1*(1 - b + b*len/avglen)), computed with the average
+length at indexing time, so a query reads only the CANDIDATES_PER_TERM best
+postings of each query term and scores them with the current idf. That bounds a
+query to a few small index range scans whatever the catalog size; the ranking
+is approximate past those candidates, which is fine for picking a handful of
+products.
+
+Scores are reported normalized to 0..1 (the share of the query's best possible
+BM25 score), which is what CATALOG_MIN_SCORE is compared against.
+
+    python -m catalog_index rebuild     # index everything already in ministore_items
+    python -m catalog_index search "bicicletas eléctricas baratas"
+"""
+import argparse
+import json
+import math
+import sqlite3
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from topic_index import topic_tokens
+
+K1 = 1.2
+B = 0.75
+TITLE_WEIGHT = 2
+# Impacts are stored as integers: IMPACT_SCALE * tf-part (at most K1 + 1).
+IMPACT_SCALE = 10000
+CANDIDATES_PER_TERM = 256
+CACHE_KB = 64 * 1024
+
+
+@dataclass
+class CatalogHit:
+    id: str
+    title: str
+    description: str
+    url: str
+    keywords: str
+    language: str
+    score: float
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in topic_tokens(text) if len(t) > 1]
+
+
+def _item_terms(item: Dict) -> Counter:
+    terms = Counter(tokenize(item.get("title") or "") * TITLE_WEIGHT)
+    terms.update(tokenize(item.get("description") or ""))
+    terms.update(tokenize(item.get("keywords") or ""))
+    return terms
+
+
+def _idf(docs: int, df: int) -> float:
+    return math.log(1 + (docs - df + 0.5) / (df + 0.5))
+
+
+class CatalogIndex:
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        conn = self._conn()
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS terms (
+                id INTEGER PRIMARY KEY,
+                term TEXT NOT NULL UNIQUE,
+                df INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY,
+                item_id TEXT NOT NULL UNIQUE,
+                title TEXT, description TEXT, url TEXT, keywords TEXT, language TEXT,
+                length INTEGER NOT NULL,
+                postings TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                term_id INTEGER NOT NULL,
+                impact INTEGER NOT NULL,
+                doc_id INTEGER NOT NULL,
+                PRIMARY KEY (term_id, impact DESC, doc_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value REAL NOT NULL
+            );
+            """
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA cache_size=-{CACHE_KB}")
+            self._local.conn = conn
+        return conn
+
+    def _stats(self, conn: sqlite3.Connection):
+        """(number of docs, total length)."""
+        values = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        return int(values.get("docs", 0)), values.get("length", 0.0)
+
+    def __len__(self) -> int:
+        return self._stats(self._conn())[0]
+
+    # ----------------------------
+    # Search
+    # ----------------------------
+    def search(self, query: str, language: Optional[str] = None, limit: int = 10) -> List[CatalogHit]:
+        """Best items for the query, highest normalized score first."""
+        conn = self._conn()
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        if not query_terms:
+            return []
+        docs, _ = self._stats(conn)
+        if not docs:
+            return []
+
+        rows = conn.execute(
+            f"SELECT id, term, df FROM terms WHERE term IN ({','.join('?' * len(query_terms))})", query_terms
+        ).fetchall()
+        found = {term: (term_id, df) for term_id, term, df in rows}
+
+        # the best achievable score counts the query terms the catalog doesn't know too
+        max_score = sum(_idf(docs, found[t][1] if t in found else 0) * (K1 + 1) for t in query_terms)
+        known = [found[t] for t in query_terms if t in found]
+        if not known:
+            return []
+
+        # top postings of every term, summed and ranked per document in one statement
+        branch = (
+            "SELECT * FROM (SELECT doc_id, impact * ? AS score FROM postings "
+            "WHERE term_id = ? ORDER BY impact DESC LIMIT ?)"
+        )
+        params: List = []
+        for term_id, df in known:
+            params.extend((_idf(docs, df) / IMPACT_SCALE / max_score, term_id, CANDIDATES_PER_TERM))
+        # a few spare candidates for items in other languages
+        params.append(limit * 2)
+        ranked = conn.execute(
+            f"""
+            SELECT doc_id, SUM(score) AS total FROM ({" UNION ALL ".join([branch] * len(known))})
+            GROUP BY doc_id ORDER BY total DESC LIMIT ?
+            """,
+            params,
+        ).fetchall()
+        if not ranked:
+            return []
+
+        by_id = {
+            row[0]: row[1:]
+            for row in conn.execute(
+                f"""
+                SELECT id, item_id, title, description, url, keywords, language FROM docs
+                WHERE id IN ({','.join('?' * len(ranked))})
+                """,
+                [doc_id for doc_id, _ in ranked],
+            )
+        }
+        hits = []
+        for doc_id, score in ranked:
+            item_id, title, description, url, keywords, item_language = by_id[doc_id]
+            if language and item_language and item_language != language:
+                continue
+            hits.append(CatalogHit(item_id, title, description, url, keywords, item_language, round(score, 4)))
+        return hits[:limit]
+
+    # ----------------------------
+    # Indexing
+    # ----------------------------
+    def add(self, item: Dict) -> None:
+        self.add_many([item])
+
+    def add_many(self, items: Iterable[Dict], batch_size: int = 2000) -> int:
+        """
+        (Re)indexes items ({id, title, description, url, keywords, language}), one
+        transaction per batch_size items. Returns the number indexed.
+        """
+        indexed = 0
+        batch: List[Dict] = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                indexed += self._index_batch(batch)
+                batch = []
+        if batch:
+            indexed += self._index_batch(batch)
+        return indexed
+
+    def _index_batch(self, items: List[Dict]) -> int:
+        conn = self._conn()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                docs, total_length = self._stats(conn)
+                by_item = {str(item["id"]): item for item in items}  # last one wins
+                df_delta: Counter = Counter()
+
+                # forget the previous version of re-indexed items
+                ids = list(by_item)
+                old = conn.execute(
+                    f"SELECT id, length, postings FROM docs WHERE item_id IN ({','.join('?' * len(ids))})", ids
+                ).fetchall()
+                old_postings = []
+                for doc_id, length, postings in old:
+                    for term_id, impact in json.loads(postings):
+                        old_postings.append((term_id, impact, doc_id))
+                        df_delta[term_id] -= 1
+                    docs -= 1
+                    total_length -= length
+                conn.executemany("DELETE FROM postings WHERE term_id = ? AND impact = ? AND doc_id = ?", old_postings)
+                conn.executemany("DELETE FROM docs WHERE id = ?", [(row[0],) for row in old])
+
+                term_counts = {item_id: _item_terms(item) for item_id, item in by_item.items()}
+                lengths = {item_id: sum(counts.values()) for item_id, counts in term_counts.items()}
+                docs += len(by_item)
+                total_length += sum(lengths.values())
+                avg_length = total_length / docs if docs else 1.0
+
+                term_ids = self._term_ids(conn, {t for counts in term_counts.values() for t in counts})
+                new_postings = []
+                for item_id, item in by_item.items():
+                    length = lengths[item_id]
+                    norm = K1 * (1 - B + B * length / (avg_length or 1.0))
+                    doc_postings = [
+                        (term_ids[term], int(round(IMPACT_SCALE * tf * (K1 + 1) / (tf + norm))))
+                        for term, tf in term_counts[item_id].items()
+                    ]
+                    cur = conn.execute(
+                        """
+                        INSERT INTO docs (item_id, title, description, url, keywords, language, length, postings)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        """,
+                        (
+                            item_id,
+                            item.get("title") or "",
+                            item.get("description") or "",
+                            item.get("url") or "",
+                            item.get("keywords") or "",
+                            item.get("language") or "",
+                            length,
+                            json.dumps(doc_postings, separators=(",", ":")),
+                        ),
+                    )
+                    for term_id, impact in doc_postings:
+                        new_postings.append((term_id, impact, cur.lastrowid))
+                        df_delta[term_id] += 1
+
+                new_postings.sort()
+                conn.executemany("INSERT INTO postings (term_id, impact, doc_id) VALUES (?, ?, ?)", new_postings)
+                conn.executemany(
+                    "UPDATE terms SET df = df + ? WHERE id = ?", [(d, t) for t, d in df_delta.items() if d]
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    [("docs", docs), ("length", total_length)],
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return len(by_item)
+
+    @staticmethod
+    def _term_ids(conn: sqlite3.Connection, terms) -> Dict[str, int]:
+        terms = sorted(terms)
+        ids: Dict[str, int] = {}
+        for start in range(0, len(terms), 500):
+            chunk = terms[start : start + 500]
+            ids.update(
+                conn.execute(f"SELECT term, id FROM terms WHERE term IN ({','.join('?' * len(chunk))})", chunk)
+            )
+        missing = [(t,) for t in terms if t not in ids]
+        if missing:
+            conn.executemany("INSERT INTO terms (term) VALUES (?)", missing)
+            for start in range(0, len(missing), 500):
+                chunk = [t for (t,) in missing[start : start + 500]]
+                ids.update(
+                    conn.execute(f"SELECT term, id FROM terms WHERE term IN ({','.join('?' * len(chunk))})", chunk)
+                )
+        return ids
+
+
+@lru_cache(maxsize=1)
+def get_index() -> Optional[CatalogIndex]:
+    """
+    The process-wide index at CATALOG_INDEX_DB, or None when CATALOG_MIN_SCORE
+    is 0 (catalog search disabled).
+    """
+    from settings import get_settings
+
+    settings = get_settings()
+    if settings.catalog_min_score <= 0:
+        return None
+    return CatalogIndex(settings.catalog_index_db)
+
+
+def rebuild_from_db(db, index: CatalogIndex, table_name: str = "ministore_items", batch_size: int = 5000) -> int:
+    """Indexes every row of the catalog table, in id order."""
+    indexed = 0
+    last_id = ""
+    while True:
+        rows = db.execute_query(
+            f"""
+            SELECT id, title, description, url, keywords, language FROM {table_name}
+            WHERE id > %s ORDER BY id LIMIT %s
+            """,
+            (last_id, batch_size),
+        )
+        if rows is None:
+            raise RuntimeError("Failed to read ministore items.")
+        if not rows:
+            return indexed
+        indexed += index.add_many(rows, batch_size=batch_size)
+        last_id = rows[-1]["id"]
+
+
+def _cmd_rebuild(args: argparse.Namespace) -> None:
+    from ministore_creator import get_db
+
+    index = get_index()
+    if index is None:
+        raise SystemExit("Catalog search is disabled (CATALOG_MIN_SCORE=0).")
+    db = get_db()
+    try:
+        print(f"Indexed {rebuild_from_db(db, index)} items into {index.path}")
+    finally:
+        db.disconnect()
+
+
+def _cmd_search(args: argparse.Namespace) -> None:
+    index = get_index()
+    if index is None:
+        raise SystemExit("Catalog search is disabled (CATALOG_MIN_SCORE=0).")
+    for hit in index.search(args.query, language=args.language, limit=args.limit):
+        print(f"{hit.score:.3f}  {hit.title}  {hit.url}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local BM25 index over the ministore catalog.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_rebuild = sub.add_parser("rebuild", help="index every item in ministore_items")
+    p_rebuild.set_defaults(func=_cmd_rebuild)
+
+    p_search = sub.add_parser("search", help="query the index")
+    p_search.add_argument("query")
+    p_search.add_argument("--language", default="es")
+    p_search.add_argument("--limit", type=int, default=10)
+    p_search.set_defaults(func=_cmd_search)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
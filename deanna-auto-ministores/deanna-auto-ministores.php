@@ -1,17 +1,95 @@
 <?php
 /*
 Plugin Name: Deanna Auto Ministores
-Description: Extrae dos temas comerciales con GPT y genera enlaces de mini tiendas deanna2u.com para cada artículo al publicarlo.
-Version: 0.1
+Description: Extrae temas comerciales con GPT y genera mini tiendas deanna2u.com para cada artículo al publicarlo (en segundo plano, vía la API de jobs).
+Version: 0.2
 Author: Deanna
 */
 
 if (!defined('ABSPATH')) exit;
 
 define('DEANNA_MINISTORES_META_KEY', '_deanna_ministores_json');
+define('DEANNA_MINISTORES_JOB_META_KEY', '_deanna_ministores_job_id');
 
 /**
- * Generate ministores on post publish.
+ * Summarizer API (main.py) base URL, e.g. define('DEANNA_SUMMARIZER_API_URL', 'https://api.example.com');
+ * Webhook callbacks also need define('DEANNA_WEBHOOK_SECRET', '...') matching JOBS_WEBHOOK_SECRET
+ * on the API; without it they are rejected and results arrive through polling only.
+ */
+function deanna_ministores_api_url($path) {
+    if (!defined('DEANNA_SUMMARIZER_API_URL') || !DEANNA_SUMMARIZER_API_URL) return '';
+    return rtrim(DEANNA_SUMMARIZER_API_URL, '/') . $path;
+}
+
+/**
+ * Queue a summarize -> topics -> ministores job. The API answers 202 immediately,
+ * so publishing never waits on OpenAI. Returns the job array or null.
+ */
+function deanna_ministores_enqueue_job($post_id, $content) {
+    $endpoint = deanna_ministores_api_url('/jobs');
+    if (!$endpoint) {
+        error_log('Deanna ministores: missing DEANNA_SUMMARIZER_API_URL');
+        return null;
+    }
+
+    $response = wp_remote_post(
+        $endpoint,
+        array(
+            "headers" => array("Content-Type" => "application/json"),
+            "body" => wp_json_encode(array(
+                "post_id" => (int) $post_id,
+                "text" => $content,
+                "callback_url" => rest_url('deanna/v1/ministores-callback'),
+                "create_ministores" => true,
+            )),
+            "timeout" => 5,
+        )
+    );
+
+    if (is_wp_error($response)) {
+        error_log('Deanna ministores: job enqueue failed: ' . $response->get_error_message());
+        return null;
+    }
+
+    $job = json_decode(wp_remote_retrieve_body($response), true);
+    if (!is_array($job) || empty($job['job_id'])) return null;
+
+    update_post_meta($post_id, DEANNA_MINISTORES_JOB_META_KEY, $job['job_id']);
+    return $job;
+}
+
+/**
+ * Store a finished job's topics/book URLs as the post's ministore entries.
+ */
+function deanna_ministores_store_result($post_id, $result) {
+    $topics = isset($result['topics']) && is_array($result['topics']) ? $result['topics'] : [];
+    $book_urls = isset($result['book_urls']) && is_array($result['book_urls']) ? $result['book_urls'] : [];
+    if (empty($topics)) return [];
+
+    $entries = [];
+    foreach ($topics as $i => $topic) {
+        $url = isset($book_urls[$i]) ? $book_urls[$i] : "https://www.deanna2u.com/?q=" . rawurlencode($topic);
+        $entries[] = [
+            "topic" => sanitize_text_field($topic),
+            "url"   => esc_url_raw($url)
+        ];
+    }
+
+    update_post_meta($post_id, DEANNA_MINISTORES_META_KEY, wp_json_encode($entries));
+    delete_post_meta($post_id, DEANNA_MINISTORES_JOB_META_KEY);
+    return $entries;
+}
+
+function deanna_ministores_post_content($post) {
+    $content = trim(wp_strip_all_tags($post->post_content));
+    if (mb_strlen($content) > 15000) {
+        $content = mb_substr($content, 0, 15000);
+    }
+    return $content;
+}
+
+/**
+ * Queue ministore generation on post publish.
  */
 function deanna_generate_ministores_on_save($post_id, $post, $update) {
 
@@ -21,109 +99,136 @@ function deanna_generate_ministores_on_save($post_id, $post, $update) {
     $existing = get_post_meta($post_id, DEANNA_MINISTORES_META_KEY, true);
     if (!empty($existing)) return;
 
-    $content = wp_strip_all_tags($post->post_content);
-    $content = trim($content);
+    $content = deanna_ministores_post_content($post);
     if (mb_strlen($content) < 200) return;
 
-    if (mb_strlen($content) > 15000) {
-        $content = mb_substr($content, 0, 15000);
-    }
+    // Same post + same content is deduplicated by the API's idempotency key,
+    // so repeated saves don't create duplicate jobs.
+    deanna_ministores_enqueue_job($post_id, $content);
+}
 
-    if (!defined('DEANNA_OPENAI_API_KEY') || !DEANNA_OPENAI_API_KEY) {
-        error_log('Deanna ministores: missing DEANNA_OPENAI_API_KEY');
-        return;
-    }
-
-    $api_key = DEANNA_OPENAI_API_KEY;
-
-    // ---------- COPY OF YOUR PYTHON SYSTEM PROMPT ----------
-    $system_prompt = "Eres un experto en marketing digital especializado en identificar oportunidades comerciales...\n\n" .
-        "Tu objetivo es extraer dos temas comerciales del artículo que sean perfectos para generar anuncios...\n\n" .
-        "FORMATO DE RESPUESTA:\n" .
-        "Devuelve EXACTAMENTE dos búsquedas comerciales, una por línea, sin numeración ni viñetas. Máximo 5 palabras.\n\n" .
-        "EJEMPLOS:\n" .
-        "mejores restaurantes Madrid centro\n" .
-        "hoteles económicos Barcelona playa\n" .
-        "cursos online marketing digital\n" .
-        "smartphones gama media 2024\n" .
-        "gimnasios cerca de mí";
-
-    // ---------- COPY OF YOUR PYTHON USER PROMPT ----------
-    $user_prompt = "Analiza el siguiente artículo periodístico e identifica DOS temas comerciales perfectos...\n\n" .
-        "INSTRUCCIONES:\n" .
-        "- Lee el artículo\n" .
-        "- Identifica dos oportunidades comerciales\n" .
-        "- Usa máximo 5 palabras\n" .
-        "- Devuelve exactamente dos líneas\n\n" .
-        "ARTÍCULO:\n" . $content;
-
-    $body = array(
-        "model" => "gpt-4o-mini",
-        "messages" => array(
-            array("role" => "system", "content" => $system_prompt),
-            array("role" => "user", "content" => $user_prompt),
-        ),
-        "temperature" => 0.4,
-    );
+add_action('save_post', 'deanna_generate_ministores_on_save', 10, 3);
 
-    $response = wp_remote_post(
-        "https://api.openai.com/v1/chat/completions",
-        array(
-            "headers" => array(
-                "Content-Type" => "application/json",
-                "Authorization" => "Bearer " . $api_key,
-            ),
-            "body" => wp_json_encode($body),
-            "timeout" => 90,
-        )
-    );
 
-    if (is_wp_error($response)) {
-        error_log('OpenAI error: ' . $response->get_error_message());
-        return;
+/**
+ * True when $job_id is the job this post is waiting for.
+ */
+function deanna_ministores_is_post_job($post_id, $job_id) {
+    $expected = (string) get_post_meta($post_id, DEANNA_MINISTORES_JOB_META_KEY, true);
+    return $expected !== '' && hash_equals($expected, (string) $job_id);
+}
+
+/**
+ * Webhook called by the API when a job finishes. The route is public, so the
+ * HMAC signature is mandatory: without a configured secret every call is refused.
+ */
+function deanna_ministores_callback(WP_REST_Request $request) {
+    $body = $request->get_body();
+
+    if (!defined('DEANNA_WEBHOOK_SECRET') || !DEANNA_WEBHOOK_SECRET) {
+        error_log('Deanna ministores: callback rejected, DEANNA_WEBHOOK_SECRET is not set');
+        return new WP_REST_Response(array("ok" => false), 401);
+    }
+    $expected = 'sha256=' . hash_hmac('sha256', $body, DEANNA_WEBHOOK_SECRET);
+    $given = (string) $request->get_header('x-deanna-signature');
+    if (!hash_equals($expected, $given)) {
+        return new WP_REST_Response(array("ok" => false), 401);
     }
 
-    $resp_body = wp_remote_retrieve_body($response);
-    $data = json_decode($resp_body, true);
+    $data = json_decode($body, true);
+    if (!is_array($data) || empty($data['post_id']) || empty($data['job_id'])) {
+        return new WP_REST_Response(array("ok" => false), 400);
+    }
 
-    if (!isset($data['choices'][0]['message']['content'])) return;
+    $post_id = (int) $data['post_id'];
+    if (!deanna_ministores_is_post_job($post_id, $data['job_id'])) {
+        // a stale or foreign job: the post isn't waiting for it
+        return new WP_REST_Response(array("ok" => false), 409);
+    }
+    if (($data['status'] ?? '') === 'done') {
+        deanna_ministores_store_result($post_id, $data['result'] ?? []);
+    } else {
+        error_log('Deanna ministores: job failed for post ' . $post_id . ': ' . ($data['error'] ?? ''));
+        delete_post_meta($post_id, DEANNA_MINISTORES_JOB_META_KEY);
+    }
+
+    return new WP_REST_Response(array("ok" => true), 200);
+}
 
-    $raw_output = trim($data['choices'][0]['message']['content']);
-    $lines = preg_split('/\r\n|\r|\n/', $raw_output);
+add_action('rest_api_init', function () {
+    register_rest_route('deanna/v1', '/ministores-callback', array(
+        'methods' => 'POST',
+        'callback' => 'deanna_ministores_callback',
+        'permission_callback' => '__return_true',
+    ));
+});
 
-    $topics = [];
-    foreach ($lines as $line) {
-        $line = trim($line);
-        if ($line === '') continue;
-        $line = preg_replace('/^\d+\.\s*/', '', $line);
-        $topics[] = $line;
+
+/**
+ * AJAX for the on-demand button: returns cached entries, or queues a job and
+ * lets deanna-ministores.js poll deanna_ministores_status until it is done.
+ */
+function deanna_ministores_ajax_generate() {
+    check_ajax_referer('deanna_ministores', 'nonce');
+
+    $post_id = isset($_POST['post_id']) ? (int) $_POST['post_id'] : 0;
+    $post = $post_id ? get_post($post_id) : null;
+    if (!$post) wp_send_json_error(array("message" => "Post no encontrado"));
+
+    $json = get_post_meta($post_id, DEANNA_MINISTORES_META_KEY, true);
+    $entries = $json ? json_decode($json, true) : null;
+    if (is_array($entries)) {
+        wp_send_json_success(array("cached" => true, "html" => deanna_ministores_render_box($entries)));
     }
 
-    if (empty($topics)) return;
+    $job = deanna_ministores_enqueue_job($post_id, deanna_ministores_post_content($post));
+    if (!$job) wp_send_json_error(array("message" => "No se ha podido iniciar la generación"));
 
-    $topics = array_slice($topics, 0, 2);
+    wp_send_json_success(array("pending" => true, "job_id" => $job['job_id']));
+}
 
-    $entries = [];
-    foreach ($topics as $topic) {
-        $words = preg_split('/\s+/', $topic);
-        if (count($words) > 5) {
-            $words = array_slice($words, 0, 5);
-            $topic = implode(' ', $words);
+function deanna_ministores_ajax_status() {
+    check_ajax_referer('deanna_ministores', 'nonce');
+
+    $post_id = isset($_POST['post_id']) ? (int) $_POST['post_id'] : 0;
+    $job_id = isset($_POST['job_id']) ? sanitize_text_field($_POST['job_id']) : '';
+    $endpoint = deanna_ministores_api_url('/jobs/' . rawurlencode($job_id));
+    if (!$post_id || !$job_id || !$endpoint || !get_post($post_id)) {
+        wp_send_json_error(array("message" => "Petición inválida"));
+    }
+
+    // Only the job queued for this post may write its meta (visitors can call this).
+    if (!deanna_ministores_is_post_job($post_id, $job_id)) {
+        $json = get_post_meta($post_id, DEANNA_MINISTORES_META_KEY, true);
+        $entries = $json ? json_decode($json, true) : null;
+        if (is_array($entries)) {
+            // already stored, e.g. by the webhook, which clears the job meta
+            wp_send_json_success(array("cached" => true, "html" => deanna_ministores_render_box($entries)));
         }
+        wp_send_json_error(array("message" => "Petición inválida"));
+    }
 
-        $encoded = rawurlencode($topic);
-        $url = "https://www.deanna2u.com/?q=" . $encoded;
+    $response = wp_remote_get($endpoint, array("timeout" => 5));
+    if (is_wp_error($response)) wp_send_json_error(array("message" => $response->get_error_message()));
 
-        $entries[] = [
-            "topic" => sanitize_text_field($topic),
-            "url"   => esc_url_raw($url)
-        ];
+    $job = json_decode(wp_remote_retrieve_body($response), true);
+    $status = is_array($job) ? ($job['status'] ?? '') : '';
+
+    if ($status === 'done') {
+        $entries = deanna_ministores_store_result($post_id, $job['result'] ?? []);
+        wp_send_json_success(array("cached" => false, "html" => deanna_ministores_render_box($entries)));
+    }
+    if ($status === 'failed' || $status === '') {
+        wp_send_json_error(array("message" => is_array($job) ? ($job['error'] ?? 'Error') : 'Error'));
     }
 
-    update_post_meta($post_id, DEANNA_MINISTORES_META_KEY, wp_json_encode($entries));
+    wp_send_json_success(array("pending" => true, "job_id" => $job_id));
 }
 
-add_action('save_post', 'deanna_generate_ministores_on_save', 10, 3);
+add_action('wp_ajax_deanna_ministores_generate', 'deanna_ministores_ajax_generate');
+add_action('wp_ajax_nopriv_deanna_ministores_generate', 'deanna_ministores_ajax_generate');
+add_action('wp_ajax_deanna_ministores_status', 'deanna_ministores_ajax_status');
+add_action('wp_ajax_nopriv_deanna_ministores_status', 'deanna_ministores_ajax_status');
 
 
 /**
@@ -138,6 +243,14 @@ function deanna_ministores_box_shortcode() {
     $entries = json_decode($json, true);
     if (!is_array($entries)) return '';
 
+    return deanna_ministores_render_box($entries);
+}
+add_shortcode('deanna_ministores_box', 'deanna_ministores_box_shortcode');
+
+
+function deanna_ministores_render_box($entries) {
+    if (empty($entries)) return '';
+
     ob_start(); ?>
     <div class="deanna-ministores-box">
         <h3>Tiendas relacionadas</h3>
@@ -154,7 +267,6 @@ function deanna_ministores_box_shortcode() {
     <?php
     return ob_get_clean();
 }
-add_shortcode('deanna_ministores_box', 'deanna_ministores_box_shortcode');
 
 
 /**
@@ -192,3 +304,22 @@ function deanna_ministores_styles() {
     wp_add_inline_style('wp-block-library', $css);
 }
 add_action('wp_enqueue_scripts', 'deanna_ministores_styles');
+
+
+/**
+ * On-demand button script (.deanna-ministores-btn).
+ */
+function deanna_ministores_scripts() {
+    wp_enqueue_script(
+        'deanna-ministores',
+        plugins_url('deanna-ministores.js', __FILE__),
+        array(),
+        '0.2',
+        true
+    );
+    wp_localize_script('deanna-ministores', 'DeannaMinistores', array(
+        'ajaxUrl' => admin_url('admin-ajax.php'),
+        'nonce' => wp_create_nonce('deanna_ministores'),
+    ));
+}
+add_action('wp_enqueue_scripts', 'deanna_ministores_scripts');
@@ -2,6 +2,31 @@
     function qs(root, sel) {
       return root.querySelector(sel);
     }
+
+    const POLL_INTERVAL_MS = 2000;
+    const POLL_MAX_TRIES = 90;
+
+    function sleep(ms) {
+      return new Promise((resolve) => setTimeout(resolve, ms));
+    }
+
+    async function post(fields) {
+      const form = new FormData();
+      form.append("nonce", DeannaMinistores.nonce);
+      Object.keys(fields).forEach((k) => form.append(k, fields[k]));
+      const res = await fetch(DeannaMinistores.ajaxUrl, { method: "POST", body: form });
+      return res.json();
+    }
+
+    // The server answers immediately with a job id; poll until the job is done.
+    async function waitForJob(postId, jobId) {
+      for (let i = 0; i < POLL_MAX_TRIES; i++) {
+        await sleep(POLL_INTERVAL_MS);
+        const data = await post({ action: "deanna_ministores_status", post_id: postId, job_id: jobId });
+        if (!data || !data.success || !data.data.pending) return data;
+      }
+      return { success: false, data: { message: "Tiempo de espera agotado" } };
+    }
   
     async function handleClick(btn) {
       const root = btn.closest(".deanna-ministores-ondemand");
@@ -13,14 +38,11 @@
       status.textContent = "Generando...";
       output.innerHTML = "";
   
-      const form = new FormData();
-      form.append("action", "deanna_ministores_generate");
-      form.append("nonce", DeannaMinistores.nonce);
-      form.append("post_id", postId);
-  
       try {
-        const res = await fetch(DeannaMinistores.ajaxUrl, { method: "POST", body: form });
-        const data = await res.json();
+        let data = await post({ action: "deanna_ministores_generate", post_id: postId });
+        if (data && data.success && data.data.pending) {
+          data = await waitForJob(postId, data.data.job_id);
+        }
   
         if (!data || !data.success) {
           const msg = (data && data.data && data.data.message) ? data.data.message : "Error desconocido";
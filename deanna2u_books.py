@@ -1,25 +1,27 @@
 # deanna2u_books.py
-import os
 import re
-import requests
 from urllib.parse import urlparse
 
-from dotenv import load_dotenv
+from metrics import stage
+from settings import get_settings
 
-load_dotenv()
+DEANNA2U_API_URL = get_settings().deanna2u_api_url
 
-DEANNA2U_API_URL = "https://www.deanna2u.com/api/create_new_book"
+SLUG_LOOKUP_SQL = "SELECT id FROM cliperest_book WHERE slug = %s LIMIT 1"
 
 
 def create_deanna2u_book(term: str, user_id: int) -> str:
-    api_key = os.getenv("DEANNA2U_API_KEY")
+    import requests
+
+    api_key = get_settings().deanna2u_api_key
     if not api_key:
         raise RuntimeError("DEANNA2U_API_KEY is not set")
 
     payload = {"term": term, "user_id": int(user_id)}
     headers = {"Content-Type": "application/json", "X-API-KEY": api_key}
 
-    r = requests.post(DEANNA2U_API_URL, json=payload, headers=headers, timeout=25)
+    with stage("deanna2u_create_book"):
+        r = requests.post(DEANNA2U_API_URL, json=payload, headers=headers, timeout=25)
     if r.status_code != 200:
         raise RuntimeError(f"Deanna2u API error HTTP {r.status_code}: {r.text}")
 
@@ -44,8 +46,12 @@ def resolve_book_id_from_book_url(book_url: str) -> int:
 
     db = MySQLConnector()
     db.connect()
+    # Deanna2u has only just written the book: a replica would usually miss it
+    # and cost an extra connection (and lag check) before the primary anyway
+    db.pin_to_primary()
     try:
-        rows = db.execute_query("SELECT id FROM cliperest_book WHERE slug = %s LIMIT 1", (slug,))
+        with stage("db_slug_lookup"):
+            rows = db.execute_query(SLUG_LOOKUP_SQL, (slug,))
         if not rows:
             raise RuntimeError(f"Book created but not found in DB yet. slug={slug}")
         return int(rows[0]["id"])
@@ -56,6 +62,24 @@ def resolve_book_id_from_book_url(book_url: str) -> int:
             pass
 
 
+async def resolve_book_id_from_book_url_async(book_url: str) -> int:
+    """
+    resolve_book_id_from_book_url for async handlers, on a pooled AsyncMySQLConnector.
+    """
+    from AsyncMySQLConnector import AsyncMySQLConnector
+
+    slug = extract_slug_from_book_url(book_url)
+    if not slug:
+        raise RuntimeError(f"Could not extract slug from book_url: {book_url}")
+
+    async with AsyncMySQLConnector() as db:
+        with stage("db_slug_lookup"):
+            rows = await db.execute_query(SLUG_LOOKUP_SQL, (slug,), prepared=True)
+    if not rows:
+        raise RuntimeError(f"Book created but not found in DB yet. slug={slug}")
+    return int(rows[0]["id"])
+
+
 def extract_slug_from_book_url(book_url: str) -> str:
     """
     Supports /other/<slug> and /book/<slug> patterns.
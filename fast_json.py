@@ -0,0 +1,29 @@
+# fast_json.py
+"""
+JSON encoding for responses the app builds by hand (NDJSON lines, SSE events),
+with orjson when it is installed.
+
+Routes with a response_model (SummarizeResponse, CreateMinistoresResponse, ...)
+don't need this: FastAPI serializes those straight to bytes with the model's
+pydantic-core serializer, as long as the app has no default_response_class.
+An orjson response class as the default would switch them back to the slower
+dict + encoder path.
+"""
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    """UTF-8 JSON (non-ASCII kept as is, like ensure_ascii=False)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_str(obj: Any) -> str:
+    return dumps(obj).decode("utf-8")
@@ -0,0 +1,336 @@
+# jobs.py
+"""
+Persistent job queue (SQLite) and worker pool behind the /jobs API.
+
+WordPress enqueues work on publish and gets a job id back immediately; the
+summarize -> topics -> create_ministores stages run in background threads, and
+results are polled via GET /jobs/{id} or pushed to an optional webhook.
+"""
+import hashlib
+import hmac
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# A running job whose lease expires (worker crashed/restarted) is picked up again.
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 5.0
+
+
+@dataclass
+class Job:
+    id: str
+    idempotency_key: str
+    status: str
+    stage: str
+    payload: Dict
+    result: Dict = field(default_factory=dict)
+    error: Optional[str] = None
+    callback_url: Optional[str] = None
+    attempts: int = 0
+    created_at: float = 0.0
+    updated_at: float = 0.0
+
+
+def make_idempotency_key(post_id, text: Optional[str], url: Optional[str], create_ministores: bool = False) -> str:
+    """
+    Same post + same content => same job, however many times save_post or the
+    front-end button fire. Editing the post changes the hash and yields a new job.
+    Asking for ministores is part of the key too, so such a request never gets
+    back an earlier job that was run without them.
+
+    URL jobs are keyed by the URL, since the page isn't fetched until the job
+    runs: an edited article at the same URL keeps the key. The caller bounds
+    that with enqueue(max_age=...), see JOBS_URL_DEDUP_MINUTES.
+    """
+    content = (text or "").strip() or (url or "").strip()
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()[:32]
+    key = f"{post_id if post_id is not None else 'anon'}:{digest}"
+    return key + ":ministores" if create_ministores else key
+
+
+class JobQueue:
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._local = threading.local()
+        self._wakeup = threading.Condition()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn().execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                status TEXT NOT NULL,
+                stage TEXT NOT NULL DEFAULT '',
+                payload TEXT NOT NULL,
+                result TEXT NOT NULL DEFAULT '{}',
+                error TEXT,
+                callback_url TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                locked_until REAL NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn().execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Job:
+        return Job(
+            id=row["id"],
+            idempotency_key=row["idempotency_key"],
+            status=row["status"],
+            stage=row["stage"],
+            payload=json.loads(row["payload"]),
+            result=json.loads(row["result"] or "{}"),
+            error=row["error"],
+            callback_url=row["callback_url"],
+            attempts=row["attempts"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+        )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def enqueue(
+        self,
+        payload: Dict,
+        idempotency_key: str,
+        callback_url: Optional[str] = None,
+        max_age: Optional[float] = None,
+    ) -> Tuple[Job, bool]:
+        """
+        Returns (job, created). An existing job with the same key is returned as-is,
+        unless it failed, in which case it is queued again (resuming after its last
+        completed stage), or it finished more than max_age seconds ago, in which
+        case it runs again from the start.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE idempotency_key = ?", (idempotency_key,)).fetchone()
+            stale = (
+                row is not None
+                and max_age is not None
+                and row["status"] == STATUS_DONE
+                and now - row["updated_at"] > max_age
+            )
+            if row and row["status"] != STATUS_FAILED and not stale:
+                conn.execute("COMMIT")
+                return self._row_to_job(row), False
+
+            if row:
+                job_id = row["id"]
+                conn.execute(
+                    """
+                    UPDATE jobs SET status = ?, error = NULL, attempts = 0, callback_url = ?,
+                        locked_until = 0, updated_at = ?
+                    WHERE id = ?
+                    """,
+                    (STATUS_QUEUED, callback_url, now, job_id),
+                )
+                if stale:
+                    conn.execute("UPDATE jobs SET stage = '', result = '{}' WHERE id = ?", (job_id,))
+            else:
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    """
+                    INSERT INTO jobs (id, idempotency_key, status, payload, callback_url, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (job_id, idempotency_key, STATUS_QUEUED, json.dumps(payload, ensure_ascii=False),
+                     callback_url, now, now),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        with self._wakeup:
+            self._wakeup.notify()
+        return self.get(job_id), True
+
+    def claim(self) -> Optional[Job]:
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                """
+                SELECT * FROM jobs
+                WHERE status IN (?, ?) AND locked_until < ?
+                ORDER BY created_at
+                LIMIT 1
+                """,
+                (STATUS_QUEUED, STATUS_RUNNING, now),
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, locked_until = ?, updated_at = ? WHERE id = ?",
+                (STATUS_RUNNING, now + LEASE_SECONDS, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self.get(row["id"])
+
+    def save_progress(self, job: Job, stage: str) -> None:
+        job.stage = stage
+        self._conn().execute(
+            "UPDATE jobs SET stage = ?, result = ?, locked_until = ?, updated_at = ? WHERE id = ?",
+            (stage, json.dumps(job.result, ensure_ascii=False), time.time() + LEASE_SECONDS, time.time(), job.id),
+        )
+
+    def finish(self, job: Job, error: Optional[str] = None) -> None:
+        not_before = 0.0
+        if error and job.attempts < MAX_ATTEMPTS:
+            # queued again, but not claimable until the backoff has passed
+            status = STATUS_QUEUED
+            not_before = time.time() + RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+        else:
+            status = STATUS_FAILED if error else STATUS_DONE
+        job.status = status
+        job.error = error
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, error = ?, result = ?, locked_until = ?, updated_at = ? WHERE id = ?",
+            (status, error, json.dumps(job.result, ensure_ascii=False), not_before, time.time(), job.id),
+        )
+
+    def wait_for_work(self, timeout: float) -> None:
+        with self._wakeup:
+            self._wakeup.wait(timeout)
+
+
+def send_webhook(job: Job, secret: Optional[str] = None, attempts: int = 3) -> None:
+    """
+    POSTs the final job state to job.callback_url. With a secret, the body is signed
+    as X-Deanna-Signature: sha256=<hmac> so WordPress can verify it.
+    """
+    if not job.callback_url:
+        return
+
+    import requests
+
+    body = json.dumps(
+        {
+            "job_id": job.id,
+            "post_id": job.payload.get("post_id"),
+            "status": job.status,
+            "result": job.result,
+            "error": job.error,
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+    headers = {"Content-Type": "application/json"}
+    if secret:
+        sig = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+        headers["X-Deanna-Signature"] = f"sha256={sig}"
+
+    delay = 1.0
+    for attempt in range(1, attempts + 1):
+        try:
+            r = requests.post(job.callback_url, data=body, headers=headers, timeout=10)
+            if r.status_code < 300:
+                return
+            logger.warning("Webhook for job %s returned HTTP %s", job.id, r.status_code)
+        except requests.RequestException as e:
+            logger.warning("Webhook for job %s failed: %s", job.id, e)
+        if attempt < attempts:
+            time.sleep(delay)
+            delay *= 2
+
+
+class JobWorkerPool:
+    """
+    Threads that claim jobs and run `handler(job, queue)`. The handler runs the
+    pipeline stages, calling queue.save_progress() after each one, and raises on failure.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handler: Callable[[Job, JobQueue], None],
+        workers: int = 2,
+        webhook_secret: Optional[str] = None,
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.workers = workers
+        self.webhook_secret = webhook_secret
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        with self.queue._wakeup:
+            self.queue._wakeup.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim()
+            except sqlite3.Error as e:
+                logger.warning("Job claim failed: %s", e)
+                job = None
+
+            if job is None:
+                self.queue.wait_for_work(timeout=1.0)
+                continue
+
+            error = None
+            try:
+                self.handler(job, self.queue)
+            except Exception as e:
+                logger.exception("Job %s failed at stage %s", job.id, job.stage)
+                error = str(e)
+
+            self.queue.finish(job, error=error)
+            if job.status in (STATUS_DONE, STATUS_FAILED):
+                send_webhook(job, secret=self.webhook_secret)
+
+
+def queue_from_settings() -> JobQueue:
+    from settings import get_settings
+
+    return JobQueue(get_settings().jobs_db)
@@ -1,31 +1,115 @@
 # main.py
-import os
-from typing import List, Optional, Tuple
-
-import requests
-from bs4 import BeautifulSoup
-from fastapi import FastAPI, HTTPException
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
 
 from summarizer import (
+    LONG_DOCUMENT_MAX_CHARS,
+    condense_article,
+    stream_article_summary,
     summarize_article_overall,
     summarize_spanish_article_multi,
 )
 
-from deanna2u_books import create_deanna2u_book, resolve_book_id_from_book_url
-
-load_dotenv()
-
-if not os.getenv("OPENAI_API_KEY"):
+from deanna2u_books import (
+    create_deanna2u_book,
+    resolve_book_id_from_book_url,
+    resolve_book_id_from_book_url_async,
+)
+from pdf_utils import PdfFile
+from uploads import UploadError, UploadTooLargeError, spool_upload
+from web_utils import DownloadTooLargeError, UnsupportedContentError, fetch_article_text
+from batch_pipeline import StageLimits, iter_batch_items, run_batch
+from jobs import Job, JobQueue, JobWorkerPool, make_idempotency_key, queue_from_settings
+from singleflight import SingleFlight, text_key, url_key
+from compression import CompressionMiddleware
+from fast_json import dumps, dumps_str
+from metrics import CONTENT_TYPE, MetricsMiddleware, record_cache, render as render_metrics, stage
+from near_duplicates import index_from_settings, minhash, warm_up as warm_up_near_duplicates
+from topic_index import index_from_settings as topic_index_from_settings, normalize_topic
+from prewarm import topic_log_from_settings
+from settings import get_settings
+
+settings = get_settings()
+
+if not settings.openai_api_key:
     raise RuntimeError("OPENAI_API_KEY is not set")
 
-if not os.getenv("DEANNA2U_API_KEY"):
+if not settings.deanna2u_api_key:
     raise RuntimeError("DEANNA2U_API_KEY is not set")
 
 DEANNA2U_USER_ID = 221  # forced per requirement
 
-app = FastAPI(title="Deanna Summarizer API")
+MAX_PDF_BYTES = settings.max_pdf_bytes
+MAX_PDF_PAGES = settings.max_pdf_pages
+PDF_WORKERS = settings.pdf_workers
+PDF_TEXT_CACHE_SIZE = 256
+MAX_BATCH_BYTES = settings.max_batch_bytes
+
+# SINGLEFLIGHT_LOCK_DIR (a local directory) extends coalescing across uvicorn workers.
+singleflight = SingleFlight(lock_dir=settings.singleflight_lock_dir)
+
+# Republished wire copy (edited headline/byline/paragraph) reuses the earlier
+# article's summary and topics; None when NEAR_DUPLICATE_THRESHOLD=0.
+near_duplicates = index_from_settings()
+
+# Topics already turned into a book recently ("hoteles baratos Madrid" ~ "hoteles
+# económicos Madrid") reuse it; None when TOPIC_INDEX_MAX_AGE_HOURS=0.
+topic_index = topic_index_from_settings()
+
+# Requested topics feed the catalog pre-warm worker (prewarm.py); None when
+# PREWARM_DAILY_BUDGET=0.
+topic_log = topic_log_from_settings()
+
+job_queue = queue_from_settings()
+job_pool = JobWorkerPool(
+    job_queue,
+    handler=lambda job, queue: _run_job(job, queue),
+    workers=settings.job_workers,
+    webhook_secret=settings.jobs_webhook_secret,
+)
+
+
+def _warm_up() -> None:
+    """
+    The OpenAI SDK, requests, bs4 and numpy are imported on first use so workers start
+    accepting connections sooner; this loads them right after startup instead of
+    on the first request.
+    """
+    from summarizer import get_client
+    from web_utils import warm_up as warm_up_web
+
+    get_client()
+    warm_up_web()
+    if near_duplicates is not None:
+        warm_up_near_duplicates()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.warmup:
+        threading.Thread(target=_warm_up, name="warmup", daemon=True).start()
+    job_pool.start()
+    try:
+        yield
+    finally:
+        job_pool.stop()
+        from AsyncMySQLConnector import close_pool
+
+        await close_pool()
+
+
+app = FastAPI(title="Deanna Summarizer API", lifespan=lifespan)
+if settings.compression_min_bytes > 0:
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_bytes)
+app.add_middleware(MetricsMiddleware)
 
 
 # ----------------------------
@@ -53,50 +137,51 @@ class CreateMinistoresResponse(BaseModel):
     book_ids: List[int]
 
 
+class ArticleMinistoresRequest(BaseModel):
+    url: Optional[str] = None
+    text: Optional[str] = None
+
+
+class ArticleMinistoresResponse(BaseModel):
+    summary: str
+    topics: List[str]
+    book_urls: List[str]
+    book_ids: List[int]
+
+
+class JobRequest(BaseModel):
+    post_id: Optional[int] = None
+    text: Optional[str] = None
+    url: Optional[str] = None
+    callback_url: Optional[str] = None
+    create_ministores: bool = True
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str  # queued | running | done | failed
+    stage: str  # last completed stage: summary | topics | ministores
+    result: Dict[str, Any]  # summary, topics, book_urls, book_ids as they become available
+    error: Optional[str] = None
+    created: bool = False
+
+
 # ----------------------------
-# Health
+# Health / metrics
 # ----------------------------
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+
 # ----------------------------
 # Helpers
 # ----------------------------
-def extract_text_from_html(html: str) -> str:
-    """
-    Extract main article text:
-    - Prefer <article> p
-    - Fallback to all <p>
-    - Fallback to all text
-    """
-    soup = BeautifulSoup(html, "html.parser")
-
-    paragraphs = [
-        p.get_text(strip=True)
-        for p in soup.select("article p")
-        if p.get_text(strip=True)
-    ]
-
-    if not paragraphs:
-        paragraphs = [
-            p.get_text(strip=True)
-            for p in soup.select("p")
-            if p.get_text(strip=True)
-        ]
-
-    if paragraphs:
-        text = "\n\n".join(paragraphs)
-    else:
-        text = soup.get_text(separator=" ", strip=True)
-
-    text = " ".join(text.split())
-    if len(text) > 15000:
-        text = text[:15000]
-    return text
-
-
 def _create_book_and_resolve_id(term: str) -> Tuple[str, int]:
     """
     Calls Deanna2u create_new_book API, then resolves cliperest_book.id from the returned book_url slug
@@ -107,16 +192,108 @@ def _create_book_and_resolve_id(term: str) -> Tuple[str, int]:
     return book_url, book_id
 
 
-# ----------------------------
-# Endpoint 1: Summarize + Topics
-# ----------------------------
-@app.post("/summarize", response_model=SummarizeResponse)
-async def summarize(req: AnalyzeRequest):
-    text = (req.text or "").strip()
-    if not text:
-        raise HTTPException(status_code=400, detail="Empty text")
+def _book_for_topic(term: str) -> Tuple[str, int]:
+    if topic_index is None:
+        return _create_book_and_resolve_id(term)
+
+    match = topic_index.lookup(term)
+    record_cache("topic_index", match is not None)
+    if match is not None:
+        return match.book_url, match.book_id
+
+    book_url, book_id = _create_book_and_resolve_id(term)
+    topic_index.add(term, book_url, book_id)
+    return book_url, book_id
+
+
+def _create_books_for_topics(topics: List[str]) -> Tuple[List[str], List[int]]:
+    """
+    One book per topic; topics with the same normalized form (within the request or
+    already in the topic index) share a book instead of creating another.
+    """
+    if topic_log is not None:
+        topic_log.record(topics)
+
+    book_urls: List[str] = []
+    book_ids: List[int] = []
+    seen: Dict[str, Tuple[str, int]] = {}
+
+    for term in topics:
+        key = normalize_topic(term) or term
+        if key not in seen:
+            seen[key] = _book_for_topic(term)
+        book_url, book_id = seen[key]
+        book_urls.append(book_url)
+        book_ids.append(book_id)
+
+    return book_urls, book_ids
+
 
+async def _book_for_topic_async(term: str) -> Tuple[str, int]:
+    """
+    _book_for_topic for async handlers: the Deanna2u call runs in a worker thread,
+    the slug lookup on the async DB pool, so it overlaps with the other topics'
+    HTTP calls on the event loop instead of holding a thread.
+    """
+    if topic_index is not None:
+        match = await run_in_threadpool(topic_index.lookup, term)
+        record_cache("topic_index", match is not None)
+        if match is not None:
+            return match.book_url, match.book_id
+
+    book_url = await run_in_threadpool(create_deanna2u_book, term=term, user_id=DEANNA2U_USER_ID)
+    book_id = await resolve_book_id_from_book_url_async(book_url)
+    if topic_index is not None:
+        await run_in_threadpool(topic_index.add, term, book_url, book_id)
+    return book_url, book_id
+
+
+async def _create_books_for_topics_async(topics: List[str]) -> Tuple[List[str], List[int]]:
+    """
+    _create_books_for_topics with the books created concurrently, one per
+    distinct normalized topic.
+    """
+    if topic_log is not None:
+        topic_log.record(topics)
+
+    keys = [normalize_topic(term) or term for term in topics]
+    terms: Dict[str, str] = {}
+    for key, term in zip(keys, topics):
+        terms.setdefault(key, term)
+
+    books = await asyncio.gather(*(_book_for_topic_async(term) for term in terms.values()))
+    by_key = dict(zip(terms, books))
+    return [by_key[key][0] for key in keys], [by_key[key][1] for key in keys]
+
+
+def _near_duplicate_match(text: str):
+    """
+    (minhash signature, reusable near-duplicate match or None); the signature is
+    None when the index is disabled or the text too short to sign.
+    """
+    if near_duplicates is None:
+        return None, None
+    with stage("near_duplicate_lookup"):
+        signature = minhash(text)
+        match = near_duplicates.lookup_signature(signature) if signature is not None else None
+    record_cache("near_duplicate", match is not None)
+    if match is not None and len(match.topics) < 3:
+        match = None
+    return signature, match
+
+
+def _summarize_text(text: str) -> SummarizeResponse:
+    """
+    Shared summary + topics pipeline behind the /summarize* endpoints.
+    A near-duplicate of an already summarized article reuses its result; long
+    documents are condensed chunk by chunk first (map-reduce).
+    """
     try:
+        signature, match = _near_duplicate_match(text)
+        if match is not None:
+            return SummarizeResponse(summary=match.summary, topics=match.topics[:3])
+
+        text = condense_article(text)
         summary = summarize_article_overall(text)
         topics = summarize_spanish_article_multi(text, n=3)
         topics = [t.strip() for t in topics if t and t.strip()][:3]
@@ -124,6 +301,9 @@ async def summarize(req: AnalyzeRequest):
         if len(topics) < 3:
             raise HTTPException(status_code=500, detail="Failed to extract 3 topics")
 
+        if signature is not None:
+            near_duplicates.add_signature(signature, summary, topics)
+
         return SummarizeResponse(summary=summary, topics=topics)
 
     except HTTPException:
@@ -132,46 +312,250 @@ async def summarize(req: AnalyzeRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/summarize_url", response_model=SummarizeResponse)
-async def summarize_url(req: AnalyzeUrlRequest):
-    url = (req.url or "").strip()
-    if not url:
-        raise HTTPException(status_code=400, detail="Empty URL")
+def _fetch_article_text(url: str) -> str:
+    import requests
 
     try:
-        resp = requests.get(
-            url,
-            timeout=15,
-            headers={
-                "User-Agent": "Mozilla/5.0 (compatible; DeannaSummarizerBot/1.0)",
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-            },
-        )
+        article_text = fetch_article_text(url, timeout=15, max_pdf_chars=LONG_DOCUMENT_MAX_CHARS)
     except requests.RequestException as e:
         raise HTTPException(status_code=502, detail=f"Error fetching URL: {e}")
+    except UnsupportedContentError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except DownloadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=502, detail=str(e))
 
-    if resp.status_code != 200 or not resp.text:
-        raise HTTPException(status_code=502, detail=f"Error fetching URL, HTTP {resp.status_code}")
-
-    article_text = extract_text_from_html(resp.text)
     if not article_text:
         raise HTTPException(status_code=500, detail="No se ha podido extraer texto del artículo")
+    return article_text
+
+
+def _summarize_url(url: str) -> SummarizeResponse:
+    return _summarize_text(_fetch_article_text(url))
+
+
+async def _coalesced(key: str, fn: Callable[..., SummarizeResponse], *args) -> SummarizeResponse:
+    """
+    Runs fn(*args) in the threadpool, once per key: concurrent identical requests
+    (WP hook + front-end button + syndicated copies) share a single upstream call.
+    """
+
+    async def run() -> Dict[str, Any]:
+        response = await run_in_threadpool(fn, *args)
+        return response.model_dump()
+
+    return SummarizeResponse(**await singleflight.do(key, run))
+
+
+# Extracted PDF text keyed by the upload's sha256, so re-uploads skip extraction.
+_pdf_text_cache: "OrderedDict[str, str]" = OrderedDict()
+
+
+def _pdf_text_cache_get(content_hash: str) -> Optional[str]:
+    text = _pdf_text_cache.get(content_hash)
+    if text is not None:
+        _pdf_text_cache.move_to_end(content_hash)
+    return text
+
+
+def _pdf_text_cache_put(content_hash: str, text: str) -> None:
+    _pdf_text_cache[content_hash] = text
+    _pdf_text_cache.move_to_end(content_hash)
+    while len(_pdf_text_cache) > PDF_TEXT_CACHE_SIZE:
+        _pdf_text_cache.popitem(last=False)
+
 
+def _extract_pdf_upload(file: BinaryIO) -> str:
+    """
+    Runs in a worker thread: parses the PDF once, enforces the page limit, then
+    extracts text (in a process pool for long documents).
+    """
     try:
-        summary = summarize_article_overall(article_text)
-        topics = summarize_spanish_article_multi(article_text, n=3)
-        topics = [t.strip() for t in topics if t and t.strip()][:3]
+        pdf = PdfFile(file)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid PDF: {e}")
 
-        if len(topics) < 3:
-            raise HTTPException(status_code=500, detail="Failed to extract 3 topics")
+    with pdf:
+        try:
+            num_pages = pdf.num_pages
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid PDF: {e}")
 
-        return SummarizeResponse(summary=summary, topics=topics)
+        if num_pages > MAX_PDF_PAGES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"PDF has {num_pages} pages, the limit is {MAX_PDF_PAGES}",
+            )
 
-    except HTTPException:
-        raise
+        return pdf.extract_text(max_chars=LONG_DOCUMENT_MAX_CHARS, max_pages=MAX_PDF_PAGES, workers=PDF_WORKERS)
+
+
+# ----------------------------
+# Endpoint 1: Summarize + Topics
+# ----------------------------
+@app.post("/summarize", response_model=SummarizeResponse)
+async def summarize(req: AnalyzeRequest):
+    text = (req.text or "").strip()
+    if not text:
+        raise HTTPException(status_code=400, detail="Empty text")
+
+    return await _coalesced(text_key(text), _summarize_text, text)
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {dumps_str(data)}\n\n"
+
+
+@app.post("/summarize/stream")
+async def summarize_stream(req: AnalyzeRequest):
+    """
+    Server-Sent Events version of /summarize:
+      event: summary   {"delta": "..."}   (repeated, as tokens arrive)
+      event: summary_done {"summary": "..."}
+      event: topics    {"topics": [...]}
+      event: done      {}
+    or event: error {"detail": "..."}. Both completions start immediately and run
+    concurrently; only the summary is streamed.
+    """
+    text = (req.text or "").strip()
+    if not text:
+        raise HTTPException(status_code=400, detail="Empty text")
+
+    try:
+        # instant for normal articles; long documents go through the map step first
+        text = await run_in_threadpool(condense_article, text)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    loop = asyncio.get_running_loop()
+    deltas: asyncio.Queue = asyncio.Queue()
+
+    def pump_summary() -> None:
+        # runs in a worker thread; hands each delta to the event loop
+        try:
+            for delta in stream_article_summary(text):
+                loop.call_soon_threadsafe(deltas.put_nowait, ("delta", delta))
+            loop.call_soon_threadsafe(deltas.put_nowait, ("end", None))
+        except Exception as e:
+            loop.call_soon_threadsafe(deltas.put_nowait, ("error", str(e)))
+
+    topics_task = asyncio.ensure_future(run_in_threadpool(summarize_spanish_article_multi, text, 3))
+    summary_task = asyncio.ensure_future(run_in_threadpool(pump_summary))
+
+    async def events():
+        parts: List[str] = []
+        try:
+            while True:
+                kind, data = await deltas.get()
+                if kind == "delta":
+                    parts.append(data)
+                    yield _sse("summary", {"delta": data})
+                elif kind == "end":
+                    yield _sse("summary_done", {"summary": "".join(parts)})
+                    break
+                else:
+                    yield _sse("error", {"detail": data})
+                    return
+
+            try:
+                topics = await topics_task
+            except Exception as e:
+                yield _sse("error", {"detail": str(e)})
+                return
+            topics = [t.strip() for t in topics if t and t.strip()][:3]
+            if len(topics) < 3:
+                yield _sse("error", {"detail": "Failed to extract 3 topics"})
+                return
+
+            yield _sse("topics", {"topics": topics})
+            yield _sse("done", {})
+        finally:
+            # on client disconnect the worker threads finish on their own;
+            # just make sure nothing awaits them with an unretrieved exception
+            for task in (topics_task, summary_task):
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/summarize_url", response_model=SummarizeResponse)
+async def summarize_url(req: AnalyzeUrlRequest):
+    url = (req.url or "").strip()
+    if not url:
+        raise HTTPException(status_code=400, detail="Empty URL")
+
+    return await _coalesced(url_key(url), _summarize_url, url)
+
+
+@app.post("/summarize_pdf", response_model=SummarizeResponse)
+async def summarize_pdf(request: Request):
+    """
+    Accepts a PDF either as multipart/form-data (field "file") or as a raw
+    application/pdf body. The upload is streamed to a spooled temp file and
+    rejected with 413 as soon as it exceeds MAX_PDF_BYTES.
+    """
+    content_length = request.headers.get("content-length", "")
+    # multipart framing adds a little on top of the file itself
+    if content_length.isdigit() and int(content_length) > MAX_PDF_BYTES + 64 * 1024:
+        raise HTTPException(status_code=413, detail=f"PDF exceeds {MAX_PDF_BYTES} bytes")
+
+    try:
+        upload = await spool_upload(
+            request.headers.get("content-type", ""),
+            request.stream(),
+            max_bytes=MAX_PDF_BYTES,
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        text = _pdf_text_cache_get(upload.sha256)
+        record_cache("pdf_text", text is not None)
+        if text is None:
+            text = await run_in_threadpool(_extract_pdf_upload, upload.file)
+            _pdf_text_cache_put(upload.sha256, text)
+    finally:
+        upload.file.close()
+
+    text = text.strip()
+    if not text:
+        raise HTTPException(status_code=500, detail="No se ha podido extraer texto del PDF")
+
+    return await _coalesced(text_key(text), _summarize_text, text)
+
+
+@app.post("/summarize_batch")
+async def summarize_batch(request: Request):
+    """
+    Body: JSONL, one {"id"?, "text"} or {"id"?, "url"} object per line.
+    Response: NDJSON, one {"id", "summary", "topics"} or {"id", "error"}
+    line per item, in completion order (not input order).
+    """
+    # The body is spooled before streaming starts: once the response is
+    # streaming, Starlette consumes receive() to watch for disconnects.
+    try:
+        upload = await spool_upload("application/x-ndjson", request.stream(), max_bytes=MAX_BATCH_BYTES)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def ndjson():
+        try:
+            async for result in run_batch(iter_batch_items(upload.file), StageLimits.from_settings()):
+                yield dumps(result) + b"\n"
+        finally:
+            upload.file.close()
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
 
 # ----------------------------
 # Endpoint 2: Create Ministores (real books)
@@ -185,17 +569,147 @@ async def create_ministores(req: CreateMinistoresRequest):
         raise HTTPException(status_code=400, detail="No topics provided")
 
     try:
-        book_urls: List[str] = []
-        book_ids: List[int] = []
-
-        for term in topics:
-            book_url, book_id = _create_book_and_resolve_id(term)
-            book_urls.append(book_url)
-            book_ids.append(book_id)
-
+        book_urls, book_ids = await _create_books_for_topics_async(topics)
         return CreateMinistoresResponse(book_urls=book_urls, book_ids=book_ids)
 
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# ----------------------------
+# Endpoint 2b: Article -> summary, topics and ministores in one call
+# ----------------------------
+async def _article_ministores(text: str) -> ArticleMinistoresResponse:
+    """
+    Summary and topics run concurrently on the condensed text; the books are
+    created as soon as the topics are back, while the summary may still be
+    running. A near-duplicate article reuses its summary and topics.
+    """
+    signature, match = await run_in_threadpool(_near_duplicate_match, text)
+    if match is not None:
+        topics = match.topics[:3]
+        book_urls, book_ids = await _create_books_for_topics_async(topics)
+        return ArticleMinistoresResponse(summary=match.summary, topics=topics, book_urls=book_urls, book_ids=book_ids)
+
+    text = await run_in_threadpool(condense_article, text)
+    summary_task = asyncio.ensure_future(run_in_threadpool(summarize_article_overall, text))
+    try:
+        topics = await run_in_threadpool(summarize_spanish_article_multi, text, 3)
+        topics = [t.strip() for t in topics if t and t.strip()][:3]
+        if len(topics) < 3:
+            raise HTTPException(status_code=500, detail="Failed to extract 3 topics")
+
+        book_urls, book_ids = await _create_books_for_topics_async(topics)
+        summary = await summary_task
+    finally:
+        # on failure the summary thread finishes on its own; don't leave its exception unretrieved
+        summary_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    if signature is not None:
+        await run_in_threadpool(near_duplicates.add_signature, signature, summary, topics)
+    return ArticleMinistoresResponse(summary=summary, topics=topics, book_urls=book_urls, book_ids=book_ids)
+
+
+@app.post("/article_ministores", response_model=ArticleMinistoresResponse)
+async def article_ministores(req: ArticleMinistoresRequest):
+    """
+    /summarize_url (or /summarize) followed by /create_ministores in one round trip,
+    with the stages overlapped instead of run back to back.
+    """
+    text = (req.text or "").strip()
+    url = (req.url or "").strip()
+    if not text and not url:
+        raise HTTPException(status_code=400, detail="Provide text or url")
+
+    async def run() -> Dict[str, Any]:
+        try:
+            article = text or await run_in_threadpool(_fetch_article_text, url)
+            return (await _article_ministores(article)).model_dump()
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    key = "article_ministores:" + (text_key(text) if text else url_key(url))
+    return ArticleMinistoresResponse(**await singleflight.do(key, run))
+
+
+# ----------------------------
+# Endpoint 3: Async jobs (WordPress publish never waits on the LLM)
+# ----------------------------
+def _run_job(job: Job, queue: JobQueue) -> None:
+    """
+    Runs in a JobWorkerPool thread. Each stage's output is persisted as soon as it
+    exists, so a retried job resumes after its last completed stage.
+    """
+    payload = job.payload
+    result = job.result
+
+    # a retry that only lacks the ministores stage doesn't need the article again
+    if "summary" not in result or "topics" not in result:
+        text = (payload.get("text") or "").strip()
+        if not text:
+            text = fetch_article_text(payload["url"], timeout=15, max_pdf_chars=LONG_DOCUMENT_MAX_CHARS)
+            if not text:
+                raise RuntimeError("No se ha podido extraer texto del artículo")
+        text = condense_article(text)
+
+    if "summary" not in result:
+        result["summary"] = summarize_article_overall(text)
+        queue.save_progress(job, "summary")
+
+    if "topics" not in result:
+        topics = summarize_spanish_article_multi(text, n=3)
+        topics = [t.strip() for t in topics if t and t.strip()][:3]
+        if len(topics) < 3:
+            raise RuntimeError("Failed to extract 3 topics")
+        result["topics"] = topics
+        queue.save_progress(job, "topics")
+
+    if payload.get("create_ministores") and "book_urls" not in result:
+        book_urls, book_ids = _create_books_for_topics(result["topics"])
+        result["book_urls"] = book_urls
+        result["book_ids"] = book_ids
+        queue.save_progress(job, "ministores")
+
+
+def _job_response(job: Job, created: bool = False) -> JobResponse:
+    return JobResponse(
+        job_id=job.id,
+        status=job.status,
+        stage=job.stage,
+        result=job.result,
+        error=job.error,
+        created=created,
+    )
+
+
+@app.post("/jobs", response_model=JobResponse, status_code=202)
+async def create_job(req: JobRequest):
+    text = (req.text or "").strip()
+    url = (req.url or "").strip()
+    if not text and not url:
+        raise HTTPException(status_code=400, detail="Provide text or url")
+
+    key = make_idempotency_key(req.post_id, text, url, create_ministores=req.create_ministores)
+    payload = {
+        "post_id": req.post_id,
+        "text": text or None,
+        "url": url or None,
+        "create_ministores": req.create_ministores,
+    }
+
+    # a URL job's key can't see edits to the page, so its result is only reused briefly
+    max_age = None if text else settings.jobs_url_dedup_minutes * 60
+    job, created = await run_in_threadpool(job_queue.enqueue, payload, key, req.callback_url, max_age)
+    return _job_response(job, created=created)
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    job = await run_in_threadpool(job_queue.get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(job)
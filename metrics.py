@@ -0,0 +1,330 @@
+# metrics.py
+"""
+Minimal in-process metrics with Prometheus text exposition (served at /metrics).
+
+Mirrors the prometheus_client API (Counter/Gauge/Histogram + .labels()) without
+the dependency. `stage("fetch")` times a block into deanna_stage_seconds and, when
+METRICS_OTEL=1 and opentelemetry is installed, also opens a span of that name.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from settings import get_settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def labels(self, *values: str):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in list(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key, child) -> List[str]:
+        return [f"{self.name}{_label_str(self.labelnames, key)} {_fmt(child.value)}"]
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback: Optional[Callable[[], float]] = None):
+        self.callback = callback
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+    def render(self) -> List[str]:
+        if self.callback is not None:
+            try:
+                self._default.set(self.callback())
+            except Exception:
+                pass
+        return super().render()
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def _render_child(self, key, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += n
+            labels = _label_str(self.labelnames, key, ("le", _fmt(bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _label_str(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_fmt(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = (), callback=None) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames, callback=callback))
+
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+
+# ----------------------------
+# Shared metrics
+# ----------------------------
+STAGE_SECONDS = histogram(
+    "deanna_stage_seconds",
+    "Latency of pipeline stages (fetch, parse, llm_summary, llm_topics, deanna2u_create_book, db_slug_lookup, ...)",
+    ("stage",),
+)
+STAGE_ERRORS = counter("deanna_stage_errors_total", "Pipeline stages that raised", ("stage",))
+HTTP_SECONDS = histogram(
+    "deanna_http_request_seconds",
+    "API request latency by route",
+    ("method", "route", "status"),
+)
+OPENAI_TOKENS = counter(
+    "deanna_openai_tokens_total",
+    "OpenAI token usage from response.usage by prompt id (kind: prompt, completion, cached)",
+    ("model", "prompt", "kind"),
+)
+OPENAI_CACHED_SHARE = histogram(
+    "deanna_openai_cached_prompt_share",
+    "Per request: share of prompt tokens served from OpenAI's prompt cache",
+    ("model", "prompt"),
+    buckets=(0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0),
+)
+CACHE_REQUESTS = counter(
+    "deanna_cache_requests_total",
+    "Cache lookups by cache and result (hit/miss); hit ratio = hit / (hit + miss)",
+    ("cache", "result"),
+)
+DB_CONNECTIONS_OPENED = counter("deanna_db_connections_opened_total", "MySQL connections opened")
+DB_CONNECTIONS_ACTIVE = gauge("deanna_db_connections_active", "MySQL connections currently open")
+DB_READS = counter(
+    "deanna_db_reads_total",
+    "MySQLConnector reads by where they ran (primary, replica) and why (route: replica, pinned, fallback)",
+    ("target", "route"),
+)
+
+
+# ----------------------------
+# Optional OpenTelemetry spans
+# ----------------------------
+_tracer = None
+if get_settings().metrics_otel:
+    try:
+        # The provider/exporter is configured by the environment, e.g. `opentelemetry-instrument`.
+        from opentelemetry import trace
+
+        _tracer = trace.get_tracer("deanna-summarizer")
+    except ImportError:
+        _tracer = None
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    child = STAGE_SECONDS.labels(name)
+    span_cm = _tracer.start_as_current_span(name) if _tracer is not None else None
+    if span_cm is not None:
+        span_cm.__enter__()
+    t0 = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.labels(name).inc()
+        raise
+    finally:
+        child.observe(time.perf_counter() - t0)
+        if span_cm is not None:
+            span_cm.__exit__(None, None, None)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_openai_usage(model: str, usage, prompt: str = "") -> None:
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    OPENAI_TOKENS.labels(model, prompt, "prompt").inc(prompt_tokens)
+    OPENAI_TOKENS.labels(model, prompt, "completion").inc(getattr(usage, "completion_tokens", 0) or 0)
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+    if cached:
+        OPENAI_TOKENS.labels(model, prompt, "cached").inc(cached)
+    if prompt_tokens:
+        OPENAI_CACHED_SHARE.labels(model, prompt).observe(cached / prompt_tokens)
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (cheaper than BaseHTTPMiddleware) recording request latency
+    by route template, so /jobs/{job_id} stays one series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        t0 = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_SECONDS.labels(scope["method"], path, status["code"]).observe(time.perf_counter() - t0)
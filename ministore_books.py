@@ -3,7 +3,7 @@ import datetime
 from typing import List
 
 from MySQLConnector import MySQLConnector
-from ministore_engine import fetch_ministore_items_from_serper
+from ministore_engine import find_ministore_items
 
 
 def _book_url(base_book_url: str, slug: str) -> str:
@@ -26,11 +26,12 @@ def create_book_from_topic(
     if not topic:
         raise ValueError("topic is empty")
 
-    # 1) fetch items from Serper
-    items_df = fetch_ministore_items_from_serper(
+    # 1) items from the local catalog, or from Serper when it doesn't cover the topic
+    items_df, _ = find_ministore_items(
         query=topic,
         num_results=serper_num_results,
         language=language,
+        min_results=items_per_book,
     )
 
     # take only items_per_book
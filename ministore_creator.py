@@ -2,11 +2,11 @@
 import time
 import uuid
 from dataclasses import dataclass
-from typing import List
+from typing import List, Set, Tuple
 
 from MySQLConnector import MySQLConnector
 from ministore_engine import (
-    fetch_ministore_items_from_serper,
+    find_ministore_items,
     upsert_ministore_items_into_db,
 )
 
@@ -25,8 +25,42 @@ def get_db() -> MySQLConnector:
     return db
 
 
+# Databases (host, port, schema) whose tables, including the ministore_items
+# columns added later, have been confirmed to exist.
+_tables_ready: Set[Tuple] = set()
+
+# Columns added to ministore_items after it was first deployed: name -> ALTER clauses.
+_ADDED_ITEM_COLUMNS = {
+    "url_hash": "ADD COLUMN url_hash CHAR(32), ADD KEY idx_url_hash (url_hash)",
+    "content_hash": "ADD COLUMN content_hash CHAR(32)",
+}
+
+
+def _run_ddl(db: MySQLConnector, sql: str) -> None:
+    if db.execute_query(sql) is None:
+        raise RuntimeError(f"Schema migration failed: {' '.join(sql.split())[:80]}")
+
+
+def _item_columns(db: MySQLConnector) -> Set[str]:
+    rows = db.execute_query("SHOW COLUMNS FROM ministore_items")
+    if rows is None:
+        raise RuntimeError("Could not read the ministore_items columns.")
+    return {row["Field"] for row in rows}
+
+
 def ensure_tables(db: MySQLConnector) -> None:
-    db.execute_query(
+    """
+    Creates the ministore tables and adds the later ministore_items columns when
+    missing. A database is only marked ready once the columns are confirmed, so
+    a failed migration raises here (and is retried on the next call) instead of
+    surfacing later as upsert errors about missing columns.
+    """
+    key = (db.host, db.port, db.database)
+    if key in _tables_ready:
+        return
+
+    _run_ddl(
+        db,
         """
         CREATE TABLE IF NOT EXISTS ministores (
             id VARCHAR(64) PRIMARY KEY,
@@ -34,10 +68,11 @@ def ensure_tables(db: MySQLConnector) -> None:
             language VARCHAR(8) NOT NULL DEFAULT 'es',
             created_at BIGINT NOT NULL
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-        """
+        """,
     )
 
-    db.execute_query(
+    _run_ddl(
+        db,
         """
         CREATE TABLE IF NOT EXISTS ministore_items (
             id VARCHAR(128) PRIMARY KEY,
@@ -45,12 +80,22 @@ def ensure_tables(db: MySQLConnector) -> None:
             description TEXT,
             url TEXT,
             keywords VARCHAR(255),
-            language VARCHAR(8)
+            language VARCHAR(8),
+            url_hash CHAR(32),
+            content_hash CHAR(32),
+            KEY idx_url_hash (url_hash)
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-        """
+        """,
     )
-
-    db.execute_query(
+    missing = [name for name in _ADDED_ITEM_COLUMNS if name not in _item_columns(db)]
+    if missing:
+        _run_ddl(db, "ALTER TABLE ministore_items " + ", ".join(_ADDED_ITEM_COLUMNS[name] for name in missing))
+        still_missing = [name for name in missing if name not in _item_columns(db)]
+        if still_missing:
+            raise RuntimeError(f"ministore_items is still missing columns: {', '.join(still_missing)}")
+
+    _run_ddl(
+        db,
         """
         CREATE TABLE IF NOT EXISTS ministore_item_map (
             ministore_id VARCHAR(64) NOT NULL,
@@ -62,8 +107,9 @@ def ensure_tables(db: MySQLConnector) -> None:
               FOREIGN KEY (ministore_id) REFERENCES ministores(id)
               ON DELETE CASCADE
         ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
-        """
+        """,
     )
+    _tables_ready.add(key)
 
 
 def create_ministore_in_db(
@@ -79,13 +125,16 @@ def create_ministore_in_db(
 
     ensure_tables(db)
 
-    items_df = fetch_ministore_items_from_serper(
+    items_df, source = find_ministore_items(
         query=topic,
         num_results=num_results,
         language=language,
+        min_results=items_to_link,
     )
 
-    upsert_ministore_items_into_db(db=db, items_df=items_df, table_name="ministore_items")
+    # catalog hits are rows of ministore_items already
+    if source == "serper":
+        upsert_ministore_items_into_db(db=db, items_df=items_df, table_name="ministore_items")
 
     ministore_id = uuid.uuid4().hex
     created_at = int(time.time())
@@ -100,15 +149,8 @@ def create_ministore_in_db(
     if item_ids:
         values = [(ministore_id, item_id, idx) for idx, item_id in enumerate(item_ids)]
         sql = "INSERT IGNORE INTO ministore_item_map (ministore_id, item_id, pos) VALUES (%s, %s, %s)"
-
-        cursor = None
-        try:
-            cursor = db.connection.cursor()
-            cursor.executemany(sql, values)
-            db.connection.commit()
-        finally:
-            if cursor:
-                cursor.close()
+        if db.execute_many(sql, values) is None:
+            raise RuntimeError("Failed to link items to the ministore.")
 
     return MinistoreCreateResult(ministore_id=ministore_id, topic=topic, item_ids=item_ids)
 
@@ -1,24 +1,115 @@
 # ministore_engine.py
-import os
+import hashlib
 import json
 import urllib.request
 import urllib.error
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 
-import pandas as pd
-from dotenv import load_dotenv
+from metrics import record_cache
+from settings import get_settings
 
-load_dotenv()
-load_dotenv("SerperKey.env")
+# pandas is only needed once results come back; importing it costs ~0.3s at startup.
+if TYPE_CHECKING:
+    import pandas as pd
 
-SERPER_API_KEY = os.getenv("Serper.dev_Key")
+SERPER_API_KEY = get_settings().serper_api_key
+SERPER_URL = get_settings().serper_url
+
+# Query parameters that identify the click, not the product.
+TRACKING_PARAMS = frozenset(
+    {"gclid", "gclsrc", "dclid", "fbclid", "msclkid", "srsltid", "ref", "ref_", "_ga", "mc_cid", "mc_eid"}
+)
+TRACKING_PREFIXES = ("utm_",)
+
+# Item ids, URL hashes and content hashes are this many hex chars of a SHA-256 (128 bits).
+HASH_CHARS = 32
+# keywords is VARCHAR(255): the queries an item was found for, most recent last.
+KEYWORDS_MAX = 255
+KEYWORDS_SEP = " | "
+UPSERT_BATCH = 500
+
+
+# ----------------------------
+# Item identity
+# ----------------------------
+def normalize_url(url: str) -> str:
+    """
+    Same product page, same string: lowercase scheme/host without www., no fragment,
+    no tracking parameters, remaining parameters sorted, no trailing slash.
+    """
+    url = (url or "").strip()
+    if not url:
+        return ""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(((parts.scheme or "https").lower(), host, path, urlencode(query), ""))
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:HASH_CHARS]
+
+
+def url_hash(url: str) -> Optional[str]:
+    normalized = normalize_url(url)
+    return _hash(normalized) if normalized else None
+
+
+def item_id(url: str, product_id: Optional[str] = None, title: str = "") -> str:
+    """
+    Deterministic catalog id: from the normalized URL when there is one (so the same
+    product found by different queries is one row), else the Serper productId, else
+    the title.
+    """
+    normalized = normalize_url(url)
+    if normalized:
+        return _hash(normalized)
+    if product_id:
+        return _hash(f"product:{product_id}")
+    return _hash(f"title:{(title or '').strip().lower()}")
+
+
+def content_hash(record: Dict) -> str:
+    """
+    Hash of what a row shows. Keywords are left out (they are merged, not replaced)
+    and the URL is normalized, so a link that only gained tracking parameters
+    doesn't count as a change.
+    """
+    fields = (
+        record.get("title"),
+        record.get("description"),
+        normalize_url(record.get("url") or ""),
+        record.get("language"),
+    )
+    return _hash("\x1f".join(str(f or "") for f in fields))
+
+
+def merge_keywords(existing: Optional[str], new: str) -> str:
+    """Adds the new query to the item's keywords, dropping the oldest ones past KEYWORDS_MAX."""
+    keywords = [k for k in (existing or "").split(KEYWORDS_SEP) if k]
+    for keyword in (new or "").split(KEYWORDS_SEP):
+        if keyword and keyword not in keywords:
+            keywords.append(keyword)
+    while len(KEYWORDS_SEP.join(keywords)) > KEYWORDS_MAX and len(keywords) > 1:
+        keywords.pop(0)
+    return KEYWORDS_SEP.join(keywords)[:KEYWORDS_MAX]
 
 
 def _call_serper(query: str, num_results: int = 10, lang: str = "es") -> Dict:
     if not SERPER_API_KEY:
         raise RuntimeError("Serper.dev_Key not found in environment.")
 
-    url = "https://google.serper.dev/search"
+    url = SERPER_URL
     payload = {"q": query, "num": num_results, "hl": lang}
     data = json.dumps(payload).encode("utf-8")
 
@@ -43,27 +134,37 @@ def _call_serper(query: str, num_results: int = 10, lang: str = "es") -> Dict:
         raise RuntimeError("Failed to decode Serper response as JSON.") from e
 
 
-def fetch_ministore_items_from_serper(query: str, num_results: int = 10, language: str = "es") -> pd.DataFrame:
+def fetch_ministore_items_from_serper(query: str, num_results: int = 10, language: str = "es") -> "pd.DataFrame":
+    import pandas as pd
+
     data = _call_serper(query=query, num_results=num_results, lang=language)
 
     items = data.get("shopping") or data.get("organic") or []
     records: List[Dict[str, str]] = []
 
-    for idx, item in enumerate(items):
+    seen = set()
+
+    for item in items:
         title = item.get("title") or ""
         description = item.get("snippet") or item.get("description") or ""
         url = item.get("link") or item.get("productLink") or ""
         if not title and not url:
             continue
 
+        record_id = item_id(url, item.get("productId"), title)
+        if record_id in seen:
+            continue
+        seen.add(record_id)
+
         records.append(
             {
-                "id": str(item.get("productId", idx)),
+                "id": record_id,
                 "title": title,
                 "description": description,
                 "url": url,
                 "keywords": query,
                 "language": language,
+                "url_hash": url_hash(url),
             }
         )
 
@@ -71,3 +172,137 @@ def fetch_ministore_items_from_serper(query: str, num_results: int = 10, languag
         raise ValueError("Serper returned no usable results for ministore items.")
 
     return pd.DataFrame.from_records(records)
+
+
+def find_ministore_items(
+    query: str,
+    num_results: int = 10,
+    language: str = "es",
+    min_results: Optional[int] = None,
+) -> Tuple["pd.DataFrame", str]:
+    """
+    (items, source): from the local catalog index when at least min_results items
+    (default num_results) score CATALOG_MIN_SCORE or more, otherwise from Serper.
+    source is "catalog" or "serper"; only Serper results need upserting.
+    """
+    from catalog_index import get_index
+
+    index = get_index()
+    if index is not None:
+        import pandas as pd
+
+        min_results = min_results or num_results
+        min_score = get_settings().catalog_min_score
+        hits = [h for h in index.search(query, language=language, limit=num_results) if h.score >= min_score]
+        record_cache("catalog", len(hits) >= min_results)
+        if len(hits) >= min_results:
+            records = [
+                {
+                    "id": h.id,
+                    "title": h.title,
+                    "description": h.description,
+                    "url": h.url,
+                    "keywords": h.keywords,
+                    "language": h.language,
+                    "url_hash": url_hash(h.url),
+                }
+                for h in hits
+            ]
+            return pd.DataFrame.from_records(records), "catalog"
+
+    return fetch_ministore_items_from_serper(query=query, num_results=num_results, language=language), "serper"
+
+
+def upsert_ministore_items_into_db(db, items_df: "pd.DataFrame", table_name: str = "ministore_items") -> int:
+    """
+    Bulk upsert of fetched items; returns the number of rows written.
+
+    Existing rows are found by id or by URL hash; a fetched item whose URL matches
+    a row under another id (e.g. one stored before ids were derived from URLs)
+    takes that row's id, also in items_df. Rows whose content hash is unchanged
+    and whose keywords already include the query are not written at all.
+    Written rows are (re)indexed in the local catalog index.
+    """
+    if items_df.empty:
+        return 0
+    if not db.connection or not db.connection.is_connected():
+        raise RuntimeError("MySQLConnector is not connected. Call connect() first.")
+
+    records = items_df.to_dict(orient="records")
+    for record in records:
+        record.setdefault("url_hash", url_hash(record.get("url") or ""))
+        record["content_hash"] = content_hash(record)
+
+    ids = [str(r["id"]) for r in records]
+    hashes = [r["url_hash"] for r in records if r.get("url_hash")]
+    existing_by_id, existing_by_url = {}, {}
+    for start in range(0, max(len(ids), len(hashes)), UPSERT_BATCH):
+        id_chunk, hash_chunk = ids[start : start + UPSERT_BATCH], hashes[start : start + UPSERT_BATCH]
+        conditions, params = [], []
+        if id_chunk:
+            conditions.append(f"id IN ({', '.join(['%s'] * len(id_chunk))})")
+            params.extend(id_chunk)
+        if hash_chunk:
+            conditions.append(f"url_hash IN ({', '.join(['%s'] * len(hash_chunk))})")
+            params.extend(hash_chunk)
+        rows = db.execute_query(
+            f"SELECT id, url_hash, content_hash, keywords FROM {table_name} WHERE {' OR '.join(conditions)}",
+            tuple(params),
+        )
+        if rows is None:
+            raise RuntimeError("Failed to read existing ministore items.")
+        for row in rows:
+            existing_by_id[row["id"]] = row
+            if row.get("url_hash"):
+                existing_by_url.setdefault(row["url_hash"], row)
+
+    values = []
+    for record in records:
+        current = existing_by_id.get(str(record["id"]))
+        if current is None and record.get("url_hash"):
+            current = existing_by_url.get(record["url_hash"])
+            if current is not None:
+                record["id"] = current["id"]
+
+        keywords = merge_keywords(current["keywords"] if current else None, str(record.get("keywords") or ""))
+        if current and current.get("content_hash") == record["content_hash"] and keywords == current["keywords"]:
+            continue
+        values.append(
+            (
+                str(record["id"]),
+                str(record["title"]),
+                str(record["description"]),
+                str(record["url"]),
+                keywords,
+                str(record["language"]),
+                record.get("url_hash"),
+                record["content_hash"],
+            )
+        )
+    items_df["id"] = [r["id"] for r in records]
+
+    if not values:
+        return 0
+
+    sql = f"""
+        INSERT INTO {table_name} (id, title, description, url, keywords, language, url_hash, content_hash)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            title = VALUES(title),
+            description = VALUES(description),
+            url = VALUES(url),
+            keywords = VALUES(keywords),
+            language = VALUES(language),
+            url_hash = VALUES(url_hash),
+            content_hash = VALUES(content_hash)
+    """
+    if db.execute_many(sql, values, batch_size=UPSERT_BATCH) is None:
+        raise RuntimeError("Failed to write ministore items.")
+
+    from catalog_index import get_index
+
+    index = get_index()
+    if index is not None:
+        columns = ("id", "title", "description", "url", "keywords", "language")
+        index.add_many(dict(zip(columns, row)) for row in values)
+    return len(values)
@@ -0,0 +1,357 @@
+# near_duplicates.py
+"""
+Near-duplicate article detection (MinHash LSH), persisted in SQLite next to the
+summary store.
+
+Europa Press wire copy is republished with small edits (headline, byline, a
+paragraph), so the exact text/URL keys used by singleflight miss it. For every
+summarized article the index keeps:
+
+- NUM_PERM MinHash values over 5-word shingles, split into BANDS bands of ROWS
+  values. Each band is one bucket key in the `lsh` table. Two articles with
+  Jaccard similarity J share a bucket with probability 1 - (1 - J**ROWS)**BANDS:
+  about 0.998 at J=0.75 and 0.06 at J=0.3.
+- the low byte of each MinHash value (b-bit MinHash, 120 bytes per article),
+  which is enough to estimate J when verifying bucket candidates.
+- the summary and topics produced for it, so a match can be served without
+  calling OpenAI.
+
+NUM_PERM, BANDS and the hash seed are part of the on-disk format: changing them
+requires rebuilding the index.
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+SHINGLE_WORDS = 5
+NUM_PERM = 120
+BANDS = 24
+ROWS = NUM_PERM // BANDS
+# Shorter texts aren't indexed: a couple of shared stock sentences would dominate them.
+MIN_WORDS = 50
+# Jaccard over 5-word shingles: a 600-word piece republished with a new headline,
+# byline and one rewritten paragraph scores about 0.8.
+DEFAULT_THRESHOLD = 0.75
+CACHE_KB = 64 * 1024
+# Verify at most this many bucket candidates, those sharing the most bands first.
+MAX_CANDIDATES = 20
+# Adding deletes articles past max_age at most this often.
+PURGE_INTERVAL_SECONDS = 3600
+
+_SEED = 20240501
+_WORD_RE = re.compile(r"\w+")
+
+_params = None
+_params_lock = threading.Lock()
+
+
+@dataclass
+class NearDuplicate:
+    doc_id: int
+    similarity: float
+    summary: str
+    topics: List[str]
+    created_at: float
+
+
+def _hash_params():
+    """
+    (shingle_coefficients, a, b, band_coefficients), drawn once from a fixed seed.
+    numpy is imported on first use so importing this module stays cheap.
+    """
+    global _params
+    if _params is None:
+        with _params_lock:
+            if _params is None:
+                import numpy as np
+
+                rng = np.random.RandomState(_SEED)
+                odd = np.uint64(1)
+                shingle = rng.randint(1, 1 << 63, size=SHINGLE_WORDS, dtype=np.uint64) | odd
+                a = rng.randint(1, 1 << 63, size=NUM_PERM, dtype=np.uint64) | odd
+                b = rng.randint(0, 1 << 63, size=NUM_PERM, dtype=np.uint64)
+                coef = rng.randint(1, 1 << 62, size=(BANDS, ROWS), dtype=np.uint64) | odd
+                _params = (shingle, a, b, coef)
+    return _params
+
+
+def warm_up() -> None:
+    """Imports numpy and draws the hash parameters ahead of the first lookup."""
+    _hash_params()
+
+
+def shingle_hashes(text: str) -> Optional["np.ndarray"]:
+    """
+    32-bit hashes of every run of SHINGLE_WORDS lowercased words (repeats included,
+    they don't change a MinHash), or None if the text has fewer than MIN_WORDS words.
+    Words are hashed once with crc32 and combined per shingle in numpy.
+    """
+    words = _WORD_RE.findall((text or "").lower())
+    if len(words) < MIN_WORDS:
+        return None
+
+    import numpy as np
+
+    shingle, _, _, _ = _hash_params()
+    w = np.fromiter((zlib.crc32(word.encode("utf-8")) for word in words), dtype=np.uint64, count=len(words))
+    n = len(words) - SHINGLE_WORDS + 1
+    h = np.zeros(n, dtype=np.uint64)
+    for j in range(SHINGLE_WORDS):
+        h += w[j : j + n] * shingle[j]
+    return h >> np.uint64(32)
+
+
+def minhash(text: str) -> Optional["np.ndarray"]:
+    """
+    NUM_PERM MinHash values of the text (32-bit, as uint64), or None if it is too
+    short to index. The permutations are multiply-shift hashes,
+    h(x) = ((a*x + b) mod 2**64) >> 32 with odd 64-bit a.
+    """
+    x = shingle_hashes(text)
+    if x is None:
+        return None
+
+    import numpy as np
+
+    _, a, b, _ = _hash_params()
+    return ((np.outer(x, a) + b) >> np.uint64(32)).min(axis=0)
+
+
+def band_keys(signature: "np.ndarray") -> List[int]:
+    """
+    One signed 64-bit bucket key per band (a random linear hash of the band's rows,
+    wrapping mod 2**64; every band has its own coefficients).
+    """
+    _, _, _, coef = _hash_params()
+    keys = (signature.reshape(BANDS, ROWS) * coef).sum(axis=1)
+    return keys.view("int64").tolist()
+
+
+def fingerprint(signature: "np.ndarray") -> bytes:
+    return (signature & 0xFF).astype("uint8").tobytes()
+
+
+def estimate_similarity(fp_a: bytes, fp_b: bytes) -> float:
+    """
+    Jaccard estimate from two b-bit (b=8) fingerprints: unrelated values still
+    collide with probability 1/256, so the raw match rate is corrected for that.
+    """
+    import numpy as np
+
+    matches = np.count_nonzero(np.frombuffer(fp_a, dtype=np.uint8) == np.frombuffer(fp_b, dtype=np.uint8))
+    rate = matches / NUM_PERM
+    return max(0.0, (rate - 1 / 256) / (1 - 1 / 256))
+
+
+class NearDuplicateIndex:
+    def __init__(self, path: str, threshold: float = DEFAULT_THRESHOLD, max_age: Optional[float] = None):
+        """
+        threshold: minimum estimated Jaccard similarity for lookup() to return a match.
+        max_age: seconds after which an indexed article is no longer reused (None: forever).
+        """
+        self.path = str(path)
+        self.threshold = threshold
+        self.max_age = max_age
+        self._local = threading.local()
+        self._last_purge = 0.0
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY,
+                fingerprint BLOB NOT NULL,
+                summary TEXT NOT NULL,
+                topics TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS lsh (
+                bucket INTEGER NOT NULL,
+                doc_id INTEGER NOT NULL,
+                PRIMARY KEY (bucket, doc_id)
+            ) WITHOUT ROWID
+            """
+        )
+        # for purge(): expired articles by age, then their bucket rows by article
+        conn.execute("CREATE INDEX IF NOT EXISTS docs_created_at ON docs (created_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS lsh_doc_id ON lsh (doc_id)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # the lsh table is written at random keys; a bigger page cache keeps inserts off disk
+            conn.execute(f"PRAGMA cache_size=-{CACHE_KB}")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    # ----------------------------
+    # Lookup
+    # ----------------------------
+    def lookup(self, text: str) -> Optional[NearDuplicate]:
+        signature = minhash(text)
+        return self.lookup_signature(signature) if signature is not None else None
+
+    def lookup_signature(self, signature: "np.ndarray") -> Optional[NearDuplicate]:
+        keys = band_keys(signature)
+        conn = self._conn()
+        candidates = conn.execute(
+            f"""
+            SELECT doc_id FROM lsh WHERE bucket IN ({",".join("?" * len(keys))})
+            GROUP BY doc_id ORDER BY COUNT(*) DESC LIMIT ?
+            """,
+            (*keys, MAX_CANDIDATES),
+        ).fetchall()
+        if not candidates:
+            return None
+
+        ids = [row[0] for row in candidates]
+        min_created = time.time() - self.max_age if self.max_age else 0.0
+        rows = conn.execute(
+            f"""
+            SELECT id, fingerprint, summary, topics, created_at FROM docs
+            WHERE id IN ({",".join("?" * len(ids))}) AND created_at >= ?
+            """,
+            (*ids, min_created),
+        ).fetchall()
+
+        fp = fingerprint(signature)
+        best = None
+        for doc_id, doc_fp, summary, topics, created_at in rows:
+            similarity = estimate_similarity(fp, doc_fp)
+            if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                best = NearDuplicate(doc_id, round(similarity, 3), summary, json.loads(topics), created_at)
+        return best
+
+    # ----------------------------
+    # Indexing
+    # ----------------------------
+    def add(self, text: str, summary: str, topics: List[str]) -> Optional[int]:
+        signature = minhash(text)
+        return self.add_signature(signature, summary, topics) if signature is not None else None
+
+    def add_signature(self, signature: "np.ndarray", summary: str, topics: List[str]) -> int:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            doc_id = self._insert(conn, signature, summary, topics, time.time())
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        self._maybe_purge()
+        return doc_id
+
+    def add_many(self, entries: Iterable[Tuple[str, str, List[str]]], batch_size: int = 5000) -> int:
+        """
+        Bulk indexing of (text, summary, topics), one transaction per batch_size
+        entries; bucket rows are written sorted so the B-tree is filled in order.
+        Texts too short to index are skipped. Returns the number indexed.
+        """
+        conn = self._conn()
+        indexed = 0
+        now = time.time()
+        docs, buckets = [], []
+
+        def flush():
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                first_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM docs").fetchone()[0]
+                conn.executemany(
+                    "INSERT INTO docs (id, fingerprint, summary, topics, created_at) VALUES (?, ?, ?, ?, ?)",
+                    [(first_id + i, *doc) for i, doc in enumerate(docs)],
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO lsh (bucket, doc_id) VALUES (?, ?)",
+                    sorted((key, first_id + i) for i, keys in enumerate(buckets) for key in keys),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            docs.clear()
+            buckets.clear()
+
+        for text, summary, topics in entries:
+            signature = minhash(text)
+            if signature is None:
+                continue
+            docs.append((fingerprint(signature), summary, json.dumps(topics, ensure_ascii=False), now))
+            buckets.append(band_keys(signature))
+            indexed += 1
+            if len(docs) >= batch_size:
+                flush()
+        if docs:
+            flush()
+        self._maybe_purge()
+        return indexed
+
+    # ----------------------------
+    # Retention
+    # ----------------------------
+    def _maybe_purge(self) -> None:
+        if self.max_age and time.time() - self._last_purge >= PURGE_INTERVAL_SECONDS:
+            self._last_purge = time.time()
+            self.purge()
+
+    def purge(self) -> int:
+        """Deletes articles past max_age and their bucket rows; returns how many articles."""
+        if not self.max_age:
+            return 0
+        conn = self._conn()
+        cutoff = time.time() - self.max_age
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM lsh WHERE doc_id IN (SELECT id FROM docs WHERE created_at < ?)", (cutoff,))
+            deleted = conn.execute("DELETE FROM docs WHERE created_at < ?", (cutoff,)).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return deleted
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, signature, summary: str, topics: List[str], created_at: float) -> int:
+        cur = conn.execute(
+            "INSERT INTO docs (fingerprint, summary, topics, created_at) VALUES (?, ?, ?, ?)",
+            (fingerprint(signature), summary, json.dumps(topics, ensure_ascii=False), created_at),
+        )
+        doc_id = cur.lastrowid
+        conn.executemany(
+            "INSERT OR IGNORE INTO lsh (bucket, doc_id) VALUES (?, ?)",
+            [(key, doc_id) for key in band_keys(signature)],
+        )
+        return doc_id
+
+
+def index_from_settings() -> Optional[NearDuplicateIndex]:
+    """
+    The index configured by NEAR_DUPLICATE_DB / NEAR_DUPLICATE_THRESHOLD /
+    NEAR_DUPLICATE_MAX_AGE_DAYS, or None when the threshold is 0 (disabled).
+    """
+    from settings import get_settings
+
+    settings = get_settings()
+    if settings.near_duplicate_threshold <= 0:
+        return None
+    max_age = settings.near_duplicate_max_age_days * 86400 if settings.near_duplicate_max_age_days else None
+    return NearDuplicateIndex(settings.near_duplicate_db, settings.near_duplicate_threshold, max_age=max_age)
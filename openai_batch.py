@@ -0,0 +1,359 @@
+# openai_batch.py
+"""
+Offline topic extraction through the OpenAI Batch API.
+
+Packs the same summary/topics requests used by summarizer.py into the Batch
+API's JSONL format, submits them, polls for completion and merges the results
+into the summary store (storage.py). Half the price of synchronous calls and
+outside the per-minute rate limits; results arrive within 24h.
+
+    python openai_batch.py submit articles.jsonl --manifest backfill.json
+    python openai_batch.py status --manifest backfill.json
+    python openai_batch.py collect --manifest backfill.json --wait
+
+articles.jsonl uses the batch_pipeline format: one {"id"?, "text", "url"?} per line.
+The client honours OPENAI_BASE_URL, so everything can run against a local stub.
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from batch_pipeline import BatchItem, iter_batch_items
+from prompts import cache_key
+from storage import load_all_summaries, save_summary
+from summarizer import (
+    DEFAULT_MODEL,
+    SUMMARY_TEMPERATURE,
+    TOPICS_TEMPERATURE,
+    build_summary_messages,
+    build_topics_messages,
+    condense_article,
+    parse_summary,
+    parse_topics,
+)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+COMPLETION_WINDOW = "24h"
+# Per input file the API accepts up to 50,000 requests and 200 MB; each article
+# needs two requests, and long articles hit the size limit long before the count.
+MAX_REQUESTS_PER_BATCH = 50000
+MAX_BATCH_FILE_BYTES = 190 * 1024 * 1024
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+SUMMARY_SUFFIX = "::summary"
+TOPICS_SUFFIX = "::topics"
+
+
+def _get_client():
+    from summarizer import get_client
+
+    return get_client()
+
+
+def build_batch_requests(items: Iterable[BatchItem], n: int = 3, model: str = DEFAULT_MODEL) -> Iterator[Dict]:
+    """
+    Two request lines per article: custom_id is "<id>::summary" / "<id>::topics".
+    Both share the article prefix and the same prompt_cache_key.
+
+    Articles go through condense_article first, like on /summarize: one that
+    doesn't fit ARTICLE_MAX_TOKENS is condensed with synchronous chunk calls
+    while the file is written, and its requests carry the partial summaries.
+    """
+    for item in items:
+        text = condense_article(item.text, model=model)
+        summary_messages = build_summary_messages(text)
+        topics_messages = build_topics_messages(text, n=n)
+        yield {
+            "custom_id": item.id + SUMMARY_SUFFIX,
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": {
+                "model": model,
+                "messages": summary_messages,
+                "temperature": SUMMARY_TEMPERATURE,
+                "prompt_cache_key": cache_key(summary_messages),
+            },
+        }
+        yield {
+            "custom_id": item.id + TOPICS_SUFFIX,
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": {
+                "model": model,
+                "messages": topics_messages,
+                "temperature": TOPICS_TEMPERATURE,
+                "prompt_cache_key": cache_key(topics_messages),
+            },
+        }
+
+
+def write_batch_files(
+    items: Iterable[BatchItem],
+    path_for: Callable[[int], Path],
+    n: int = 3,
+    model: str = DEFAULT_MODEL,
+    max_bytes: int = MAX_BATCH_FILE_BYTES,
+    max_requests: int = MAX_REQUESTS_PER_BATCH,
+) -> Iterator[Tuple[Path, int]]:
+    """
+    Splits the requests into input files within the API's per-file limits, both
+    requests of an article in the same file. Yields (path, requests) as each file
+    is completed, so it can be submitted before the next one is written.
+    """
+    index, f, size, count = 0, None, 0, 0
+    try:
+        for item in items:
+            lines = [
+                (json.dumps(req, ensure_ascii=False) + "\n").encode("utf-8")
+                for req in build_batch_requests([item], n=n, model=model)
+            ]
+            item_bytes = sum(len(line) for line in lines)
+            if item_bytes > max_bytes:
+                raise ValueError(f"Article {item.id} alone exceeds the batch file limit ({item_bytes} bytes)")
+            if f is not None and (size + item_bytes > max_bytes or count + len(lines) > max_requests):
+                f.close()
+                yield path_for(index), count
+                index, f = index + 1, None
+            if f is None:
+                f, size, count = path_for(index).open("wb"), 0, 0
+            f.writelines(lines)
+            size += item_bytes
+            count += len(lines)
+        if f is not None:
+            f.close()
+            yield path_for(index), count
+    finally:
+        if f is not None and not f.closed:
+            f.close()
+
+
+def submit_batch_file(path: Path, client=None, description: str = "") -> str:
+    client = client or _get_client()
+    with path.open("rb") as f:
+        uploaded = client.files.create(file=f, purpose="batch")
+
+    batch = client.batches.create(
+        input_file_id=uploaded.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window=COMPLETION_WINDOW,
+        metadata={"description": description or path.name},
+    )
+    return batch.id
+
+
+def wait_for_batch(batch_id: str, client=None, poll_interval: float = 30.0, timeout: Optional[float] = None):
+    client = client or _get_client()
+    deadline = time.monotonic() + timeout if timeout else None
+
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+        if deadline and time.monotonic() > deadline:
+            raise TimeoutError(f"Batch {batch_id} still {batch.status} after {timeout}s")
+        time.sleep(poll_interval)
+
+
+def parse_batch_output(lines: Iterable[str], n: int = 3) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+    """
+    Returns ({article_id: {"summary"?, "topics"?}}, {custom_id: error}).
+    """
+    results: Dict[str, Dict] = {}
+    errors: Dict[str, str] = {}
+
+    for line in lines:
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        custom_id = row.get("custom_id", "")
+        response = row.get("response") or {}
+
+        if row.get("error") or response.get("status_code") != 200:
+            errors[custom_id] = json.dumps(row.get("error") or response.get("body"), ensure_ascii=False)
+            continue
+
+        content = response["body"]["choices"][0]["message"]["content"]
+        if custom_id.endswith(SUMMARY_SUFFIX):
+            article_id = custom_id[: -len(SUMMARY_SUFFIX)]
+            results.setdefault(article_id, {})["summary"] = parse_summary(content)
+        elif custom_id.endswith(TOPICS_SUFFIX):
+            article_id = custom_id[: -len(TOPICS_SUFFIX)]
+            results.setdefault(article_id, {})["topics"] = parse_topics(content, n=n)
+
+    return results, errors
+
+
+def download_batch_results(batch, client=None, n: int = 3) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+    client = client or _get_client()
+    results: Dict[str, Dict] = {}
+    errors: Dict[str, str] = {}
+
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        text = client.files.content(file_id).text
+        r, e = parse_batch_output(text.splitlines(), n=n)
+        results.update(r)
+        errors.update(e)
+
+    return results, errors
+
+
+def merge_into_store(results: Dict[str, Dict], sources: Dict[str, Dict[str, str]]) -> int:
+    """
+    Saves every article that has both a summary and topics.
+    Articles whose source is already in the store are skipped, so collect can be re-run.
+    """
+    seen = {(r.source_type, r.source_name) for r in load_all_summaries()}
+    saved = 0
+
+    for article_id, res in results.items():
+        if "summary" not in res or "topics" not in res:
+            continue
+        source = sources.get(article_id) or {"source_type": "text", "source_name": article_id}
+        key = (source["source_type"], source["source_name"])
+        if key in seen:
+            continue
+
+        save_summary(
+            source_type=source["source_type"],
+            source_name=source["source_name"],
+            summary=res["summary"],
+            topics=res["topics"],
+        )
+        seen.add(key)
+        saved += 1
+
+    return saved
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+def _write_manifest(path: Path, manifest: Dict) -> None:
+    """Atomic, so an interrupted submit never leaves a half-written manifest."""
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def submit_articles(
+    items: List[BatchItem],
+    manifest_path: Path,
+    n: int = 3,
+    model: str = DEFAULT_MODEL,
+    client=None,
+    max_bytes: int = MAX_BATCH_FILE_BYTES,
+) -> Dict:
+    """
+    Writes and submits the input files. The manifest is rewritten after every
+    submitted batch, so a failure partway through still records the batch ids
+    already created (collect picks them up; resubmit only what is missing).
+    """
+    client = client or _get_client()
+    work_dir = manifest_path.parent
+    manifest = {
+        "model": model,
+        "n": n,
+        "batches": [],
+        "sources": {
+            it.id: {"source_type": "url" if it.url else "text", "source_name": it.url or it.id}
+            for it in items
+        },
+    }
+    _write_manifest(manifest_path, manifest)
+
+    def path_for(idx: int) -> Path:
+        return work_dir / f"{manifest_path.stem}.input-{idx}.jsonl"
+
+    for idx, (path, count) in enumerate(write_batch_files(items, path_for, n=n, model=model, max_bytes=max_bytes)):
+        batch_id = submit_batch_file(path, client=client, description=f"{manifest_path.stem} part {idx}")
+        manifest["batches"].append({"id": batch_id, "input_file": str(path), "requests": count})
+        _write_manifest(manifest_path, manifest)
+        print(f"Submitted {batch_id} ({count} requests, {path.stat().st_size} bytes)")
+    return manifest
+
+
+def _cmd_submit(args: argparse.Namespace) -> None:
+    with open(args.articles, "r", encoding="utf-8") as f:
+        items = [it for it in iter_batch_items(f) if not it.error]
+
+    skipped = [it.id for it in items if not it.text]
+    items = [it for it in items if it.text]
+    if skipped:
+        print(f"Skipping {len(skipped)} items without text (the Batch API cannot fetch URLs)")
+
+    manifest = submit_articles(items, Path(args.manifest), n=args.n, model=args.model)
+
+    if args.wait:
+        _collect(manifest, poll_interval=args.poll_interval)
+
+
+def _cmd_status(args: argparse.Namespace) -> None:
+    manifest = json.loads(Path(args.manifest).read_text(encoding="utf-8"))
+    client = _get_client()
+    for entry in manifest["batches"]:
+        batch = client.batches.retrieve(entry["id"])
+        counts = batch.request_counts
+        print(f"{batch.id}: {batch.status} ({counts.completed}/{counts.total} done, {counts.failed} failed)")
+
+
+def _collect(manifest: Dict, poll_interval: float, wait: bool = True, client=None) -> int:
+    client = client or _get_client()
+    total_saved = 0
+
+    for entry in manifest["batches"]:
+        if wait:
+            batch = wait_for_batch(entry["id"], client=client, poll_interval=poll_interval)
+        else:
+            batch = client.batches.retrieve(entry["id"])
+            if batch.status not in TERMINAL_STATUSES:
+                print(f"{batch.id}: still {batch.status}, skipping")
+                continue
+
+        results, errors = download_batch_results(batch, client=client, n=manifest["n"])
+        saved = merge_into_store(results, manifest["sources"])
+        total_saved += saved
+        print(f"{batch.id}: {batch.status}, {len(results)} articles, {len(errors)} failed requests, {saved} saved")
+
+    print(f"Saved {total_saved} new summaries")
+    return total_saved
+
+
+def _cmd_collect(args: argparse.Namespace) -> None:
+    manifest = json.loads(Path(args.manifest).read_text(encoding="utf-8"))
+    _collect(manifest, poll_interval=args.poll_interval, wait=args.wait)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Summary + topics backfill through the OpenAI Batch API.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_submit = sub.add_parser("submit", help="build and submit batch files")
+    p_submit.add_argument("articles", help="JSONL of {id?, text, url?}")
+    p_submit.add_argument("--manifest", default="batch_manifest.json")
+    p_submit.add_argument("--model", default=DEFAULT_MODEL)
+    p_submit.add_argument("--n", type=int, default=3, help="topics per article")
+    p_submit.add_argument("--wait", action="store_true", help="poll and collect after submitting")
+    p_submit.add_argument("--poll-interval", type=float, default=30.0)
+    p_submit.set_defaults(func=_cmd_submit)
+
+    p_status = sub.add_parser("status", help="show batch progress")
+    p_status.add_argument("--manifest", default="batch_manifest.json")
+    p_status.set_defaults(func=_cmd_status)
+
+    p_collect = sub.add_parser("collect", help="download finished batches and merge into the store")
+    p_collect.add_argument("--manifest", default="batch_manifest.json")
+    p_collect.add_argument("--wait", action="store_true", help="block until every batch finishes")
+    p_collect.add_argument("--poll-interval", type=float, default=30.0)
+    p_collect.set_defaults(func=_cmd_collect)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,281 @@
 # pdf_utils.py
-from typing import BinaryIO
+import io
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
 
-from PyPDF2 import PdfReader
+# Downstream (summarizer) only ever looks at the first 15k characters.
+DEFAULT_MAX_CHARS = 15000
 
+# Below this many pages a process pool costs more than it saves.
+PARALLEL_MIN_PAGES = 64
+PAGES_PER_TASK = 16
 
-def extract_text_from_pdf(file: BinaryIO) -> str:
+BACKENDS = ("pypdfium2", "pypdf2", "pdfminer")
+
+
+def _read_pdf_bytes(file: Union[BinaryIO, bytes]) -> bytes:
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    try:
+        file.seek(0)
+    except Exception:
+        pass
+    return file.read()
+
+
+def _resolve_backend(backend: Optional[str]) -> str:
+    """
+    "auto" (default) prefers pypdfium2 when installed and falls back to PyPDF2.
+    pdfminer.six is only used when asked for explicitly.
+    """
+    if not backend:
+        from settings import get_settings
+
+        backend = get_settings().pdf_backend
+    backend = backend.lower()
+    if backend == "auto":
+        try:
+            import pypdfium2  # noqa: F401
+            return "pypdfium2"
+        except ImportError:
+            return "pypdf2"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend: {backend}")
+    return backend
+
+
+def count_pdf_pages(file: Union[BinaryIO, bytes], backend: Optional[str] = None) -> int:
+    data = _read_pdf_bytes(file)
+    backend = _resolve_backend(backend)
+
+    if backend == "pdfminer":
+        backend = "pypdf2"
+    doc = _open_document(data, backend)
+    try:
+        return len(doc) if backend == "pypdfium2" else len(doc.pages)
+    finally:
+        _close_document(doc, backend)
+
+
+def _open_document(data: bytes, backend: str):
+    if backend == "pypdfium2":
+        import pypdfium2 as pdfium
+
+        return pdfium.PdfDocument(data)
+    if backend == "pdfminer":
+        # pdfminer parses lazily from the stream; there is no reusable handle.
+        return data
+    from PyPDF2 import PdfReader
+
+    return PdfReader(io.BytesIO(data))
+
+
+def _close_document(doc, backend: str) -> None:
+    if backend == "pypdfium2":
+        doc.close()
+
+
+def _iter_page_texts(doc, backend: str, start: int, stop: Optional[int]) -> Iterator[str]:
+    """
+    Yields the text of pages [start, stop) one at a time, so callers can stop early.
+    A page that fails to extract yields "".
+    """
+    if backend == "pypdfium2":
+        stop = len(doc) if stop is None else min(stop, len(doc))
+        for i in range(start, stop):
+            try:
+                page = doc[i]
+                textpage = page.get_textpage()
+                page_text = textpage.get_text_range() or ""
+                textpage.close()
+                page.close()
+            except Exception:
+                page_text = ""
+            yield page_text
+        return
+
+    if backend == "pdfminer":
+        from pdfminer.high_level import extract_pages
+        from pdfminer.layout import LTTextContainer
+
+        if stop is None:
+            stop = count_pdf_pages(doc, backend="pypdf2")
+        for layout in extract_pages(io.BytesIO(doc), page_numbers=range(start, stop)):
+            try:
+                page_text = "".join(
+                    el.get_text() for el in layout if isinstance(el, LTTextContainer)
+                )
+            except Exception:
+                page_text = ""
+            yield page_text
+        return
+
+    stop = len(doc.pages) if stop is None else min(stop, len(doc.pages))
+    for i in range(start, stop):
+        try:
+            page_text = doc.pages[i].extract_text() or ""
+        except Exception:
+            page_text = ""
+        yield page_text
+
+
+# Per-process state for the pool: each worker opens the document once in its
+# initializer instead of once per page range.
+_WORKER_DOC = None
+_WORKER_BACKEND: str = "pypdf2"
+
+
+def _init_worker(data: bytes, backend: str) -> None:
+    global _WORKER_DOC, _WORKER_BACKEND
+    _WORKER_DOC = _open_document(data, backend)
+    _WORKER_BACKEND = backend
+
+
+def _extract_page_range(page_range: Tuple[int, int]) -> List[str]:
+    start, stop = page_range
+    return list(_iter_page_texts(_WORKER_DOC, _WORKER_BACKEND, start, stop))
+
+
+def _iter_page_texts_parallel(data: bytes, backend: str, num_pages: int, workers: int, first: int = 0) -> Iterator[str]:
+    """
+    Same contract as _iter_page_texts for pages [first, num_pages), but page ranges
+    are extracted in a process pool. Results are yielded in page order; pending
+    ranges are cancelled once the caller stops.
+    """
+    ranges = [
+        (start, min(start + PAGES_PER_TASK, num_pages))
+        for start in range(first, num_pages, PAGES_PER_TASK)
+    ]
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(data, backend),
+    )
+    try:
+        futures = [executor.submit(_extract_page_range, r) for r in ranges]
+        for future in futures:
+            for page_text in future.result():
+                yield page_text
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+class PdfFile:
+    """
+    A PDF parsed once: the page count and the serial text extraction share one
+    handle (the parallel path opens the document once per pool worker).
+
+        with PdfFile(upload) as pdf:
+            if pdf.num_pages > limit: ...
+            text = pdf.extract_text(max_chars=..., workers=4)
+
+    Opening raises the backend's own error on a corrupt file; num_pages may too
+    (PyPDF2 reads the page tree lazily).
+    """
+
+    def __init__(self, file: Union[BinaryIO, bytes], backend: Optional[str] = None):
+        self.data = _read_pdf_bytes(file)
+        self.backend = _resolve_backend(backend)
+        self._doc = _open_document(self.data, self.backend)
+        self._num_pages: Optional[int] = None
+
+    @property
+    def num_pages(self) -> int:
+        if self._num_pages is None:
+            if self.backend == "pypdfium2":
+                self._num_pages = len(self._doc)
+            elif self.backend == "pdfminer":
+                self._num_pages = count_pdf_pages(self.data, backend="pypdf2")
+            else:
+                self._num_pages = len(self._doc.pages)
+        return self._num_pages
+
+    def extract_text(
+        self,
+        max_chars: Optional[int] = DEFAULT_MAX_CHARS,
+        max_pages: Optional[int] = None,
+        workers: Optional[int] = None,
+    ) -> str:
+        """See extract_text_from_pdf."""
+        if workers and workers > 1:
+            pages = self._iter_pages_pooled(max_pages, workers)
+        else:
+            pages = _iter_page_texts(self._doc, self.backend, 0, max_pages)
+
+        texts = []
+        total = 0
+        try:
+            for page_text in pages:
+                texts.append(page_text)
+                total += len(page_text) + 1
+                if max_chars is not None and total >= max_chars:
+                    break
+        finally:
+            pages.close()
+
+        text = "\n".join(texts)
+        if max_chars is not None and len(text) > max_chars:
+            text = text[:max_chars]
+        return text
+
+    def _iter_pages_pooled(self, max_pages: Optional[int], workers: int) -> Iterator[str]:
+        """
+        The first PAGES_PER_TASK pages serially, the rest in a process pool when at
+        least PARALLEL_MIN_PAGES are to be read: text-dense documents usually fill
+        max_chars in those first pages and never pay for starting the pool.
+        """
+        num_pages = self.num_pages if max_pages is None else min(self.num_pages, max_pages)
+        head = min(PAGES_PER_TASK, num_pages)
+        yield from _iter_page_texts(self._doc, self.backend, 0, head)
+        if num_pages >= PARALLEL_MIN_PAGES:
+            yield from _iter_page_texts_parallel(self.data, self.backend, num_pages, workers, first=head)
+        else:
+            yield from _iter_page_texts(self._doc, self.backend, head, num_pages)
+
+    def close(self) -> None:
+        if self._doc is not None:
+            _close_document(self._doc, self.backend)
+            self._doc = None
+
+    def __enter__(self) -> "PdfFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def extract_text_from_pdf(
+    file: Union[BinaryIO, bytes],
+    max_chars: Optional[int] = DEFAULT_MAX_CHARS,
+    max_pages: Optional[int] = None,
+    workers: Optional[int] = None,
+    backend: Optional[str] = None,
+) -> str:
     """
     Extracts text from a PDF file-like object.
 
+    Pages are read one at a time and extraction stops as soon as `max_chars`
+    characters have been collected, so long dossiers don't pay for pages the
+    summarizer would never see.
+
     Parameters
     ----------
-    file : BinaryIO
-        A file-like object for the uploaded PDF.
+    file : BinaryIO or bytes
+        A file-like object (or raw bytes) for the uploaded PDF.
+    max_chars : int, optional
+        Character budget. None extracts the whole document.
+    max_pages : int, optional
+        Never read past this many pages.
+    workers : int, optional
+        When > 1 and the document has at least PARALLEL_MIN_PAGES pages,
+        page ranges are extracted in a process pool of this size.
+    backend : str, optional
+        "pypdfium2", "pypdf2", "pdfminer" or "auto" (default, or settings.pdf_backend).
 
     Returns
     -------
     str
         Extracted text.
     """
-    reader = PdfReader(file)
-    texts = []
-    for page in reader.pages:
-        try:
-            page_text = page.extract_text() or ""
-        except Exception:
-            page_text = ""
-        texts.append(page_text)
-
-    return "\n".join(texts)
+    with PdfFile(file, backend) as pdf:
+        return pdf.extract_text(max_chars=max_chars, max_pages=max_pages, workers=workers)
@@ -0,0 +1,372 @@
+# prewarm.py
+"""
+Catalog pre-warming: a separate worker that fetches shopping results for hot
+topics before anyone asks for them, so find_ministore_items() answers from the
+local catalog index instead of calling Serper on the request path.
+
+Topics come from two places: the summary store (topics extracted from every
+summarized article) and the topic request log, which main.py appends to for
+every /create_ministores and /jobs topic. They are grouped by normalized topic
+(topic_index.normalize_topic) and ranked by frequency with exponential recency
+decay (PREWARM_HALF_LIFE_HOURS).
+
+Each run walks the ranking and spends at most its share of
+PREWARM_DAILY_BUDGET Serper calls: topics the catalog already covers, or that
+were fetched within PREWARM_REFRESH_HOURS, cost nothing and are skipped.
+Fetched items go through upsert_ministore_items_into_db, which indexes them.
+
+    python prewarm.py rank            # what would be fetched, no calls
+    python prewarm.py run --budget 20 # one pass
+    python prewarm.py serve           # every PREWARM_INTERVAL_MINUTES
+"""
+import argparse
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from topic_index import normalize_topic
+
+logger = logging.getLogger(__name__)
+
+DAY_SECONDS = 86400
+# What a ministore needs from the catalog before a topic counts as warm
+# (items_per_book in ministore_books) and how many results a fetch asks for.
+WARM_MIN_RESULTS = 4
+FETCH_NUM_RESULTS = 10
+STATS = ("topics", "fetched", "failed", "written", "warm", "recent")
+
+
+@dataclass
+class HotTopic:
+    key: str
+    topic: str  # the most frequent spelling
+    language: str
+    score: float
+    count: int
+    last_seen: float
+    spellings: Counter = field(default_factory=Counter, repr=False)
+
+
+class TopicLog:
+    """Requested topics and pre-warm fetches, in SQLite next to the other data/ files."""
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._local = threading.local()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS topic_requests (
+                topic TEXT NOT NULL,
+                language TEXT NOT NULL,
+                requested_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_requests_at ON topic_requests (requested_at)")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS prewarm_fetches (
+                key TEXT NOT NULL,
+                language TEXT NOT NULL,
+                topic TEXT NOT NULL,
+                items INTEGER NOT NULL,
+                error TEXT,
+                fetched_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_fetches_key ON prewarm_fetches (key, language, fetched_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_fetches_at ON prewarm_fetches (fetched_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, topics: Iterable[str], language: str = "es") -> None:
+        """Appends requested topics; best effort, a failure never reaches the request."""
+        now = time.time()
+        rows = [(t.strip(), language, now) for t in topics if t and t.strip()]
+        if not rows:
+            return
+        try:
+            self._conn().executemany(
+                "INSERT INTO topic_requests (topic, language, requested_at) VALUES (?, ?, ?)", rows
+            )
+        except sqlite3.Error as e:
+            logger.warning("Topic log write failed: %s", e)
+
+    def requests_since(self, since: float) -> List[Tuple[str, str, float]]:
+        return self._conn().execute(
+            "SELECT topic, language, requested_at FROM topic_requests WHERE requested_at >= ?", (since,)
+        ).fetchall()
+
+    def record_fetch(self, key: str, language: str, topic: str, items: int, error: Optional[str] = None) -> None:
+        self._conn().execute(
+            """
+            INSERT INTO prewarm_fetches (key, language, topic, items, error, fetched_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (key, language, topic, items, error, time.time()),
+        )
+
+    def last_fetches(self, since: float) -> Dict[Tuple[str, str], float]:
+        """(key, language) -> last fetch time, for fetches since `since`."""
+        rows = self._conn().execute(
+            "SELECT key, language, MAX(fetched_at) FROM prewarm_fetches WHERE fetched_at >= ? GROUP BY key, language",
+            (since,),
+        )
+        return {(key, language): at for key, language, at in rows}
+
+    def calls_since(self, since: float) -> int:
+        row = self._conn().execute("SELECT COUNT(*) FROM prewarm_fetches WHERE fetched_at >= ?", (since,)).fetchone()
+        return row[0]
+
+    def purge(self, before: float) -> int:
+        conn = self._conn()
+        removed = conn.execute("DELETE FROM topic_requests WHERE requested_at < ?", (before,)).rowcount
+        removed += conn.execute("DELETE FROM prewarm_fetches WHERE fetched_at < ?", (before,)).rowcount
+        return removed
+
+
+@lru_cache(maxsize=1)
+def topic_log_from_settings() -> Optional[TopicLog]:
+    """The log at PREWARM_DB, or None when PREWARM_DAILY_BUDGET is 0 (pre-warming disabled)."""
+    from settings import get_settings
+
+    settings = get_settings()
+    if settings.prewarm_daily_budget <= 0:
+        return None
+    return TopicLog(settings.prewarm_db)
+
+
+# ----------------------------
+# Ranking
+# ----------------------------
+def _summary_timestamp(created_at: str) -> float:
+    # storage writes naive UTC ISO timestamps
+    parsed = datetime.fromisoformat(created_at)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def summary_topics(since: float) -> List[Tuple[str, str, float]]:
+    """(topic, language, timestamp) for topics of summaries saved since `since`."""
+    from storage import load_all_summaries
+
+    occurrences = []
+    for record in load_all_summaries():
+        if not record.topics:
+            continue
+        try:
+            ts = _summary_timestamp(record.created_at)
+        except ValueError:
+            continue
+        if ts >= since:
+            occurrences.extend((topic, record.language or "es", ts) for topic in record.topics)
+    return occurrences
+
+
+def rank_topics(occurrences: Iterable[Tuple[str, str, float]], now: float, half_life: float) -> List[HotTopic]:
+    """
+    Groups occurrences by (normalized topic, language); each one weighs
+    0.5 ** (age / half_life), so a topic seen 10 times last week can rank
+    below one seen 4 times today.
+    """
+    ranked: Dict[Tuple[str, str], HotTopic] = {}
+    for topic, language, ts in occurrences:
+        key = normalize_topic(topic)
+        if not key:
+            continue
+        hot = ranked.get((key, language))
+        if hot is None:
+            hot = ranked[(key, language)] = HotTopic(key, topic, language, 0.0, 0, ts)
+        hot.score += 0.5 ** (max(0.0, now - ts) / half_life)
+        hot.count += 1
+        hot.last_seen = max(hot.last_seen, ts)
+        hot.spellings[topic.strip()] += 1
+
+    for hot in ranked.values():
+        hot.topic = hot.spellings.most_common(1)[0][0]
+    return sorted(ranked.values(), key=lambda h: (-h.score, -h.last_seen))
+
+
+def hot_topics(log: TopicLog, now: Optional[float] = None) -> List[HotTopic]:
+    from settings import get_settings
+
+    settings = get_settings()
+    now = now or time.time()
+    since = now - settings.prewarm_window_hours * 3600
+    occurrences = summary_topics(since) + log.requests_since(since)
+    return rank_topics(occurrences, now, settings.prewarm_half_life_hours * 3600)
+
+
+# ----------------------------
+# Fetching
+# ----------------------------
+def run_budget(log: TopicLog, now: Optional[float] = None) -> int:
+    """This run's share of the daily Serper budget, capped by what is left of it."""
+    from settings import get_settings
+
+    settings = get_settings()
+    now = now or time.time()
+    per_run = math.ceil(settings.prewarm_daily_budget * settings.prewarm_interval_minutes / 1440)
+    left = settings.prewarm_daily_budget - log.calls_since(now - DAY_SECONDS)
+    return max(0, min(per_run, left))
+
+
+def is_warm(index, topic: str, language: str) -> bool:
+    """True when the catalog index alone would fill a ministore for the topic."""
+    from settings import get_settings
+
+    if index is None:
+        return False
+    min_score = get_settings().catalog_min_score
+    hits = index.search(topic, language=language, limit=FETCH_NUM_RESULTS)
+    return sum(1 for h in hits if h.score >= min_score) >= WARM_MIN_RESULTS
+
+
+def prewarm(db, log: TopicLog, budget: int, dry_run: bool = False) -> Dict[str, int]:
+    """
+    One pass over the ranking, hottest first, until `budget` Serper calls are
+    spent. With dry_run, prints what would be fetched and calls nothing.
+    """
+    from catalog_index import get_index
+    from ministore_engine import fetch_ministore_items_from_serper, upsert_ministore_items_into_db
+    from settings import get_settings
+
+    settings = get_settings()
+    now = time.time()
+    index = get_index()
+    recent = log.last_fetches(now - settings.prewarm_refresh_hours * 3600)
+    stats = dict.fromkeys(STATS, 0)
+
+    for hot in hot_topics(log, now):
+        if stats["fetched"] + stats["failed"] >= budget:
+            break
+        stats["topics"] += 1
+        if (hot.key, hot.language) in recent:
+            stats["recent"] += 1
+            continue
+        if is_warm(index, hot.topic, hot.language):
+            stats["warm"] += 1
+            continue
+        if dry_run:
+            print(f"{hot.score:8.2f}  x{hot.count:<4d} {hot.language}  {hot.topic}")
+            stats["fetched"] += 1
+            continue
+
+        try:
+            items_df = fetch_ministore_items_from_serper(
+                query=hot.topic, num_results=FETCH_NUM_RESULTS, language=hot.language
+            )
+            written = upsert_ministore_items_into_db(db, items_df)
+        except Exception as e:
+            # one bad topic (a Serper or DB hiccup, an unexpected payload) mustn't end the pass
+            logger.exception("Pre-warm of %r failed", hot.topic)
+            log.record_fetch(hot.key, hot.language, hot.topic, 0, error=str(e))
+            stats["failed"] += 1
+            continue
+        log.record_fetch(hot.key, hot.language, hot.topic, len(items_df))
+        stats["fetched"] += 1
+        stats["written"] += written
+    return stats
+
+
+def run_once(budget: Optional[int] = None, dry_run: bool = False) -> Dict[str, int]:
+    from settings import get_settings
+
+    log = topic_log_from_settings()
+    if log is None:
+        raise RuntimeError("Pre-warming is disabled (PREWARM_DAILY_BUDGET=0).")
+    budget = run_budget(log) if budget is None else budget
+    if budget <= 0 and not dry_run:
+        return dict.fromkeys(STATS, 0)
+
+    if dry_run:
+        return prewarm(None, log, budget, dry_run=True)
+
+    from ministore_creator import ensure_tables, get_db
+
+    db = get_db()
+    try:
+        ensure_tables(db)
+        stats = prewarm(db, log, budget)
+    finally:
+        db.disconnect()
+
+    settings = get_settings()
+    keep = max(settings.prewarm_window_hours * 3600, settings.prewarm_refresh_hours * 3600, DAY_SECONDS)
+    log.purge(time.time() - keep)
+    return stats
+
+
+# ----------------------------
+# CLI
+# ----------------------------
+def _cmd_rank(args: argparse.Namespace) -> None:
+    log = topic_log_from_settings()
+    if log is None:
+        raise SystemExit("Pre-warming is disabled (PREWARM_DAILY_BUDGET=0).")
+    for hot in hot_topics(log)[: args.limit]:
+        print(f"{hot.score:8.2f}  x{hot.count:<4d} {hot.language}  {hot.topic}")
+
+
+def _cmd_run(args: argparse.Namespace) -> None:
+    stats = run_once(budget=args.budget, dry_run=args.dry_run)
+    print(" ".join(f"{k}={v}" for k, v in stats.items()))
+
+
+def _cmd_serve(args: argparse.Namespace) -> None:
+    from settings import get_settings
+
+    interval = get_settings().prewarm_interval_minutes * 60
+    while True:
+        started = time.monotonic()
+        try:
+            stats = run_once()
+            logger.info("Pre-warm pass: %s", stats)
+        except Exception:
+            logger.exception("Pre-warm pass failed")
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    parser = argparse.ArgumentParser(description="Pre-fetch shopping results for hot topics into the catalog.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_rank = sub.add_parser("rank", help="show the current topic ranking")
+    p_rank.add_argument("--limit", type=int, default=30)
+    p_rank.set_defaults(func=_cmd_rank)
+
+    p_run = sub.add_parser("run", help="one pre-warm pass")
+    p_run.add_argument("--budget", type=int, default=None, help="Serper calls (default: this run's share)")
+    p_run.add_argument("--dry-run", action="store_true", help="list the topics that would be fetched")
+    p_run.set_defaults(func=_cmd_run)
+
+    p_serve = sub.add_parser("serve", help="run a pass every PREWARM_INTERVAL_MINUTES")
+    p_serve.set_defaults(func=_cmd_serve)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# prompts.py
+"""
+Versioned prompt registry for the article prompts (summary, topics, chunk
+summaries), shared by the synchronous calls and the Batch API mode.
+
+Every prompt uses the same layout so OpenAI's automatic prompt caching, which
+matches exact prefixes of 1024+ tokens, can reuse work across calls:
+
+    [system]  SHARED_SYSTEM              identical for every call of a version
+    [user]    "ARTÍCULO:\\n<article>"     identical for the summary and topics calls
+    [user]    task instruction           the only part that differs (n goes here)
+
+The topics call for an article therefore reads the summary call's prefix,
+article included, from cache. Any change to the texts below must bump
+PROMPT_VERSION so metrics and cached batch results can be told apart.
+"""
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, List
+
+PROMPT_VERSION = "v2"
+
+SHARED_SYSTEM = (
+    "Eres un asistente editorial que trabaja con artículos periodísticos en español. "
+    "Recibirás un texto y, al final, la tarea que debes realizar con él. Las tareas posibles son:\n\n"
+    "RESUMEN\n"
+    "- Resume el artículo de forma clara y neutral, como un periodista.\n"
+    "- Devuelve SOLO el resumen en español, en 2-3 frases, sin títulos, sin viñetas.\n\n"
+    "TEMAS COMERCIALES\n"
+    "- Actúa como experto en marketing digital especializado en identificar oportunidades "
+    "comerciales y publicitarias en artículos periodísticos.\n"
+    "- Devuelve EXACTAMENTE el número de búsquedas comerciales que se pida, una por línea.\n"
+    "- Sin numeración, sin viñetas, sin explicaciones.\n"
+    "- Cada búsqueda debe tener MÁXIMO 6 palabras.\n"
+    "- Deben ser específicas y con intención comercial.\n\n"
+    "RESUMEN PARCIAL\n"
+    "- El texto es una parte de un documento largo.\n"
+    "- Resume SOLO esa parte en español, en 3-5 frases, conservando cifras, nombres y hechos clave."
+)
+
+
+@dataclass(frozen=True)
+class Prompt:
+    name: str
+    document_label: str
+    instruction: str  # str.format template; parameters only ever appear here
+
+    @property
+    def id(self) -> str:
+        return f"{self.name}@{PROMPT_VERSION}"
+
+    def messages(self, document: str, **params) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": SHARED_SYSTEM},
+            {"role": "user", "content": f"{self.document_label}:\n{document}"},
+            {"role": "user", "content": self.instruction.format(**params)},
+        ]
+
+
+PROMPTS: Dict[str, Prompt] = {
+    "summary": Prompt(
+        name="summary",
+        document_label="ARTÍCULO",
+        instruction="Tarea: RESUMEN.",
+    ),
+    "topics": Prompt(
+        name="topics",
+        document_label="ARTÍCULO",
+        instruction="Tarea: TEMAS COMERCIALES. Devuelve EXACTAMENTE {n} búsquedas comerciales.",
+    ),
+    "chunk": Prompt(
+        name="chunk",
+        document_label="DOCUMENTO",
+        instruction="Tarea: RESUMEN PARCIAL de la parte {index} de {total}.",
+    ),
+}
+
+
+def get_prompt(name: str) -> Prompt:
+    try:
+        return PROMPTS[name]
+    except KeyError:
+        raise ValueError(f"Unknown prompt: {name}")
+
+
+def cache_key(messages: List[Dict[str, str]]) -> str:
+    """
+    prompt_cache_key for OpenAI, derived from the shared prefix (every message but
+    the task instruction): the summary and topics calls for one article are routed
+    to the same cache, so whichever runs second hits the prefix the first wrote.
+    """
+    prefix = "\x00".join(m["content"] for m in messages[:-1])
+    digest = hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:16]
+    return f"{PROMPT_VERSION}:{digest}"
@@ -0,0 +1,248 @@
+# rate_limiter.py
+"""
+Client-side throttling for OpenAI calls.
+
+- TokenBucketLimiter: requests/min + tokens/min buckets stored in SQLite, so every
+  uvicorn worker / batch process on the host draws from the same budget. A 429's
+  retry-after pauses the bucket for everyone, not just the caller that got it.
+- AdaptiveConcurrency: per-process AIMD limit on in-flight calls; grows by ~1 per
+  window of successes and halves on every 429.
+"""
+import math
+import random
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Rough chars-per-token for Spanish news prose with the gpt-4o tokenizer.
+CHARS_PER_TOKEN = 4
+TOKENS_PER_MESSAGE = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return int(math.ceil(len(text or "") / CHARS_PER_TOKEN))
+
+
+def estimate_message_tokens(messages: List[Dict[str, str]], completion_tokens: int = 0) -> int:
+    """
+    What the API will count against TPM: prompt tokens plus the expected completion.
+    """
+    prompt = sum(estimate_tokens(m.get("content", "")) + TOKENS_PER_MESSAGE for m in messages)
+    return prompt + completion_tokens
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """
+    Parses retry-after-ms / retry-after (seconds or HTTP date) from response headers.
+    """
+    if headers is None:
+        return None
+
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000.0
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucketLimiter:
+    def __init__(self, path: str, rpm: float, tpm: float, name: str = "openai"):
+        self.path = str(path)
+        self.rpm = float(rpm)
+        self.tpm = float(tpm)
+        self.name = name
+        self._local = threading.local()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS buckets (
+                name TEXT PRIMARY KEY,
+                req_level REAL NOT NULL,
+                tok_level REAL NOT NULL,
+                updated REAL NOT NULL,
+                blocked_until REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit mode; transactions are opened explicitly with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _update(self, fn):
+        """
+        Runs fn(req_level, tok_level, blocked_until, now) -> (req, tok, blocked, result)
+        inside a write transaction, after refilling both buckets.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute(
+                "SELECT req_level, tok_level, updated, blocked_until FROM buckets WHERE name = ?",
+                (self.name,),
+            ).fetchone()
+            if row is None:
+                req, tok, blocked = self.rpm, self.tpm, 0.0
+            else:
+                req, tok, updated, blocked = row
+                elapsed = max(0.0, now - updated)
+                req = min(self.rpm, req + elapsed * self.rpm / 60.0)
+                tok = min(self.tpm, tok + elapsed * self.tpm / 60.0)
+
+            req, tok, blocked, result = fn(req, tok, blocked, now)
+            conn.execute(
+                """
+                INSERT INTO buckets (name, req_level, tok_level, updated, blocked_until)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    req_level = excluded.req_level,
+                    tok_level = excluded.tok_level,
+                    updated = excluded.updated,
+                    blocked_until = excluded.blocked_until
+                """,
+                (self.name, req, tok, now, blocked),
+            )
+            conn.execute("COMMIT")
+            return result
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def try_acquire(self, tokens: int) -> float:
+        """
+        Takes one request and `tokens` tokens if available.
+        Returns 0.0 on success, otherwise the seconds to wait before retrying.
+        """
+        # a single call larger than the whole bucket would otherwise never fit
+        tokens = min(float(tokens), self.tpm)
+
+        def take(req, tok, blocked, now):
+            if now < blocked:
+                return req, tok, blocked, blocked - now
+            if req >= 1.0 and tok >= tokens:
+                return req - 1.0, tok - tokens, blocked, 0.0
+            wait = max(
+                (1.0 - req) * 60.0 / self.rpm if req < 1.0 else 0.0,
+                (tokens - tok) * 60.0 / self.tpm if tok < tokens else 0.0,
+            )
+            return req, tok, blocked, wait
+
+        return self._update(take)
+
+    def acquire(self, tokens: int, timeout: Optional[float] = None) -> None:
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise TimeoutError("Rate limiter budget not available before timeout")
+            # jitter so waiting workers don't stampede the bucket together
+            time.sleep(min(wait, 5.0) * (1.0 + random.random() * 0.1))
+
+    def pause(self, seconds: float) -> None:
+        """
+        Blocks every caller sharing this bucket for `seconds` (e.g. from retry-after).
+        """
+
+        def block(req, tok, blocked, now):
+            return req, tok, max(blocked, now + seconds), None
+
+        self._update(block)
+
+    def adjust_tokens(self, delta: int) -> None:
+        """
+        Corrects the token bucket once real usage is known (delta = actual - estimated).
+        """
+        if not delta:
+            return
+
+        def fix(req, tok, blocked, now):
+            return req, min(self.tpm, tok - delta), blocked, None
+
+        self._update(fix)
+
+
+class AdaptiveConcurrency:
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 32, backoff: float = 0.5):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+    def on_success(self) -> None:
+        with self._cond:
+            # additive increase: roughly +1 after `limit` consecutive successes
+            self.limit = min(self.max_limit, self.limit + 1.0 / max(self.limit, 1.0))
+            self._cond.notify_all()
+
+    def on_throttle(self) -> None:
+        with self._cond:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+
+
+def limiter_from_settings() -> Optional[TokenBucketLimiter]:
+    """
+    OPENAI_RPM / OPENAI_TPM set the shared budget (0 disables the limiter).
+    OPENAI_RATE_LIMIT_DB is the SQLite file shared by the workers on this host.
+    """
+    from settings import get_settings
+
+    settings = get_settings()
+    if settings.openai_rpm <= 0 or settings.openai_tpm <= 0:
+        return None
+    return TokenBucketLimiter(path=settings.openai_rate_limit_db, rpm=settings.openai_rpm, tpm=settings.openai_tpm)
+
+
+def concurrency_from_settings() -> AdaptiveConcurrency:
+    from settings import get_settings
+
+    settings = get_settings()
+    return AdaptiveConcurrency(
+        initial=settings.openai_initial_concurrency,
+        max_limit=settings.openai_max_concurrency,
+    )
@@ -0,0 +1,189 @@
+# settings.py
+"""
+Process-wide configuration, read once.
+
+get_settings() parses .env (and the legacy SerperKey.env) the first time it is
+called and caches the result; modules call it instead of running load_dotenv()
+on import. Values already present in the environment win over the files.
+"""
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+
+
+def _int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _hosts(name: str, default_port: int) -> Tuple[Tuple[str, int], ...]:
+    """Comma-separated host[:port] list."""
+    hosts = []
+    for item in (os.getenv(name) or "").split(","):
+        host, _, port = item.strip().partition(":")
+        if host:
+            hosts.append((host, int(port) if port else default_port))
+    return tuple(hosts)
+
+
+def _float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+@dataclass(frozen=True)
+class Settings:
+    openai_api_key: Optional[str]
+    deanna2u_api_key: Optional[str]
+    deanna2u_api_url: str
+    serper_api_key: Optional[str]
+    serper_url: str
+
+    db_host: Optional[str]
+    db_port: int
+    db_username: Optional[str]
+    db_password: Optional[str]
+    db_database: Optional[str]
+    # Connections kept by the async pool (AsyncMySQLConnector), per event loop.
+    db_pool_size: int
+    # Read replicas for MySQLConnector reads (empty: everything on DB_HOST). A
+    # replica more than DB_REPLICA_MAX_LAG_SECONDS behind is skipped.
+    db_replica_hosts: Tuple[Tuple[str, int], ...]
+    db_replica_max_lag_seconds: int
+    # execute_query(..., prepared=True) uses server-side prepared statements
+    # (DB_PREPARED_STATEMENTS=0 runs those queries as plain text instead).
+    db_prepared_statements: bool
+
+    # Shared OpenAI budget (rate_limiter.TokenBucketLimiter; OPENAI_RPM or
+    # OPENAI_TPM = 0 disables it), kept in a SQLite file every worker on the host
+    # uses, and the per-process AIMD concurrency bounds.
+    openai_rpm: float
+    openai_tpm: float
+    openai_rate_limit_db: str
+    openai_initial_concurrency: int
+    openai_max_concurrency: int
+
+    # Per-stage concurrency of batch_pipeline (/summarize_batch and the CLI).
+    batch_fetch_concurrency: int
+    batch_extract_concurrency: int
+    batch_llm_concurrency: int
+    batch_in_flight: int
+
+    max_pdf_bytes: int
+    max_pdf_pages: int
+    # "auto", "pypdfium2", "pypdf2" or "pdfminer" (pdf_utils).
+    pdf_backend: str
+    # Process pool size for extracting uploads of at least
+    # pdf_utils.PARALLEL_MIN_PAGES pages (0 or 1 keeps extraction serial).
+    pdf_workers: int
+    # Fetched pages larger than this are refused (PDF links use max_pdf_bytes).
+    max_html_bytes: int
+    max_batch_bytes: int
+    singleflight_lock_dir: Optional[str]
+    jobs_db: str
+    job_workers: int
+    jobs_webhook_secret: Optional[str]
+    # A finished URL job is reused for this long; after that the same URL is
+    # fetched and summarized again (the page may have been edited).
+    jobs_url_dedup_minutes: int
+
+    # Reuse the summary/topics of a previously summarized article at or above this
+    # estimated similarity (0 disables the near-duplicate index).
+    near_duplicate_db: str
+    near_duplicate_threshold: float
+    near_duplicate_max_age_days: int
+
+    # Topics turned into a Deanna2u book within the last N hours reuse that book
+    # (0 disables); above the threshold, embedding similarity also counts as a match.
+    topic_index_db: str
+    topic_index_max_age_hours: int
+    topic_index_embedding_threshold: float
+
+    # Ministores are filled from the local catalog index (catalog_index.py) when
+    # enough items score at least this (0..1; 0 disables the index).
+    catalog_index_db: str
+    catalog_min_score: float
+
+    # prewarm.py worker: Serper calls per rolling day (0 disables it and the topic
+    # request log), spread over runs every PREWARM_INTERVAL_MINUTES. Topics seen in
+    # the last PREWARM_WINDOW_HOURS are ranked with a PREWARM_HALF_LIFE_HOURS decay;
+    # a topic is fetched again after PREWARM_REFRESH_HOURS.
+    prewarm_db: str
+    prewarm_daily_budget: int
+    prewarm_interval_minutes: int
+    prewarm_window_hours: int
+    prewarm_half_life_hours: float
+    prewarm_refresh_hours: int
+
+    # Responses of at least this many bytes are gzip/brotli-compressed for clients
+    # that accept it (0 disables compression).
+    compression_min_bytes: int
+
+    metrics_otel: bool
+
+    # Import openai/bs4 in a background thread right after startup, so the first
+    # request doesn't pay for them (WARMUP=0 disables).
+    warmup: bool
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    load_dotenv("SerperKey.env")
+
+    return Settings(
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        deanna2u_api_key=os.getenv("DEANNA2U_API_KEY"),
+        deanna2u_api_url=os.getenv("DEANNA2U_API_URL", "https://www.deanna2u.com/api/create_new_book"),
+        serper_api_key=os.getenv("Serper.dev_Key"),
+        serper_url=os.getenv("SERPER_URL", "https://google.serper.dev/search"),
+        db_host=os.getenv("DB_HOST"),
+        db_port=_int("DB_PORT", 3306),
+        db_username=os.getenv("DB_USERNAME"),
+        db_password=os.getenv("DB_PASSWORD"),
+        db_database=os.getenv("DB_DATABASE"),
+        db_pool_size=_int("DB_POOL_SIZE", 5),
+        db_replica_hosts=_hosts("DB_REPLICA_HOSTS", _int("DB_PORT", 3306)),
+        db_replica_max_lag_seconds=_int("DB_REPLICA_MAX_LAG_SECONDS", 5),
+        db_prepared_statements=os.getenv("DB_PREPARED_STATEMENTS", "1") != "0",
+        openai_rpm=_float("OPENAI_RPM", 500.0),
+        openai_tpm=_float("OPENAI_TPM", 200000.0),
+        openai_rate_limit_db=os.getenv("OPENAI_RATE_LIMIT_DB", "data/openai_ratelimit.sqlite"),
+        openai_initial_concurrency=_int("OPENAI_INITIAL_CONCURRENCY", 4),
+        openai_max_concurrency=_int("OPENAI_MAX_CONCURRENCY", 32),
+        batch_fetch_concurrency=_int("BATCH_FETCH_CONCURRENCY", 8),
+        batch_extract_concurrency=_int("BATCH_EXTRACT_CONCURRENCY", 4),
+        batch_llm_concurrency=_int("BATCH_LLM_CONCURRENCY", 4),
+        batch_in_flight=_int("BATCH_IN_FLIGHT", 32),
+        max_pdf_bytes=_int("MAX_PDF_BYTES", 20 * 1024 * 1024),
+        max_pdf_pages=_int("MAX_PDF_PAGES", 300),
+        pdf_backend=(os.getenv("PDF_BACKEND") or "auto").lower(),
+        pdf_workers=_int("PDF_WORKERS", min(4, os.cpu_count() or 1)),
+        max_html_bytes=_int("MAX_HTML_BYTES", 5 * 1024 * 1024),
+        max_batch_bytes=_int("MAX_BATCH_BYTES", 200 * 1024 * 1024),
+        singleflight_lock_dir=os.getenv("SINGLEFLIGHT_LOCK_DIR") or None,
+        jobs_db=os.getenv("JOBS_DB", "data/jobs.sqlite"),
+        job_workers=_int("JOB_WORKERS", 2),
+        jobs_webhook_secret=os.getenv("JOBS_WEBHOOK_SECRET"),
+        jobs_url_dedup_minutes=_int("JOBS_URL_DEDUP_MINUTES", 10),
+        near_duplicate_db=os.getenv("NEAR_DUPLICATE_DB", "data/near_duplicates.sqlite"),
+        near_duplicate_threshold=_float("NEAR_DUPLICATE_THRESHOLD", 0.75),
+        near_duplicate_max_age_days=_int("NEAR_DUPLICATE_MAX_AGE_DAYS", 30),
+        topic_index_db=os.getenv("TOPIC_INDEX_DB", "data/topic_index.sqlite"),
+        topic_index_max_age_hours=_int("TOPIC_INDEX_MAX_AGE_HOURS", 24),
+        topic_index_embedding_threshold=_float("TOPIC_INDEX_EMBEDDING_THRESHOLD", 0.0),
+        catalog_index_db=os.getenv("CATALOG_INDEX_DB", "data/catalog_index.sqlite"),
+        catalog_min_score=_float("CATALOG_MIN_SCORE", 0.5),
+        prewarm_db=os.getenv("PREWARM_DB", "data/prewarm.sqlite"),
+        prewarm_daily_budget=_int("PREWARM_DAILY_BUDGET", 100),
+        prewarm_interval_minutes=_int("PREWARM_INTERVAL_MINUTES", 60),
+        prewarm_window_hours=_int("PREWARM_WINDOW_HOURS", 72),
+        prewarm_half_life_hours=_float("PREWARM_HALF_LIFE_HOURS", 24.0),
+        prewarm_refresh_hours=_int("PREWARM_REFRESH_HOURS", 24),
+        compression_min_bytes=_int("COMPRESSION_MIN_BYTES", 1024),
+        metrics_otel=os.getenv("METRICS_OTEL", "0") == "1",
+        warmup=os.getenv("WARMUP", "1") != "0",
+    )
@@ -0,0 +1,129 @@
+# singleflight.py
+"""
+Request coalescing for identical in-flight work.
+
+Within a worker, concurrent callers with the same key await one shared future.
+With a lock_dir, workers on the same host also coordinate: the first one holds
+an flock on <key>.lock and leaves its result in <key>.json for `result_ttl`
+seconds, so a worker that was waiting on the lock reuses it instead of calling
+upstream again.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from metrics import record_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: per-worker coalescing only
+    fcntl = None
+
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "ocid")
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form for dedup: lowercase scheme/host, no fragment, no tracking
+    parameters, sorted query, no trailing slash.
+    """
+    url = url.strip()
+    if not url.lower().startswith(("http://", "https://")):
+        url = "https://" + url
+
+    parts = urlsplit(url)
+    query = [
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(TRACKING_PARAMS)
+    ]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(sorted(query)), ""))
+
+
+def url_key(url: str) -> str:
+    return "url:" + hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+
+def text_key(text: str) -> str:
+    normalized = " ".join((text or "").split())
+    return "text:" + hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    def __init__(self, lock_dir: Optional[str] = None, result_ttl: float = 30.0):
+        self.lock_dir = Path(lock_dir) if lock_dir and fcntl else None
+        self.result_ttl = result_ttl
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.followers = 0
+        if self.lock_dir:
+            self.lock_dir.mkdir(parents=True, exist_ok=True)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Dict]]) -> Dict:
+        """
+        Runs fn() once per key at a time; concurrent callers get the same result
+        (or exception). fn must return a JSON-serializable dict when lock_dir is set.
+
+        fn() runs in its own task that every caller, the first one included, awaits
+        through a shield: a caller whose client disconnects is cancelled alone, and
+        the others still get fn's result or its own exception.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self.followers += 1
+            record_cache("singleflight", True)
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(self._do_locked(key, fn) if self.lock_dir else fn())
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._forget(key, t))
+        self.leaders += 1
+        record_cache("singleflight", False)
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every caller has gone away
+
+    def _paths(self, key: str):
+        name = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return self.lock_dir / f"{name}.lock", self.lock_dir / f"{name}.json"
+
+    def _read_fresh(self, path: Path) -> Optional[Dict]:
+        try:
+            if time.time() - path.stat().st_mtime > self.result_ttl:
+                return None
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    async def _do_locked(self, key: str, fn: Callable[[], Awaitable[Dict]]) -> Dict:
+        lock_path, result_path = self._paths(key)
+        fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            # flock blocks, so wait for it off the event loop
+            await asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_EX)
+
+            cached = self._read_fresh(result_path)
+            if cached is not None:
+                self.followers += 1
+                return cached
+
+            result = await fn()
+            tmp = result_path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(result, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, result_path)
+            return result
+        finally:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
@@ -1,6 +1,6 @@
 # storage.py
 import json
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from datetime import datetime
 from pathlib import Path
 from typing import List, Optional
@@ -13,11 +13,12 @@ SUMMARIES_FILE = DATA_DIR / "summaries.jsonl"
 @dataclass
 class SummaryRecord:
     id: str
-    source_type: str  # "pdf" or "url"
+    source_type: str  # "pdf", "url" or "text"
     source_name: str  # filename or URL
     language: str
     created_at: str
     summary: str
+    topics: List[str] = field(default_factory=list)
 
 
 def save_summary(
@@ -25,6 +26,7 @@ def save_summary(
     source_name: str,
     summary: str,
     language: str = "es",
+    topics: Optional[List[str]] = None,
 ) -> SummaryRecord:
     """
     Save a summary to a JSONL file and return the record.
@@ -32,13 +34,15 @@ def save_summary(
     Parameters
     ----------
     source_type : str
-        "pdf" or "url"
+        "pdf", "url" or "text"
     source_name : str
         Filename or URL
     summary : str
         The summary text
     language : str
         Language code, default "es" for Spanish.
+    topics : list of str, optional
+        Commercial topics extracted alongside the summary.
     """
     now = datetime.utcnow().isoformat()
     record_id = f"{source_type}-{now}"
@@ -50,6 +54,7 @@ def save_summary(
         language=language,
         created_at=now,
         summary=summary,
+        topics=list(topics or []),
     )
 
     with SUMMARIES_FILE.open("a", encoding="utf-8") as f:
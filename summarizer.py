@@ -1,85 +1,93 @@
 # summarizer.py
-import os
 import re
-from typing import List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Sequence
 
-from dotenv import load_dotenv
-from openai import OpenAI
+from metrics import record_openai_usage, stage
+from prompts import cache_key, get_prompt
+from rate_limiter import (
+    CHARS_PER_TOKEN,
+    concurrency_from_settings,
+    estimate_message_tokens,
+    limiter_from_settings,
+    retry_after_seconds,
+)
+from settings import get_settings
+from text_prep import count_tokens, prepare_article, split_into_chunks, strip_boilerplate
 
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Created by get_client() on first use, so importing this module doesn't load the
+# OpenAI SDK. Benchmarks may assign a client here directly.
+client = None
+_client_lock = threading.Lock()
 
+# Likewise built by get_limiter() / get_concurrency(), so the import doesn't open
+# the shared SQLite bucket. Benchmarks may assign these too (limiter = None
+# disables the shared budget).
+_UNSET = object()
+limiter = _UNSET
+concurrency = None
+_limits_lock = threading.Lock()
 
-def summarize_article_overall(article_text: str, model: str = "gpt-4o-mini") -> str:
+DEFAULT_MODEL = "gpt-4o-mini"
+EMBEDDING_MODEL = "text-embedding-3-small"
+SUMMARY_TEMPERATURE = 0.2
+TOPICS_TEMPERATURE = 0.4
+
+# Expected completion sizes, counted against the tokens/min budget up front.
+SUMMARY_COMPLETION_TOKENS = 250
+TOPICS_COMPLETION_TOKENS = 80
+MAX_ATTEMPTS = 5
+
+# Article tokens sent in a single call (about the old 15k-char cut, minus boilerplate).
+ARTICLE_MAX_TOKENS = 3500
+
+# Longer documents are condensed first: chunks are summarized concurrently and the
+# partial summaries stand in for the article (see condense_article).
+CHUNK_TOKENS = 3000
+MAX_CHUNKS = 8
+CHUNK_COMPLETION_TOKENS = 200
+CHUNK_CONCURRENCY = 4
+# Upper bound on the text worth extracting for condense_article (PDFs).
+LONG_DOCUMENT_MAX_CHARS = CHUNK_TOKENS * MAX_CHUNKS * CHARS_PER_TOKEN
+
+
+def _trim_article(article_text: str) -> str:
     if not article_text or not article_text.strip():
         raise ValueError("El texto del artículo está vacío.")
 
-    trimmed = article_text.strip()
-    if len(trimmed) > 15000:
-        trimmed = trimmed[:15000]
-
-    messages = [
-        {
-            "role": "system",
-            "content": (
-                "Eres un periodista. Resume el artículo de forma clara y neutral.\n"
-                "Devuelve SOLO el resumen en español, en 2-3 frases, sin títulos, sin viñetas."
-            ),
-        },
-        {"role": "user", "content": f"ARTÍCULO:\n{trimmed}"},
-    ]
-
-    r = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=0.2,
-    )
+    trimmed = prepare_article(article_text, ARTICLE_MAX_TOKENS)
+    if not trimmed:
+        raise ValueError("El texto del artículo está vacío.")
+    return trimmed
 
-    summary = (r.choices[0].message.content or "").strip()
+
+# ----------------------------
+# Prompt builders / parsers
+# (shared by the synchronous calls below and the Batch API mode in openai_batch.py)
+# ----------------------------
+def build_summary_messages(article_text: str) -> List[Dict[str, str]]:
+    return get_prompt("summary").messages(_trim_article(article_text))
+
+
+def parse_summary(raw: str) -> str:
+    summary = (raw or "").strip()
     if len(summary) > 650:
         summary = summary[:650].rstrip() + "…"
     return summary
 
 
-def summarize_spanish_article_multi(article_text: str, n: int = 3, model: str = "gpt-4o-mini") -> List[str]:
-    if not article_text or not article_text.strip():
-        raise ValueError("El texto del artículo está vacío.")
+def build_chunk_messages(chunk: str, index: int, total: int) -> List[Dict[str, str]]:
+    return get_prompt("chunk").messages(chunk, index=index, total=total)
 
-    trimmed = article_text.strip()
-    if len(trimmed) > 15000:
-        trimmed = trimmed[:15000]
-
-    messages = [
-        {
-            "role": "system",
-            "content": (
-                "Eres un experto en marketing digital especializado en identificar oportunidades "
-                "comerciales y publicitarias en artículos periodísticos.\n\n"
-                f"Tu objetivo es extraer {n} temas comerciales del artículo.\n\n"
-                "FORMATO DE RESPUESTA:\n"
-                f"- Devuelve EXACTAMENTE {n} búsquedas comerciales, una por línea.\n"
-                "- Sin numeración, sin viñetas, sin explicaciones.\n"
-                "- Cada búsqueda debe tener MÁXIMO 6 palabras.\n"
-                "- Deben ser específicas y con intención comercial.\n"
-            ),
-        },
-        {
-            "role": "user",
-            "content": (
-                f"Analiza el siguiente artículo e identifica EXACTAMENTE {n} búsquedas comerciales.\n\n"
-                "ARTÍCULO:\n"
-                f"{trimmed}"
-            ),
-        },
-    ]
-
-    r = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=0.4,
-    )
 
-    raw = (r.choices[0].message.content or "").strip()
+def build_topics_messages(article_text: str, n: int = 3) -> List[Dict[str, str]]:
+    return get_prompt("topics").messages(_trim_article(article_text), n=n)
+
+
+def parse_topics(raw: str, n: int = 3) -> List[str]:
+    raw = (raw or "").strip()
     lines = [ln.strip() for ln in raw.split("\n") if ln.strip()]
 
     # Remove numbering if model adds it
@@ -101,3 +109,263 @@ def summarize_spanish_article_multi(article_text: str, n: int = 3, model: str =
         cleaned = cleaned[:n]
 
     return cleaned
+
+
+# ----------------------------
+# Synchronous calls
+# ----------------------------
+def get_client():
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from openai import OpenAI
+
+                # Retries are handled in _create_chat_completion so 429s feed the shared
+                # limiter instead of being retried blindly inside the SDK.
+                client = OpenAI(api_key=get_settings().openai_api_key, max_retries=0)
+    return client
+
+
+def get_limiter():
+    global limiter
+    if limiter is _UNSET:
+        with _limits_lock:
+            if limiter is _UNSET:
+                limiter = limiter_from_settings()
+    return limiter
+
+
+def get_concurrency():
+    global concurrency
+    if concurrency is None:
+        with _limits_lock:
+            if concurrency is None:
+                concurrency = concurrency_from_settings()
+    return concurrency
+
+
+class _StreamSlot:
+    """
+    A streamed completion holding its concurrency slot: the request keeps running
+    upstream until the stream is read, so the slot is released when iteration ends
+    (exhausted, broken off or failed) or on close(), whichever comes first. The
+    usage chunk at the end is recorded and settled with the limiter.
+    """
+
+    def __init__(self, stream, concurrency, limiter, estimated: int, model: str, prompt: str):
+        self._stream = stream
+        self._concurrency = concurrency
+        self._limiter = limiter
+        self._estimated = estimated
+        self._model = model
+        self._prompt = prompt
+        self._released = False
+
+    def __iter__(self):
+        try:
+            for chunk in self._stream:
+                usage = getattr(chunk, "usage", None)
+                if usage:
+                    record_openai_usage(self._model, usage, prompt=self._prompt)
+                    if self._limiter:
+                        self._limiter.adjust_tokens(usage.total_tokens - self._estimated)
+                yield chunk
+        finally:
+            self._release()
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._release()
+
+    def _release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._concurrency.release()
+
+
+def _create_chat_completion(
+    messages: List[Dict[str, str]],
+    model: str,
+    temperature: float,
+    completion_tokens: int,
+    stream: bool = False,
+    prompt: str = "",
+):
+    """
+    chat.completions.create behind the shared token bucket and the AIMD concurrency limit.
+    A 429 halves local concurrency and pauses the shared bucket for retry-after seconds.
+    `prompt` is the registry id (e.g. "summary@v2") that token usage is recorded under.
+    With stream=True the concurrency slot is held by the returned _StreamSlot until
+    the stream is read to the end or closed.
+    """
+    from openai import APIConnectionError, InternalServerError, RateLimitError
+
+    limiter = get_limiter()
+    concurrency = get_concurrency()
+    estimated = estimate_message_tokens(messages, completion_tokens)
+    delay = 1.0
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        if limiter:
+            limiter.acquire(estimated)
+
+        concurrency.acquire()
+        handed_off = False
+        try:
+            kwargs = {"stream_options": {"include_usage": True}} if stream else {}
+            r = get_client().chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                stream=stream,
+                prompt_cache_key=cache_key(messages),
+                **kwargs,
+            )
+            if stream:
+                r = _StreamSlot(r, concurrency, limiter, estimated, model, prompt)
+                handed_off = True
+        except RateLimitError as e:
+            concurrency.on_throttle()
+            if attempt == MAX_ATTEMPTS:
+                raise
+            wait = retry_after_seconds(e.response.headers) or delay
+            if limiter:
+                limiter.pause(wait)
+            else:
+                time.sleep(wait)
+            delay = min(delay * 2, 60.0)
+            continue
+        except (APIConnectionError, InternalServerError):
+            if attempt == MAX_ATTEMPTS:
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, 60.0)
+            continue
+        finally:
+            if not handed_off:
+                concurrency.release()
+
+        concurrency.on_success()
+        if stream:
+            return r
+        usage = getattr(r, "usage", None)
+        record_openai_usage(model, usage, prompt=prompt)
+        if limiter and usage:
+            limiter.adjust_tokens(usage.total_tokens - estimated)
+        return r
+
+
+def summarize_article_overall(article_text: str, model: str = DEFAULT_MODEL) -> str:
+    messages = build_summary_messages(article_text)
+
+    with stage("llm_summary"):
+        r = _create_chat_completion(
+            messages,
+            model=model,
+            temperature=SUMMARY_TEMPERATURE,
+            completion_tokens=SUMMARY_COMPLETION_TOKENS,
+            prompt=get_prompt("summary").id,
+        )
+
+    return parse_summary(r.choices[0].message.content)
+
+
+def stream_article_summary(article_text: str, model: str = DEFAULT_MODEL) -> Iterator[str]:
+    """
+    Same prompt as summarize_article_overall, but yields the summary text as it is
+    generated. The 650-char cap from parse_summary is applied on the fly.
+    """
+    messages = build_summary_messages(article_text)
+
+    stream = _create_chat_completion(
+        messages,
+        model=model,
+        temperature=SUMMARY_TEMPERATURE,
+        completion_tokens=SUMMARY_COMPLETION_TOKENS,
+        stream=True,
+        prompt=get_prompt("summary").id,
+    )
+
+    emitted = 0
+    try:
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            if not emitted:
+                delta = delta.lstrip()
+            if not delta:
+                continue
+            if emitted + len(delta) > 650:
+                yield delta[: 650 - emitted].rstrip() + "…"
+                return
+            emitted += len(delta)
+            yield delta
+    finally:
+        stream.close()
+
+
+def _summarize_chunk(chunk: str, index: int, total: int, model: str) -> str:
+    with stage("llm_chunk"):
+        r = _create_chat_completion(
+            build_chunk_messages(chunk, index, total),
+            model=model,
+            temperature=SUMMARY_TEMPERATURE,
+            completion_tokens=CHUNK_COMPLETION_TOKENS,
+            prompt=get_prompt("chunk").id,
+        )
+    return (r.choices[0].message.content or "").strip()
+
+
+def condense_article(article_text: str, model: str = DEFAULT_MODEL) -> str:
+    """
+    Map step for long documents. Returns the boilerplate-free text when it fits in
+    ARTICLE_MAX_TOKENS; otherwise splits it into up to MAX_CHUNKS chunks, summarizes
+    them concurrently and returns the partial summaries in document order, which the
+    summary and topics prompts then use in place of the article (reduce step).
+    """
+    text = strip_boilerplate(article_text)
+    if count_tokens(text) <= ARTICLE_MAX_TOKENS:
+        return text
+
+    chunks = split_into_chunks(text, CHUNK_TOKENS, max_chunks=MAX_CHUNKS)
+    with ThreadPoolExecutor(max_workers=min(CHUNK_CONCURRENCY, len(chunks))) as pool:
+        notes = list(
+            pool.map(
+                lambda args: _summarize_chunk(args[1], args[0], len(chunks), model),
+                enumerate(chunks, start=1),
+            )
+        )
+    return "\n\n".join(note for note in notes if note)
+
+
+def summarize_spanish_article_multi(article_text: str, n: int = 3, model: str = DEFAULT_MODEL) -> List[str]:
+    messages = build_topics_messages(article_text, n=n)
+
+    with stage("llm_topics"):
+        r = _create_chat_completion(
+            messages,
+            model=model,
+            temperature=TOPICS_TEMPERATURE,
+            completion_tokens=TOPICS_COMPLETION_TOKENS,
+            prompt=get_prompt("topics").id,
+        )
+
+    return parse_topics(r.choices[0].message.content, n=n)
+
+
+def embed_texts(texts: Sequence[str], model: str = EMBEDDING_MODEL) -> List[List[float]]:
+    """
+    Embedding vectors for short texts (topic_index similarity fallback), counted
+    against the shared token bucket like the chat calls.
+    """
+    limiter = get_limiter()
+    if limiter:
+        limiter.acquire(sum(count_tokens(t) for t in texts))
+    with stage("llm_embedding"):
+        r = get_client().embeddings.create(model=model, input=list(texts))
+    record_openai_usage(model, getattr(r, "usage", None), prompt="embedding")
+    return [item.embedding for item in r.data]
@@ -0,0 +1,175 @@
+# text_prep.py
+"""
+Article preprocessing before it reaches the LLM: drop boilerplate, then budget
+by tokens instead of characters.
+
+- strip_boilerplate: removes repeated paragraphs (wire copy pasted twice, page
+  headers/footers repeated on every PDF page) and the usual newsroom chrome
+  (cookie notices, "Te puede interesar", copyright lines).
+- count_tokens / truncate_to_tokens: tiktoken when available, otherwise the
+  chars-per-token estimate from rate_limiter.
+- split_into_chunks: paragraph-aligned chunks of at most N tokens, for the
+  map-reduce path in summarizer.condense_article.
+"""
+import re
+import threading
+from collections import deque
+from typing import List, Optional
+
+from rate_limiter import CHARS_PER_TOKEN
+
+DEFAULT_ENCODING = "o200k_base"
+
+# Short lines seen this many times in one document are headers/footers.
+REPEATED_LINE_MIN_COUNT = 3
+REPEATED_LINE_MAX_CHARS = 120
+# Only paragraphs at least this long are deduplicated outright (short table cells repeat legitimately).
+DUPLICATE_MIN_CHARS = 40
+
+BOILERPLATE_PATTERNS = [
+    r"^utilizamos cookies\b",
+    r"\bcookies propias y de terceros\b",
+    r"^(te puede interesar|lee también|leer más|más información|noticias relacionadas)\b",
+    r"^(síguenos|suscríbete|hazte socio|descarga la app)\b",
+    r"todos los derechos reservados",
+    r"^©",
+    r"^página \d+( de \d+)?$",
+    r"^\d+\s*/\s*\d+$",
+    r"^(publicidad|anuncio)$",
+]
+_BOILERPLATE_RE = re.compile("|".join(BOILERPLATE_PATTERNS), re.IGNORECASE)
+
+_encoding = None
+_encoding_failed = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """
+    tiktoken's encoder, or None if tiktoken isn't installed or its BPE file can't
+    be loaded (it is downloaded on first use unless TIKTOKEN_CACHE_DIR has it).
+    """
+    global _encoding, _encoding_failed
+    if _encoding is not None or _encoding_failed:
+        return _encoding
+    with _encoding_lock:
+        if _encoding is None and not _encoding_failed:
+            try:
+                import tiktoken
+
+                _encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+            except Exception:
+                _encoding_failed = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    enc = _get_encoding()
+    if enc is None:
+        return -(-len(text or "") // CHARS_PER_TOKEN)
+    return len(enc.encode(text or "", disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cuts text to at most max_tokens, backing off to the last paragraph or sentence
+    break when one is reasonably close.
+    """
+    text = text or ""
+    enc = _get_encoding()
+    if enc is None:
+        if len(text) <= max_tokens * CHARS_PER_TOKEN:
+            return text
+        cut = text[: max_tokens * CHARS_PER_TOKEN]
+    else:
+        tokens = enc.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        # a cut inside a multi-byte character decodes to U+FFFD
+        cut = enc.decode(tokens[:max_tokens]).rstrip("\ufffd")
+
+    for sep in ("\n\n", "\n", ". "):
+        idx = cut.rfind(sep)
+        if idx >= len(cut) * 0.8:
+            return cut[: idx + (1 if sep == ". " else 0)].rstrip()
+    return cut.rstrip()
+
+
+def _normalize(paragraph: str) -> str:
+    return " ".join(paragraph.lower().split())
+
+
+def strip_boilerplate(text: str) -> str:
+    """
+    Keeps paragraph boundaries ("\\n\\n" or single newlines) and drops:
+    duplicated paragraphs, short lines repeated across the document, and lines
+    matching BOILERPLATE_PATTERNS.
+    """
+    if not text:
+        return ""
+
+    lines = [ln.strip() for ln in text.splitlines()]
+    counts = {}
+    for ln in lines:
+        if ln and len(ln) <= REPEATED_LINE_MAX_CHARS:
+            key = _normalize(ln)
+            counts[key] = counts.get(key, 0) + 1
+
+    seen = set()
+    kept: List[str] = []
+    for ln in lines:
+        if not ln:
+            if kept and kept[-1] != "":
+                kept.append("")
+            continue
+        key = _normalize(ln)
+        if key in seen and len(key) >= DUPLICATE_MIN_CHARS:
+            continue
+        if counts.get(key, 0) >= REPEATED_LINE_MIN_COUNT:
+            continue
+        if _BOILERPLATE_RE.search(ln):
+            continue
+        seen.add(key)
+        kept.append(ln)
+
+    return "\n".join(kept).strip()
+
+
+def prepare_article(text: str, max_tokens: int) -> str:
+    return truncate_to_tokens(strip_boilerplate(text), max_tokens)
+
+
+def split_into_chunks(text: str, max_tokens: int, max_chunks: Optional[int] = None) -> List[str]:
+    """
+    Greedy paragraph packing into chunks of <= max_tokens. A paragraph longer than
+    a whole chunk is cut with truncate_to_tokens and the rest carried over.
+    """
+    paragraphs = deque(p.strip() for p in re.split(r"\n\s*\n|\n", text or "") if p.strip())
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append("\n\n".join(current))
+        current, current_tokens = [], 0
+
+    while paragraphs:
+        para = paragraphs.popleft()
+        n = count_tokens(para)
+        if n > max_tokens:
+            head = truncate_to_tokens(para, max_tokens) or para[: max_tokens * CHARS_PER_TOKEN]
+            rest = para[len(head):].strip()
+            if rest:
+                paragraphs.appendleft(rest)
+            para, n = head, count_tokens(head)
+        if current_tokens + n > max_tokens:
+            flush()
+            if max_chunks is not None and len(chunks) >= max_chunks:
+                return chunks
+        current.append(para)
+        current_tokens += n
+
+    flush()
+    return chunks[:max_chunks] if max_chunks is not None else chunks
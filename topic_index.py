@@ -0,0 +1,266 @@
+# topic_index.py
+"""
+Topic -> ministore reuse index, so /create_ministores (and jobs) return an
+existing Deanna2u book instead of creating a new one for a topic that was turned
+into a book recently.
+
+Topics are compared by a normalized key: accents folded, stopwords dropped,
+Spanish plurals reduced to the singular, a few commercial synonyms merged, word
+order ignored. "Hoteles baratos en Madrid" and "hotel económico madrid" share
+the key "barato hotel madrid".
+
+Optionally (TOPIC_INDEX_EMBEDDING_THRESHOLD > 0) a topic whose key is new is
+also compared with recent topics by OpenAI embedding cosine similarity, which
+catches paraphrases the rules miss at the cost of one embeddings call per miss.
+
+Entries are reused for TOPIC_INDEX_MAX_AGE_HOURS (the shopping results behind a
+book go stale); the index lives in SQLite next to the other data/ files.
+"""
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Words that change what is being sold stay in the key: "leche sin lactosa" is not
+# "leche con lactosa", "tienda de campaña" is not "campaña" (so no sin/con/contra/
+# bajo/sobre/ni, and no "tienda").
+STOPWORDS = frozenset(
+    """
+    a al ante cabe como de del desde durante e el en entre hacia hasta la las le les lo los
+    mas me mediante mi mis muy o os para pero por que se segun so su sus tras tu tus u un una
+    unas uno unos y ya
+    comprar compra online venta
+    """.split()
+)
+
+# Plurals the suffix rules get wrong (-jes is usually -je + s; English loanwords).
+IRREGULAR_PLURALS = {
+    "relojes": "reloj",
+    "smartphones": "smartphone",
+    "iphones": "iphone",
+    "tablets": "tablet",
+    "packs": "pack",
+}
+
+# Applied after singularization, so only singular forms are needed.
+SYNONYMS = {
+    "economico": "barato",
+    "economica": "barato",
+    "barata": "barato",
+    "asequible": "barato",
+    "lowcost": "barato",
+    "descuento": "oferta",
+    "rebaja": "oferta",
+    "movil": "telefono",
+    "smartphone": "telefono",
+    "portatil": "ordenador",
+    "laptop": "ordenador",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9ñ]+")
+_EMBEDDING_CACHE_SIZE = 1024
+# add() deletes expired entries at most this often.
+PURGE_INTERVAL_SECONDS = 3600
+
+
+def fold_accents(text: str) -> str:
+    """Lowercases and strips diacritics, keeping ñ (año and ano are different words)."""
+    text = text.lower().replace("ñ", "\x00")
+    text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return text.replace("\x00", "ñ")
+
+
+def singularize(word: str) -> str:
+    """
+    Rule-based Spanish plural -> singular, enough for short shopping queries:
+    luces -> luz, camiones -> camion, hoteles -> hotel, calles -> calle, casas -> casa,
+    muebles -> mueble, grandes -> grande.
+    """
+    if len(word) <= 3 or not word.endswith("s"):
+        return word
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if word.endswith("ces"):
+        return word[:-3] + "z"
+    if word.endswith("iones"):
+        return word[:-2]
+    # -es only follows a consonant-final singular (hotel, flor, ciudad, rey), and a
+    # Spanish word ends in a single consonant after a vowel: muebles, grandes,
+    # padres, calles are -e singulars + s.
+    if word.endswith("es") and word[-3] in "lrndy" and word[-4] in "aeiou":
+        return word[:-2]
+    if word[-2] in "aeiou":
+        return word[:-1]
+    return word
+
+
+def topic_tokens(text: str) -> List[str]:
+    """Folded, singularized, synonym-merged tokens of the text, stopwords dropped, in order."""
+    tokens = _TOKEN_RE.findall(fold_accents(text or ""))
+    return [SYNONYMS.get(t, t) for t in (singularize(t) for t in tokens if t not in STOPWORDS)]
+
+
+def normalize_topic(topic: str) -> str:
+    return " ".join(sorted(set(topic_tokens(topic))))
+
+
+@dataclass
+class TopicMatch:
+    topic: str
+    book_url: str
+    book_id: int
+    created_at: float
+    similarity: float = 1.0  # 1.0 for a normalized-key match
+
+
+class TopicIndex:
+    def __init__(
+        self,
+        path: str,
+        max_age: float,
+        embed: Optional[Callable[[Sequence[str]], List[List[float]]]] = None,
+        embedding_threshold: float = 0.0,
+    ):
+        """
+        max_age: seconds a book is reused for.
+        embed: texts -> vectors; with embedding_threshold > 0 it is used on key misses.
+        """
+        self.path = str(path)
+        self.max_age = max_age
+        self.embed = embed if embedding_threshold > 0 else None
+        self.embedding_threshold = embedding_threshold
+        self._local = threading.local()
+        self._embeddings: Dict[str, bytes] = {}
+        self._embeddings_lock = threading.Lock()
+        self._last_purge = 0.0
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        self._conn().execute(
+            """
+            CREATE TABLE IF NOT EXISTS topics (
+                key TEXT PRIMARY KEY,
+                topic TEXT NOT NULL,
+                book_url TEXT NOT NULL,
+                book_id INTEGER NOT NULL,
+                embedding BLOB,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn().execute("CREATE INDEX IF NOT EXISTS idx_topics_created ON topics (created_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, topic: str) -> Optional[TopicMatch]:
+        key = normalize_topic(topic)
+        if not key:
+            return None
+
+        min_created = time.time() - self.max_age
+        row = self._conn().execute(
+            "SELECT topic, book_url, book_id, created_at FROM topics WHERE key = ? AND created_at >= ?",
+            (key, min_created),
+        ).fetchone()
+        if row:
+            return TopicMatch(*row)
+        if self.embed is None:
+            return None
+        return self._lookup_by_embedding(key, min_created)
+
+    def add(self, topic: str, book_url: str, book_id: int) -> None:
+        key = normalize_topic(topic)
+        if not key:
+            return
+        embedding = self._embedding(key) if self.embed is not None else None
+        self._conn().execute(
+            """
+            INSERT OR REPLACE INTO topics (key, topic, book_url, book_id, embedding, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            (key, topic, book_url, int(book_id), embedding, time.time()),
+        )
+        if time.time() - self._last_purge >= PURGE_INTERVAL_SECONDS:
+            self._last_purge = time.time()
+            self.purge()
+
+    def purge(self) -> int:
+        """Deletes entries past max_age; returns how many."""
+        cur = self._conn().execute("DELETE FROM topics WHERE created_at < ?", (time.time() - self.max_age,))
+        return cur.rowcount
+
+    # ----------------------------
+    # Embedding fallback
+    # ----------------------------
+    def _embedding(self, key: str) -> bytes:
+        """Unit-length float32 vector of the normalized key, cached in memory."""
+        import numpy as np
+
+        with self._embeddings_lock:
+            cached = self._embeddings.get(key)
+        if cached is not None:
+            return cached
+
+        vector = np.asarray(self.embed([key])[0], dtype=np.float32)
+        norm = float(np.linalg.norm(vector)) or 1.0
+        blob = (vector / norm).tobytes()
+        with self._embeddings_lock:
+            if len(self._embeddings) >= _EMBEDDING_CACHE_SIZE:
+                self._embeddings.pop(next(iter(self._embeddings)))
+            self._embeddings[key] = blob
+        return blob
+
+    def _lookup_by_embedding(self, key: str, min_created: float) -> Optional[TopicMatch]:
+        import numpy as np
+
+        rows = self._conn().execute(
+            """
+            SELECT topic, book_url, book_id, created_at, embedding FROM topics
+            WHERE created_at >= ? AND embedding IS NOT NULL
+            """,
+            (min_created,),
+        ).fetchall()
+        if not rows:
+            return None
+
+        query = np.frombuffer(self._embedding(key), dtype=np.float32)
+        matrix = np.vstack([np.frombuffer(row[4], dtype=np.float32) for row in rows])
+        scores = matrix @ query
+        best = int(np.argmax(scores))
+        if scores[best] < self.embedding_threshold:
+            return None
+        topic, book_url, book_id, created_at, _ = rows[best]
+        return TopicMatch(topic, book_url, book_id, created_at, similarity=round(float(scores[best]), 3))
+
+
+def index_from_settings() -> Optional[TopicIndex]:
+    """
+    The index configured by TOPIC_INDEX_DB / TOPIC_INDEX_MAX_AGE_HOURS /
+    TOPIC_INDEX_EMBEDDING_THRESHOLD, or None when the max age is 0 (disabled).
+    """
+    from settings import get_settings
+
+    settings = get_settings()
+    if settings.topic_index_max_age_hours <= 0:
+        return None
+
+    embed = None
+    if settings.topic_index_embedding_threshold > 0:
+        from summarizer import embed_texts
+
+        embed = embed_texts
+    return TopicIndex(
+        settings.topic_index_db,
+        max_age=settings.topic_index_max_age_hours * 3600,
+        embed=embed,
+        embedding_threshold=settings.topic_index_embedding_threshold,
+    )
@@ -0,0 +1,146 @@
+# uploads.py
+import hashlib
+import tempfile
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+try:
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Uploads stay in memory up to this size, then roll over to a temp file on disk.
+SPOOL_MAX_MEMORY = 1024 * 1024
+
+
+class UploadError(ValueError):
+    pass
+
+
+class UploadTooLargeError(UploadError):
+    pass
+
+
+@dataclass
+class SpooledUpload:
+    file: tempfile.SpooledTemporaryFile
+    filename: str
+    size: int
+    sha256: str
+
+
+class _Sink:
+    """
+    Writes chunks to a spooled temp file while hashing them and enforcing max_bytes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+        self.hasher = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLargeError(f"Upload exceeds {self.max_bytes} bytes")
+        self.hasher.update(chunk)
+        self.file.write(chunk)
+
+    def finish(self, filename: str) -> SpooledUpload:
+        self.file.seek(0)
+        return SpooledUpload(
+            file=self.file,
+            filename=filename,
+            size=self.size,
+            sha256=self.hasher.hexdigest(),
+        )
+
+
+async def spool_upload(
+    content_type: str,
+    chunks: AsyncIterator[bytes],
+    max_bytes: int,
+    field_name: str = "file",
+) -> SpooledUpload:
+    """
+    Streams a request body into a SpooledTemporaryFile without buffering it in memory.
+
+    Accepts either a raw body (e.g. Content-Type: application/pdf) or
+    multipart/form-data, in which case only the part named `field_name` is kept.
+    Raises UploadTooLargeError as soon as more than `max_bytes` have arrived.
+    """
+    ctype, options = parse_options_header(content_type or "")
+    sink = _Sink(max_bytes)
+
+    try:
+        if ctype != b"multipart/form-data":
+            async for chunk in chunks:
+                sink.write(chunk)
+            if sink.size == 0:
+                raise UploadError("Empty upload")
+            return sink.finish(filename="")
+
+        boundary = options.get(b"boundary")
+        if not boundary:
+            raise UploadError("Missing multipart boundary")
+
+        state = {"header_field": b"", "header_value": b"", "headers": {}, "target": False, "found": False}
+        filename: Optional[str] = None
+
+        def on_part_begin():
+            state["headers"] = {}
+            state["target"] = False
+
+        def on_header_field(data, start, end):
+            state["header_field"] += data[start:end]
+
+        def on_header_value(data, start, end):
+            state["header_value"] += data[start:end]
+
+        def on_header_end():
+            state["headers"][state["header_field"].lower()] = state["header_value"]
+            state["header_field"] = b""
+            state["header_value"] = b""
+
+        def on_headers_finished():
+            nonlocal filename
+            _, disp = parse_options_header(state["headers"].get(b"content-disposition", b""))
+            if disp.get(b"name", b"").decode("utf-8", "replace") == field_name and not state["found"]:
+                state["target"] = True
+                state["found"] = True
+                filename = disp.get(b"filename", b"").decode("utf-8", "replace")
+
+        def on_part_data(data, start, end):
+            if state["target"]:
+                sink.write(data[start:end])
+
+        parser = MultipartParser(
+            boundary,
+            callbacks={
+                "on_part_begin": on_part_begin,
+                "on_header_field": on_header_field,
+                "on_header_value": on_header_value,
+                "on_header_end": on_header_end,
+                "on_headers_finished": on_headers_finished,
+                "on_part_data": on_part_data,
+            },
+        )
+        try:
+            async for chunk in chunks:
+                parser.write(chunk)
+            parser.finalize()
+        except MultipartParseError as e:
+            raise UploadError(f"Malformed multipart body: {e}") from e
+
+        if not state["found"] or sink.size == 0:
+            raise UploadError(f"Missing or empty '{field_name}' field")
+        return sink.finish(filename=filename or "")
+
+    except Exception:
+        sink.file.close()
+        raise
@@ -1,9 +1,17 @@
 # web_utils.py
+import codecs
 import re
-from typing import Optional
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional, Tuple, Union
 
-import requests
-from bs4 import BeautifulSoup
+from metrics import stage
+from settings import get_settings
+from text_prep import strip_boilerplate
+
+# requests and bs4 are imported where they are used (see warm_up) to keep worker startup fast.
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
 
 DEFAULT_HEADERS = {
     "User-Agent": (
@@ -15,6 +23,24 @@ DEFAULT_HEADERS = {
     "Accept-Language": "es-ES,es;q=0.9,en;q=0.8",
 }
 
+MAX_EXTRACTED_CHARS = 200_000
+
+HTML_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+PDF_TYPES = ("application/pdf", "application/x-pdf")
+# Served for all kinds of files; the first bytes decide.
+GENERIC_TYPES = ("", "application/octet-stream", "binary/octet-stream", "application/download")
+
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+# An <article> with at least this many <p> is taken to be the story; the download
+# stops once it closes (related-news teasers are often <article>s too).
+ARTICLE_MIN_PARAGRAPHS = 3
+
+# Headers used by the API when fetching articles on behalf of WordPress.
+BOT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; DeannaSummarizerBot/1.0)",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+}
+
 
 def _normalize_url(url: str) -> str:
     url = url.strip()
@@ -28,7 +54,12 @@ def _clean_spaces(text: str) -> str:
     return text.strip()
 
 
-def _extract_generic_main_text(soup: BeautifulSoup) -> str:
+def warm_up() -> None:
+    import requests  # noqa: F401
+    from bs4 import BeautifulSoup  # noqa: F401
+
+
+def _extract_generic_main_text(soup: "BeautifulSoup") -> str:
     """
     Generic extractor for normal news/blog sites.
     Try article/content containers, then fallback to body text.
@@ -65,7 +96,7 @@ def _extract_generic_main_text(soup: BeautifulSoup) -> str:
     return _clean_spaces(t)
 
 
-def _extract_deanna_text(soup: BeautifulSoup) -> str:
+def _extract_deanna_text(soup: "BeautifulSoup") -> str:
     """
     Extremely simple extractor for deanna.today:
     just take ALL visible text in <body>.
@@ -81,6 +112,317 @@ def _extract_deanna_text(soup: BeautifulSoup) -> str:
     return _clean_spaces(text)
 
 
+# ----------------------------
+# Charset detection
+# ----------------------------
+# HTML5 wants <meta charset> in the first 1024 bytes; news CMSs often push it
+# further down behind comments and preload tags.
+META_SNIFF_BYTES = 4096
+DETECT_SAMPLE_BYTES = 32 * 1024
+# What browsers use for undeclared legacy pages (and for "iso-8859-1", which it extends).
+DEFAULT_CHARSET = "cp1252"
+
+# UTF-32 before UTF-16: FF FE 00 00 also starts with the UTF-16 LE mark.
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+# <meta charset="..."> and <meta http-equiv="Content-Type" content="text/html; charset=...">
+_META_CHARSET_RE = re.compile(rb"""<meta\s[^>]*?charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE)
+_NON_ASCII_RE = re.compile(rb"[\x80-\xff]")
+_LATIN1_ALIASES = ("iso8859-1", "ascii")
+
+
+def _normalize_charset(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    try:
+        codec = codecs.lookup(name.strip().strip("\"'")).name
+    except LookupError:
+        return None
+    return DEFAULT_CHARSET if codec in _LATIN1_ALIASES else codec
+
+
+def sniff_charset(body: bytes, header_charset: Optional[str] = None) -> Tuple[str, str]:
+    """
+    (encoding, how it was found) for an HTML body, cheapest evidence first:
+    byte order mark, Content-Type charset, <meta> in the first META_SNIFF_BYTES,
+    then a UTF-8 check and, only when that fails, statistical detection, both on a
+    DETECT_SAMPLE_BYTES sample starting at the first non-ASCII byte.
+    """
+    for bom, encoding in _BOMS:
+        if body.startswith(bom):
+            return encoding, "bom"
+
+    encoding = _normalize_charset(header_charset)
+    if encoding:
+        return encoding, "header"
+
+    match = _META_CHARSET_RE.search(body, 0, META_SNIFF_BYTES)
+    encoding = _normalize_charset(match.group(1).decode("ascii")) if match else None
+    if encoding:
+        return encoding, "meta"
+
+    first = _NON_ASCII_RE.search(body)
+    if first is None:
+        return "utf-8", "ascii"
+    sample = body[first.start() : first.start() + DETECT_SAMPLE_BYTES]
+    try:
+        # a multi-byte character cut at the end of the sample is not an error
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=len(sample) < DETECT_SAMPLE_BYTES)
+        return "utf-8", "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        return DEFAULT_CHARSET, "default"
+    matches = from_bytes(sample)
+    best = matches.best()
+    if best is not None:
+        # Spanish text decodes cleanly under several code pages (cp1250, cp1252,
+        # mac-latin2...) and the language model often ranks cp1252 below them, which
+        # turns "ñ" into "ń". The browser default wins unless it decodes noisier.
+        for match in matches:
+            if DEFAULT_CHARSET in match.could_be_from_charset and match.chaos <= best.chaos:
+                best = match
+                break
+    encoding = _normalize_charset(best.encoding) if best else None
+    return (encoding, "detected") if encoding else (DEFAULT_CHARSET, "default")
+
+
+def decode_html(body: bytes, header_charset: Optional[str] = None) -> str:
+    encoding, _ = sniff_charset(body, header_charset)
+    return body.decode(encoding, errors="replace")
+
+
+# ----------------------------
+# Bounded downloads
+# ----------------------------
+class UnsupportedContentError(RuntimeError):
+    """The URL serves something other than a page or a PDF (video, image, archive...)."""
+
+
+class DownloadTooLargeError(RuntimeError):
+    pass
+
+
+@dataclass
+class Download:
+    url: str
+    kind: str  # "html" or "pdf"
+    media_type: str
+    charset: Optional[str]
+    body: bytes
+    # True when the download stopped at the end of the article, before the end of the page
+    truncated: bool = False
+
+    def text(self) -> str:
+        return decode_html(self.body, self.charset)
+
+
+def _parse_content_type(value: str) -> Tuple[str, Optional[str]]:
+    media_type, _, params = (value or "").partition(";")
+    charset = None
+    for param in params.split(";"):
+        name, _, val = param.strip().partition("=")
+        if name.lower() == "charset" and val:
+            charset = val.strip().strip("\"'")
+    return media_type.strip().lower(), charset
+
+
+def _sniff_kind(head: bytes) -> Optional[str]:
+    if head.lstrip()[:5] == b"%PDF-":
+        return "pdf"
+    if b"<" in head[:1024]:
+        return "html"
+    return None
+
+
+_ARTICLE_TAG_RE = re.compile(rb"<(/?)(article|p)\b", re.IGNORECASE)
+# Longest tag prefix the scanner needs to see whole: "</article" + one byte.
+_TAG_LOOKBEHIND = 11
+
+
+class ArticleEndScanner:
+    """
+    Finds, chunk by chunk, where the story's <article> element closes, so the
+    rest of the page (comments, related news, footer, scripts) need not be
+    downloaded or parsed. Scans bytes for tags only; it doesn't build a tree.
+    """
+
+    def __init__(self, min_paragraphs: int = ARTICLE_MIN_PARAGRAPHS):
+        self.min_paragraphs = min_paragraphs
+        self.depth = 0
+        self.paragraphs = 0
+        self.done = False
+        self._tail = b""
+
+    def feed(self, chunk: bytes) -> bool:
+        """Returns True once the article has closed (chunk included)."""
+        if self.done:
+            return True
+        data = self._tail + chunk
+        # a tag cut at the chunk boundary is scanned with the next chunk
+        end = data.rfind(b"<", max(0, len(data) - _TAG_LOOKBEHIND))
+        end = len(data) if end == -1 else end
+        for m in _ARTICLE_TAG_RE.finditer(data, 0, end):
+            closing, name = m.group(1), m.group(2).lower()
+            if name == b"p":
+                if not closing and self.depth:
+                    self.paragraphs += 1
+            elif not closing:
+                if self.depth == 0:
+                    self.paragraphs = 0
+                self.depth += 1
+            elif self.depth:
+                self.depth -= 1
+                if self.depth == 0 and self.paragraphs >= self.min_paragraphs:
+                    self.done = True
+                    return True
+        self._tail = data[end:]
+        return False
+
+
+def download(
+    url: str,
+    timeout: int = 15,
+    headers: Optional[dict] = None,
+    max_html_bytes: Optional[int] = None,
+    max_pdf_bytes: Optional[int] = None,
+    stop_after_article: bool = True,
+) -> Download:
+    """
+    Streams a page or PDF into memory, never more than the size cap for its kind
+    (MAX_HTML_BYTES / MAX_PDF_BYTES by default). Anything else is refused as soon
+    as the headers (or, for generic types, the first bytes) show what it is.
+    HTML stops at the end of the story's <article> unless stop_after_article=False.
+
+    Raises requests.RequestException on network errors, UnsupportedContentError,
+    DownloadTooLargeError, and RuntimeError on non-200/empty responses or when
+    the whole download takes longer than `timeout`.
+    """
+    import requests
+
+    settings = get_settings()
+    limits = {
+        "html": max_html_bytes or settings.max_html_bytes,
+        "pdf": max_pdf_bytes or settings.max_pdf_bytes,
+    }
+    deadline = time.monotonic() + timeout
+
+    with stage("fetch"):
+        resp = requests.get(url, timeout=timeout, headers=headers or BOT_HEADERS, stream=True)
+        with resp:
+            if resp.status_code != 200:
+                raise RuntimeError(f"Error fetching URL, HTTP {resp.status_code}")
+
+            media_type, charset = _parse_content_type(resp.headers.get("Content-Type", ""))
+            if media_type in HTML_TYPES:
+                kind = "html"
+            elif media_type in PDF_TYPES:
+                kind = "pdf"
+            elif media_type in GENERIC_TYPES:
+                kind = None
+            else:
+                raise UnsupportedContentError(f"Tipo de contenido no soportado: {media_type}")
+
+            declared = resp.headers.get("Content-Length", "")
+            if kind and declared.isdigit() and int(declared) > limits[kind]:
+                raise DownloadTooLargeError(f"El documento ocupa {declared} bytes, el límite es {limits[kind]}")
+
+            scanner = ArticleEndScanner() if stop_after_article else None
+            chunks = []
+            size = 0
+            truncated = False
+            for chunk in resp.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                if not chunk:
+                    continue
+                if kind is None:
+                    kind = _sniff_kind(chunk)
+                    if kind is None:
+                        raise UnsupportedContentError(f"Tipo de contenido no soportado: {media_type or 'desconocido'}")
+                chunks.append(chunk)
+                size += len(chunk)
+                if size > limits[kind]:
+                    raise DownloadTooLargeError(f"El documento supera el límite de {limits[kind]} bytes")
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Error fetching URL: download took longer than {timeout}s")
+                if kind == "html" and scanner is not None and scanner.feed(chunk):
+                    truncated = True
+                    break
+
+    if not size:
+        raise RuntimeError("Error fetching URL, empty body")
+    return Download(url, kind, media_type, charset, b"".join(chunks), truncated)
+
+
+def extract_text_from_download(doc: Download, max_pdf_chars: Optional[int] = MAX_EXTRACTED_CHARS) -> str:
+    if doc.kind == "pdf":
+        from pdf_utils import extract_text_from_pdf
+
+        with stage("parse"):
+            return extract_text_from_pdf(doc.body, max_chars=max_pdf_chars, max_pages=get_settings().max_pdf_pages)
+    return extract_text_from_html(doc.body, charset=doc.charset)
+
+
+def fetch_article_text(
+    url: str, timeout: int = 15, headers: Optional[dict] = None, max_pdf_chars: Optional[int] = MAX_EXTRACTED_CHARS
+) -> str:
+    """
+    Article text behind a URL: extracted from the page, or from the PDF when the
+    link points to one. Raises like download().
+    """
+    return extract_text_from_download(download(url, timeout=timeout, headers=headers), max_pdf_chars=max_pdf_chars)
+
+
+def extract_text_from_html(html: Union[str, bytes], charset: Optional[str] = None) -> str:
+    """
+    Extract main article text:
+    - Prefer <article> p
+    - Fallback to all <p>
+    - Fallback to all text
+    Paragraphs are separated by blank lines and repeated boilerplate is removed.
+    Raw bytes are decoded here (see sniff_charset), `charset` being the one from
+    the Content-Type header if any.
+    """
+    with stage("parse"):
+        if isinstance(html, bytes):
+            html = decode_html(html, charset)
+        return _extract_text_from_html(html)
+
+
+def _extract_text_from_html(html: str) -> str:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+
+    paragraphs = [
+        p.get_text(strip=True)
+        for p in soup.select("article p")
+        if p.get_text(strip=True)
+    ]
+
+    if not paragraphs:
+        paragraphs = [
+            p.get_text(strip=True)
+            for p in soup.select("p")
+            if p.get_text(strip=True)
+        ]
+
+    if paragraphs:
+        text = "\n\n".join(" ".join(p.split()) for p in paragraphs)
+    else:
+        text = soup.get_text(separator="\n", strip=True)
+
+    # Token budgeting happens in the summarizer; this only bounds pathological pages.
+    return strip_boilerplate(text)[:MAX_EXTRACTED_CHARS]
+
+
 def fetch_article_text_from_url(url: str, timeout: int = 10) -> str:
     """
     Fetch and extract article text from a URL.
@@ -88,6 +430,8 @@ def fetch_article_text_from_url(url: str, timeout: int = 10) -> str:
     - For deanna.today: use very permissive extraction (whole body text).
     - For other sites: use a more targeted generic extractor.
     """
+    from bs4 import BeautifulSoup
+
     url = _normalize_url(url)
 
     headers = DEFAULT_HEADERS.copy()
@@ -99,12 +443,18 @@ def fetch_article_text_from_url(url: str, timeout: int = 10) -> str:
             }
         )
 
-    resp = requests.get(url, headers=headers, timeout=timeout)
+    try:
+        # deanna.today pages are read whole; elsewhere the story's <article> is enough
+        doc = download(url, timeout=timeout, headers=headers, stop_after_article="deanna.today" not in url)
+    except (UnsupportedContentError, DownloadTooLargeError):
+        raise
+    except RuntimeError as e:
+        raise RuntimeError(f"No se ha podido descargar la página: {e}") from e
 
-    if resp.status_code != 200:
-        raise RuntimeError(f"El sitio respondió con código HTTP {resp.status_code}.")
+    if doc.kind == "pdf":
+        return extract_text_from_download(doc)
 
-    soup = BeautifulSoup(resp.text, "html.parser")
+    soup = BeautifulSoup(doc.text(), "html.parser")
 
     if "deanna.today" in url:
         text = _extract_deanna_text(soup)